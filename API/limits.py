@@ -0,0 +1,206 @@
+# api limits.py
+# per-client token-bucket rate limiting in front of the endpoints; over the limit is a fast 429
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+# sustained requests per second one client may make, 0 (the default) turns rate limiting off:
+# behind a proxy or the streamlit server many users share an address, so it is only turned on
+# once clients can be told apart (FORWARDED_ALLOW_IPS, RATE_LIMIT_KEYS / RATE_LIMIT_EXEMPT_KEYS)
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", "0"))
+# requests a client may make at once after being idle
+RATE_BURST = float(os.getenv("RATE_BURST", "40"))
+# api keys honoured as a client's name, comma-separated; any other X-API-Key is ignored and the
+# client is limited by its address, so made-up keys cannot each open a fresh bucket
+RATE_LIMIT_KEYS = os.getenv("RATE_LIMIT_KEYS", "")
+# api keys that are not limited at all, e.g. the Streamlit frontend's, which sends every user's requests
+RATE_LIMIT_EXEMPT_KEYS = os.getenv("RATE_LIMIT_EXEMPT_KEYS", "")
+# per-route overrides, "path=rate[:burst],..." with the route template as path, e.g. "/tasks/export=1:3"
+RATE_LIMIT_ROUTES = os.getenv("RATE_LIMIT_ROUTES", "")
+# clients whose buckets are kept; the least recently seen one is forgotten (and starts full again)
+MAX_CLIENTS = 10000
+# (method, path) pairs whose limit is remembered, so most requests skip matching them against every route
+MAX_PATHS = 4096
+
+def rate_limit(rate, burst=None):
+    '''
+    per-endpoint limit in requests per second per client (burst defaults to twice the rate),
+    None exempts the endpoint; an endpoint with its own limit has its own bucket per client
+    usage: put @rate_limit(1, 3) under the @app.get(...) line
+    '''
+    def decorate(endpoint):
+        endpoint.rate_limit = None if rate is None else (float(rate), float(burst or 2 * rate))
+        return endpoint
+    return decorate
+
+def parse_routes(text):
+    '''
+    {"/tasks/export": (1.0, 3.0), ...} from RATE_LIMIT_ROUTES ("off" exempts a route)
+    '''
+    routes = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        path, _, limit = item.partition("=")
+        if limit.strip() == "off":
+            routes[path.strip()] = None
+            continue
+        rate, _, burst = limit.partition(":")
+        routes[path.strip()] = (float(rate), float(burst or 2 * float(rate)))
+    return routes
+
+def parse_keys(text):
+    return {key.strip() for key in text.split(",") if key.strip()}
+
+def client_of(scope, keys):
+    # a configured api key names the client wherever it connects from, otherwise its address
+    # (behind a proxy, run uvicorn with --proxy-headers so this is the real client)
+    key = Headers(scope=scope).get("x-api-key")
+    if key and key in keys:
+        return "key:" + key
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+class TokenBuckets:
+    '''
+    name -> (tokens, last refill); refilled lazily when the name is next seen, so an idle client costs nothing
+    '''
+    def __init__(self, maxsize=MAX_CLIENTS):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, name, rate, burst, now):
+        '''
+        take one token: 0 when there was one, else the seconds until there will be
+        '''
+        with self._lock:
+            tokens, last = self._buckets.get(name, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[name] = (tokens, now)
+            self._buckets.move_to_end(name)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+class RateLimiter:
+    '''
+    limits and counters shared by the middleware and GET /limits/stats
+    the limit of a request is its endpoint's @rate_limit, a RATE_LIMIT_ROUTES entry or the default
+    '''
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST, routes=RATE_LIMIT_ROUTES,
+                 keys=RATE_LIMIT_KEYS, exempt_keys=RATE_LIMIT_EXEMPT_KEYS):
+        self.default = (rate, burst)
+        self.enabled = rate > 0
+        self.overrides = parse_routes(routes)
+        self.keys = parse_keys(keys) | parse_keys(exempt_keys)
+        self.exempt = {"key:" + key for key in parse_keys(exempt_keys)}
+        self.buckets = TokenBuckets()
+        self._paths = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+        self.seconds = 0.0
+
+    def limit_of(self, route):
+        # (bucket group, (rate, burst)); None instead of the pair when the request is not limited
+        path = getattr(route, "path", None)
+        if path in self.overrides:
+            return path, self.overrides[path]
+        endpoint = getattr(route, "endpoint", None)
+        if hasattr(endpoint, "rate_limit"):
+            return path, endpoint.rate_limit
+        return "*", self.default
+
+    def path_limit(self, scope):
+        # the route match costs a regex per route until one matches, the remembered answer a dict lookup
+        key = (scope["method"], scope["path"])
+        found = self._paths.get(key)
+        if found is None:
+            found = self._paths[key] = self.limit_of(route_of(scope))
+            if len(self._paths) > MAX_PATHS:
+                self._paths.popitem(last=False)
+        else:
+            self._paths.move_to_end(key)
+        return found
+
+    def check(self, scope):
+        '''
+        (seconds until the client may retry or 0, the limit that applied)
+        '''
+        start = time.perf_counter()
+        group, limit = self.path_limit(scope)
+        wait = 0.0
+        if limit is not None:
+            client = client_of(scope, self.keys)
+            if client not in self.exempt:
+                wait = self.buckets.take((client, group), limit[0], limit[1], time.monotonic())
+        if wait:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        self.seconds += time.perf_counter() - start
+        return wait, limit
+
+    def stats(self):
+        checked = self.allowed + self.limited
+        return {
+            "enabled": self.enabled,
+            "rate": self.default[0],
+            "burst": self.default[1],
+            "routes": {path: list(limit) if limit else None for path, limit in self.overrides.items()},
+            "keys": len(self.keys),
+            "exempt_keys": len(self.exempt),
+            "clients": len(self.buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            # time the check adds to a request, on average
+            "overhead_us": round(self.seconds / checked * 1e6, 2) if checked else 0.0,
+        }
+
+def route_of(scope):
+    # the same first full match the router will make (the router only runs after the middleware)
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+    return None
+
+class RateLimitMiddleware:
+    '''
+    ASGI middleware answering 429 (with Retry-After) to a client that used up its bucket,
+    before the request reaches the endpoint or the database
+    '''
+    def __init__(self, app, limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+        wait, limit = self.limiter.check(scope)
+        if wait:
+            response = JSONResponse(
+                {"detail": f"rate limit of {limit[0]:g} requests per second exceeded"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+# one per process, shared by the middleware and /limits/stats
+limiter = RateLimiter()
@@ -1,22 +1,91 @@
 # frontend --> api --> logic --> db --> response
 # api/main.py
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-import sys, os
+from typing import List, Optional
+from datetime import date, datetime
+import sys, os, csv, io, json, asyncio, logging
 
 # Import taskmanager from src/logic.py - Updated for deployment
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 try:
-    from src.logic import ProjectManager, TaskManager, UserManager
+    from src.logic import AsyncProjectManager, AsyncSearchManager, AsyncStatsManager, AsyncTaskManager, AsyncUserManager, SinceExpired, cache, written_elsewhere
+    from API.responses import CompressionMiddleware, FastJSONResponse, Rendered, compress, dumps, rendered
+    from src import metrics
+    from src.events import hub
+    from src.peers import peers
+    from src.idempotency import IdempotencyError, store as idempotency
+    from src.admission import Overloaded
+    from src.db import RejectedWrite
+    from API.limits import RateLimitMiddleware, limiter, rate_limit
+    from API.serve import setup_logging
 except ImportError:
     # Fallback for deployment environments
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from src.logic import ProjectManager, TaskManager, UserManager
+    from src.logic import AsyncProjectManager, AsyncSearchManager, AsyncStatsManager, AsyncTaskManager, AsyncUserManager, SinceExpired, cache, written_elsewhere
+    from API.responses import CompressionMiddleware, FastJSONResponse, Rendered, compress, dumps, rendered
+    from src import metrics
+    from src.events import hub
+    from src.peers import peers
+    from src.idempotency import IdempotencyError, store as idempotency
+    from src.admission import Overloaded
+    from src.db import RejectedWrite
+    from API.limits import RateLimitMiddleware, limiter, rate_limit
+    from API.serve import setup_logging
 
-app = FastAPI(title="Project Management API", version="1.0")
+logger = logging.getLogger("API.main")
 
+# seconds /readyz (and the startup warmup) wait for the database to answer
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "2"))
+# seconds between keep-alive comments on an idle /events stream, so proxies do not close it
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+# rows of each list the startup warmup reads: the first page, not the whole table
+WARMUP_PAGE = 100
+
+async def check_database():
+    # every manager shares one database manager, so one ping covers them all
+    await asyncio.wait_for(task_manager.db.ping(), READY_TIMEOUT)
+
+def warmup_enabled():
+    # WARMUP=1 loads the reads every dashboard starts with (and the search index) before taking
+    # traffic; read at startup, not import, because API/serve.py (which python API/main.py runs)
+    # turns it on after this module is imported
+    return os.getenv("WARMUP", "0") == "1"
+
+async def warm_up():
+    # first page of every list, the dashboard counts and the search index, all at once
+    await asyncio.gather(
+        task_manager.get_tasks(limit=WARMUP_PAGE), project_manager.get_projects(limit=WARMUP_PAGE),
+        user_manager.get_users(limit=WARMUP_PAGE), stats_manager.get_stats(), search_manager.sync(),
+    )
+
+@asynccontextmanager
+async def lifespan(app):
+    # open the shared database connection before the first request instead of during it;
+    # an unreachable database only makes /readyz fail, the api itself still starts
+    setup_logging(os.getenv("LOG_LEVEL", "info"))
+    try:
+        await check_database()
+        if warmup_enabled():
+            await warm_up()
+            logger.info("warmed up: %s cached reads", cache.stats()["size"])
+    except Exception:
+        logger.exception("database warmup failed")
+    # writes made by the other workers of API/serve.py (nothing to listen to in a single process)
+    peers.listen(asyncio.get_running_loop(), written_elsewhere)
+    yield
+    # close the async database connection (and its worker thread) on shutdown,
+    # after writing any task updates still buffered by write-behind mode
+    await task_manager.db.close()
+
+app = FastAPI(title="Project Management API", version="1.0", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+#per-client token buckets, innermost so a 429 still gets the CORS headers
+app.add_middleware(RateLimitMiddleware, limiter=limiter)
 #allow frontend to access api
 app.add_middleware(
     CORSMiddleware,
@@ -25,11 +94,40 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+#gzip/brotli for responses above COMPRESS_MIN_SIZE bytes (per endpoint with @compress)
+app.add_middleware(CompressionMiddleware)
+#request latency and response size histograms for /metrics (outermost, so it sees the bytes actually sent)
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    # DB_CONCURRENCY calls are running and the wait queue is full (or the wait took too long):
+    # fail fast instead of piling more work on the database
+    return FastJSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(RejectedWrite)
+async def rejected_write(request: Request, exc: RejectedWrite):
+    # e.g. an update naming a column the table does not have
+    return FastJSONResponse({"detail": str(exc)}, status_code=400)
 
-#creating a task manager instance
-task_manager = TaskManager()
-project_manager = ProjectManager()
-user_manager = UserManager()
+@app.exception_handler(SinceExpired)
+async def since_expired(request: Request, exc: SinceExpired):
+    # the deletions since updated_since were pruned: the client reloads the table in full
+    return FastJSONResponse({"detail": str(exc)}, status_code=410)
+
+#creating the manager instances (async, so handlers never block a worker thread on the database)
+task_manager = AsyncTaskManager()
+project_manager = AsyncProjectManager()
+user_manager = AsyncUserManager()
+stats_manager = AsyncStatsManager()
+search_manager = AsyncSearchManager()
+
+# largest page a client can ask for in one list request
+MAX_PAGE_SIZE = 1000
+# most results one search returns
+MAX_SEARCH_RESULTS = 100
+# most items a single bulk request may carry
+MAX_BULK_SIZE = 1000
 
 #data models
 class TaskCreate(BaseModel):
@@ -63,8 +161,120 @@ class UserCreate(BaseModel):
     password_hash: str
     role: str
 
+class BulkUpdate(BaseModel):
+    '''
+    schema for applying the same update to many records'''
+    ids: List[str]
+    data: dict
+
+class BulkDelete(BaseModel):
+    '''
+    schema for deleting many records'''
+    ids: List[str]
+
+# reads are rendered once as they are loaded: every cache hit reuses the json body and its ETag
+cache.seal = rendered
+
+def conditional(request, response, content):
+    '''
+    the response of a read with its ETag, or a 304 when the client already has that ETag
+    (the read is usually a cache hit that was rendered when it was loaded, so an unchanged
+    poll costs no query, no serialization and no body)
+    '''
+    if not isinstance(content, Rendered):
+        content = Rendered(content)
+    headers = {"ETag": content.etag, "Cache-Control": "no-cache"}
+    tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if content.etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return json_response(content, response)
+
+async def idempotent(endpoint, key, payload, response, create):
+    '''
+    run a create once per Idempotency-Key: a retry with the same key and body gets the
+    first result back (marked Idempotent-Replayed) without another insert
+    '''
+    try:
+        result, replayed = await idempotency.run(endpoint, key, payload, create)
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+# media type of each export format
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def csv_value(value):
+    # lists (team_members) and dicts go into a single csv cell as json
+    return json.dumps(value) if isinstance(value, (list, dict)) else value
+
+async def encode_export(pages, format):
+    '''
+    turn pages of rows into ndjson lines or csv text, one chunk per page,
+    so the body is sent as it is read instead of being built in memory
+    '''
+    header = None
+    async for rows in pages:
+        if format == "ndjson":
+            yield b"".join(dumps(row) + b"\n" for row in rows)
+            continue
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header is None:
+            header = list(rows[0])
+            writer.writerow(header)
+        writer.writerows([csv_value(row.get(column)) for column in header] for row in rows)
+        yield buffer.getvalue()
+
+def export_response(pages, entity, format):
+    return StreamingResponse(
+        encode_export(pages, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{entity}.{format}"'},
+    )
+
+def json_response(content, response):
+    '''
+    render a list response straight to json, keeping the headers set on `response`
+    (skips FastAPI's jsonable_encoder pass over every row, the slowest part of a large listing)
+    '''
+    return FastJSONResponse(content, headers=dict(response.headers))
+
+def sse_frame(event):
+    # one server-sent event: the id is what a reconnecting client sends back as Last-Event-ID
+    name = "resync" if event["action"] == "resync" else "change"
+    return f"id: {event['id']}\nevent: {name}\ndata: ".encode() + dumps(event) + b"\n\n"
+
+async def event_stream(request, subscription):
+    '''
+    server-sent events from one hub subscription until the client goes away
+    '''
+    try:
+        # how long a client waits before reconnecting after the stream drops (ms)
+        yield b"retry: 2000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": keepalive\n\n"
+                continue
+            if event is None:
+                # the server is shutting down (hub.close()); the client reconnects elsewhere
+                break
+            yield sse_frame(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+def check_bulk_size(items):
+    if len(items) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_SIZE} items per bulk request")
+
 @app.get("/")
-def home():
+async def home():
     '''
     check if the api is running
     '''
@@ -73,123 +283,502 @@ def home():
         "status": "running",
         "docs": "/docs"
     }
+@app.get("/healthz")
+@rate_limit(None)
+async def healthz():
+    '''
+    liveness: the process is up and serving requests (the database is not checked)
+    '''
+    return {"status": "ok"}
+
+@app.get("/readyz")
+@rate_limit(None)
+async def readyz():
+    '''
+    readiness: the database answers a trivial query within READY_TIMEOUT seconds, 503 otherwise
+    '''
+    try:
+        await check_database()
+    except Exception as e:
+        return FastJSONResponse({"status": "unavailable", "detail": str(e) or type(e).__name__}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    '''
+    hit/miss counters of the read cache, used to size CACHE_MAX_ENTRIES and CACHE_TTL
+    '''
+    return cache.stats()
+
+@app.get("/events")
+@compress(None)
+async def events(request: Request, last_event_id: Optional[int] = Header(None)):
+    '''
+    server-sent events: one "change" event per write ({"table", "action", "ids"}), so clients
+    refresh only when something changed instead of polling; a client that falls too far behind
+    (or reconnects with a Last-Event-ID that is no longer kept) gets a "resync" event instead
+    '''
+    subscription = hub.subscribe(last_event_id)
+    return StreamingResponse(
+        event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/writes/stats")
+async def write_stats():
+    '''
+    buffered task updates, merges and bulk statements of write-behind mode (WRITE_BEHIND_MS)
+    '''
+    stats = getattr(task_manager.db, "stats", None)
+    return stats() if stats else {"enabled": False}
+
+@app.get("/idempotency/stats")
+async def idempotency_stats():
+    '''
+    remembered Idempotency-Keys, replayed retries and key reuse conflicts of the create endpoints
+    '''
+    return idempotency.stats()
+
+@app.get("/limits/stats")
+async def limits_stats():
+    '''
+    rate limiter counters (and the time it adds per request) and the database concurrency gate
+    '''
+    admission = getattr(task_manager.db, "admission", None)
+    return {"rate": limiter.stats(), "database": admission.stats() if admission else {"enabled": False}}
+
+@app.get("/events/stats")
+async def events_stats():
+    '''
+    subscriber count, published events and queued backlog of the /events hub
+    '''
+    return hub.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+@compress(None)
+@rate_limit(None)
+async def get_metrics():
+    '''
+    request, database call, row count and response size histograms in the prometheus text format
+    '''
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+async def get_stats(request: Request, response: Response):
+    '''
+    dashboard counts: tasks by status/assignee/project, projects by status/owner, users by role
+    '''
+    result = await stats_manager.get_stats()
+    return conditional(request, response, result)
+
+@app.get("/projects/{project_id}/stats")
+async def get_project_stats(project_id: str, request: Request, response: Response):
+    '''
+    task counts of one project by status and assignee
+    '''
+    result = await stats_manager.get_project_stats(project_id)
+    return conditional(request, response, result)
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    type: Optional[str] = None,
+):
+    '''
+    tasks and projects whose title/name or description contain every word of q (words may be prefixes),
+    best matches first; type=task or type=project searches only one of them
+    '''
+    try:
+        return await search_manager.search(q, limit, type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/tasks")
-def get_tasks():
+@compress(512)  # rows of json shrink well even in short pages
+async def get_tasks(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    status: Optional[str] = None,
+    project_id: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    due_before: Optional[date] = None,
+    due_after: Optional[date] = None,
+    order_by: Optional[str] = None,
+    fields: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+):
+    '''
+    get all tasks, or one page of them when `limit` is given
+    pass the returned next_cursor as `after` to get the next page
+    filter by status/project_id/assigned_to/due date, sort with order_by (prefix "-" for descending)
+    and pick columns with fields=id,title,...
+    with updated_since only changed tasks come back, plus the `deleted` ids and the `next_since` to poll with
+    '''
+    try:
+        result = await task_manager.get_tasks(
+            limit, after, status=status, project_id=project_id, assigned_to=assigned_to,
+            due_before=str(due_before) if due_before else None,
+            due_after=str(due_after) if due_after else None,
+            order_by=order_by, fields=fields, updated_since=updated_since,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional(request, response, result)
+
+@app.get("/tasks/overdue")
+@compress(512)
+async def get_overdue_tasks(
+    request: Request,
+    response: Response,
+    project_id: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     '''
-    get all tasks
+    open (not completed) tasks due before today (utc), oldest due date first
+    optionally for one project or assignee; pages and fields work as on GET /tasks
     '''
-    return task_manager.get_tasks()
+    try:
+        result = await task_manager.get_overdue_tasks(project_id, assigned_to, limit, after, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional(request, response, result)
+
+@app.get("/tasks/upcoming")
+@compress(512)
+async def get_upcoming_tasks(
+    request: Request,
+    response: Response,
+    within: str = "7d",
+    project_id: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    '''
+    open tasks due from today to `within` ahead (7d, 2w or a number of days), soonest first
+    '''
+    try:
+        result = await task_manager.get_upcoming_tasks(within, project_id, assigned_to, limit, after, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional(request, response, result)
+
+@app.get("/tasks/export")
+@rate_limit(1, 3)  # a whole table per request: far fewer than list reads
+async def export_tasks(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    project_id: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    due_before: Optional[date] = None,
+    due_after: Optional[date] = None,
+    fields: Optional[str] = None,
+):
+    '''
+    stream every matching task as ndjson (one json object per line) or csv,
+    read from the database a chunk at a time
+    '''
+    try:
+        pages = task_manager.export_tasks(
+            status=status, project_id=project_id, assigned_to=assigned_to,
+            due_before=str(due_before) if due_before else None,
+            due_after=str(due_after) if due_after else None,
+            fields=fields,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return export_response(pages, "tasks", format)
+
 @app.post("/tasks")
-def create_task(task: TaskCreate):
+async def create_task(task: TaskCreate, response: Response, idempotency_key: Optional[str] = Header(None)):
     '''
-    create a new task
+    create a new task; send an Idempotency-Key to make retries safe
     '''
-    result = task_manager.add_task(task.project_id, task.title, task.description, task.assigned_to, task.due_date, task.status)
+    result = await idempotent("/tasks", idempotency_key, task.model_dump(), response, lambda: task_manager.add_task(task.project_id, task.title, task.description, task.assigned_to, task.due_date, task.status))
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
+@app.post("/tasks/bulk")
+async def create_tasks_bulk(tasks: List[TaskCreate], response: Response, idempotency_key: Optional[str] = Header(None)):
+    '''
+    create many tasks with one insert, returns a result per item
+    '''
+    check_bulk_size(tasks)
+    rows = [task.model_dump() for task in tasks]
+    return await idempotent("/tasks/bulk", idempotency_key, rows, response, lambda: task_manager.add_tasks(rows))
+
+@app.patch("/tasks/bulk")
+async def update_tasks_bulk(bulk: BulkUpdate):
+    '''
+    apply the same update to many tasks, returns a result per id
+    '''
+    check_bulk_size(bulk.ids)
+    result = await task_manager.update_tasks(bulk.ids, bulk.data)
+    if "results" not in result:
+        raise HTTPException(status_code=400, detail=result.get("message"))
+    return result
+
+@app.delete("/tasks/bulk")
+async def delete_tasks_bulk(bulk: BulkDelete):
+    '''
+    delete many tasks, returns a result per id
+    '''
+    check_bulk_size(bulk.ids)
+    return await task_manager.remove_tasks(bulk.ids)
+
 @app.put("/tasks/{task_id}")
-def update_task(task_id: str, task: dict):
+async def update_task(task_id: str, task: dict):
     '''
     update a task with new data
     '''
-    result = task_manager.update_task(task_id, task)
+    result = await task_manager.update_task(task_id, task)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
 
 @app.put("/tasks/{task_id}/status")
-def update_task_status(task_id: str, task: TaskUpdate):
+async def update_task_status(task_id: str, task: TaskUpdate):
     '''
     mark it as complete or pending
     '''
     result = (
-        task_manager.mark_complete(task_id)
-        if task.completed else task_manager.mark_pending(task_id)
+        await task_manager.mark_complete(task_id)
+        if task.completed else await task_manager.mark_pending(task_id)
     )
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
 @app.delete("/tasks/{task_id}")
-def delete_task(task_id: str):
+async def delete_task(task_id: str):
     '''
     delete a task
     '''
-    result = task_manager.remove_task(task_id)
+    result = await task_manager.remove_task(task_id)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
 
 # More endpoints for projects and users can be added similarly
 @app.get("/projects")
-def get_projects():
+@compress(512)  # rows of json shrink well even in short pages
+async def get_projects(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    status: Optional[str] = None,
+    owner_id: Optional[str] = None,
+    order_by: Optional[str] = None,
+    fields: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+):
     '''
-    get all projects
+    get all projects, or one page of them when `limit` is given
+    pass the returned next_cursor as `after` to get the next page
+    filter by status/owner_id, sort with order_by and pick columns with fields
+    with updated_since only changed projects come back, plus the `deleted` ids and the `next_since` to poll with
+    '''
+    try:
+        result = await project_manager.get_projects(
+            limit, after, status=status, owner_id=owner_id, order_by=order_by, fields=fields, updated_since=updated_since,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional(request, response, result)
+
+@app.get("/projects/export")
+@rate_limit(1, 3)
+async def export_projects(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    owner_id: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     '''
-    return project_manager.get_projects()
+    stream every matching project as ndjson or csv
+    '''
+    try:
+        pages = project_manager.export_projects(status=status, owner_id=owner_id, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return export_response(pages, "projects", format)
+
+@app.get("/projects/{project_id}/full")
+@compress(512)
+async def get_project_detail(project_id: str, request: Request, response: Response):
+    '''
+    one project with its owner, its tasks and each assignee's name and email,
+    so a project view needs one request instead of one per table
+    '''
+    result = await project_manager.get_project_detail(project_id)
+    if not result.get("success"):
+        raise HTTPException(status_code=404, detail=result.get("message"))
+    return conditional(request, response, result)
+
 @app.post("/projects")
-def create_project(project: ProjectCreate):
+async def create_project(project: ProjectCreate, response: Response, idempotency_key: Optional[str] = Header(None)):
     '''
-    create a new project
+    create a new project; send an Idempotency-Key to make retries safe
     '''
-    result = project_manager.add_project(project.name, project.description, project.owner_id, project.start_date, project.end_date, project.status)
+    result = await idempotent("/projects", idempotency_key, project.model_dump(), response, lambda: project_manager.add_project(project.name, project.description, project.owner_id, project.start_date, project.end_date, project.status))
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
+@app.post("/projects/bulk")
+async def create_projects_bulk(projects: List[ProjectCreate], response: Response, idempotency_key: Optional[str] = Header(None)):
+    '''
+    create many projects with one insert, returns a result per item
+    '''
+    check_bulk_size(projects)
+    rows = [project.model_dump() for project in projects]
+    return await idempotent("/projects/bulk", idempotency_key, rows, response, lambda: project_manager.add_projects(rows))
+
+@app.patch("/projects/bulk")
+async def update_projects_bulk(bulk: BulkUpdate):
+    '''
+    apply the same update to many projects, returns a result per id
+    '''
+    check_bulk_size(bulk.ids)
+    result = await project_manager.update_projects(bulk.ids, bulk.data)
+    if "results" not in result:
+        raise HTTPException(status_code=400, detail=result.get("message"))
+    return result
+
+@app.delete("/projects/bulk")
+async def delete_projects_bulk(bulk: BulkDelete):
+    '''
+    delete many projects, returns a result per id
+    '''
+    check_bulk_size(bulk.ids)
+    return await project_manager.remove_projects(bulk.ids)
+
 @app.put("/projects/{project_id}")
-def update_project(project_id: str, project: dict):
+async def update_project(project_id: str, project: dict):
     '''
     update a project
     '''
-    result = project_manager.update_project(project_id, project)
+    result = await project_manager.update_project(project_id, project)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
 @app.delete("/projects/{project_id}")
-def delete_project(project_id: str):
+async def delete_project(project_id: str):
     '''
     delete a project
     '''
-    result = project_manager.remove_project(project_id)
+    result = await project_manager.remove_project(project_id)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
 @app.get("/users")
-def get_users():
+@compress(512)  # rows of json shrink well even in short pages
+async def get_users(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    role: Optional[str] = None,
+    order_by: Optional[str] = None,
+    fields: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+):
+    '''
+    get all users, or one page of them when `limit` is given
+    pass the returned next_cursor as `after` to get the next page
+    filter by role, sort with order_by and pick columns with fields
+    with updated_since only changed users come back, plus the `deleted` ids and the `next_since` to poll with
+    '''
+    try:
+        result = await user_manager.get_users(
+            limit, after, role=role, order_by=order_by, fields=fields, updated_since=updated_since,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional(request, response, result)
+
+@app.get("/users/export")
+@rate_limit(1, 3)
+async def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    role: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     '''
-    get all users
+    stream every matching user as ndjson or csv (never includes password hashes)
     '''
-    return user_manager.get_users()
+    try:
+        pages = user_manager.export_users(role=role, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return export_response(pages, "users", format)
+
 @app.post("/users")
-def create_user(user: UserCreate):
+async def create_user(user: UserCreate, response: Response, idempotency_key: Optional[str] = Header(None)):
     '''
-    create a new user
+    create a new user; send an Idempotency-Key to make retries safe
     '''
-    result = user_manager.add_user(user.name, user.email, user.password_hash, user.role)
+    result = await idempotent("/users", idempotency_key, user.model_dump(), response, lambda: user_manager.add_user(user.name, user.email, user.password_hash, user.role))
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
+@app.post("/users/bulk")
+async def create_users_bulk(users: List[UserCreate], response: Response, idempotency_key: Optional[str] = Header(None)):
+    '''
+    create many users with one insert, returns a result per item
+    '''
+    check_bulk_size(users)
+    rows = [user.model_dump() for user in users]
+    return await idempotent("/users/bulk", idempotency_key, rows, response, lambda: user_manager.add_users(rows))
+
+@app.patch("/users/bulk")
+async def update_users_bulk(bulk: BulkUpdate):
+    '''
+    apply the same update to many users, returns a result per id
+    '''
+    check_bulk_size(bulk.ids)
+    result = await user_manager.update_users(bulk.ids, bulk.data)
+    if "results" not in result:
+        raise HTTPException(status_code=400, detail=result.get("message"))
+    return result
+
+@app.delete("/users/bulk")
+async def delete_users_bulk(bulk: BulkDelete):
+    '''
+    delete many users, returns a result per id
+    '''
+    check_bulk_size(bulk.ids)
+    return await user_manager.remove_users(bulk.ids)
+
 @app.put("/users/{user_id}")
-def update_user(user_id: str, user: dict):
+async def update_user(user_id: str, user: dict):
     '''
     update a user
     '''
-    result = user_manager.update_user(user_id, user)
+    result = await user_manager.update_user(user_id, user)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
 @app.delete("/users/{user_id}")
-def delete_user(user_id: str):
+async def delete_user(user_id: str):
     '''
     delete a user
     '''
-    result = user_manager.remove_user(user_id)
+    result = await user_manager.remove_user(user_id)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("message"))
     return result
 
 if __name__ == "__main__":
-    import uvicorn
-    import os
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # one worker on PORT, warmed up (serve.main sets WARMUP=1) before it takes traffic;
+    # idempotency keys and rate limits are per process, so several workers
+    # (WEB_CONCURRENCY, or python -m API.serve) are opt-in
+    from API.serve import main
+    main(app, ["--workers", os.getenv("WEB_CONCURRENCY", "1")])
\ No newline at end of file
@@ -0,0 +1,183 @@
+# api/responses.py
+# how responses are encoded on the wire: orjson for json bodies, gzip/brotli compression
+
+import hashlib
+import json
+import os
+import zlib
+
+import anyio
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:  # plain json fallback, just slower
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# responses smaller than this (bytes) are sent uncompressed unless an endpoint says otherwise
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 5
+# brotli 11 is for static files, 4 compresses better than gzip at a similar speed
+BROTLI_QUALITY = 4
+# bodies above this (bytes) are compressed in a worker thread so the event loop keeps serving requests
+THREAD_COMPRESS_SIZE = 256 * 1024
+
+def dumps(content):
+    '''
+    json bytes of `content`, through orjson when it is installed
+    '''
+    if orjson is not None:
+        return orjson.dumps(content, default=str)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+class Rendered(dict):
+    '''
+    a read's response rendered once: its json `body` and a strong `etag` (a digest of the body,
+    so it changes with the data itself) are made when it is loaded and are cached with it
+    the dict is shared by every hit and never changed afterwards, so the body stays its json
+    '''
+    __slots__ = ("body", "etag")
+
+    def __init__(self, content):
+        super().__init__(content)
+        self.body = dumps(content)
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=12).hexdigest() + '"'
+
+def rendered(content):
+    # the TTLCache seal of the api: only response dicts are rendered
+    return Rendered(content) if type(content) is dict else content
+
+class FastJSONResponse(JSONResponse):
+    '''
+    JSONResponse rendered with orjson (several times faster on large lists),
+    or the body a Rendered response already has
+    '''
+    def render(self, content):
+        if isinstance(content, Rendered):
+            return content.body
+        return dumps(content)
+
+def compress(minimum_size):
+    '''
+    per-endpoint compression threshold in bytes, None never compresses that endpoint
+    usage: put @compress(256) under the @app.get(...) line
+    '''
+    def decorate(endpoint):
+        endpoint.compress_min_size = minimum_size
+        return endpoint
+    return decorate
+
+def pick_encoding(accept_encoding):
+    '''
+    "br" or "gzip" from an Accept-Encoding header, preferring brotli, or None
+    '''
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+class Compressor:
+    '''
+    incremental gzip/brotli encoder, flushed after every chunk so streamed bodies still arrive as they are sent
+    '''
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def chunk(self, data):
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+class CompressionMiddleware:
+    '''
+    compress responses the client accepts (brotli, else gzip) once they reach the size threshold
+    a whole body is compressed in one go, a streamed body (exports) chunk by chunk
+    '''
+    def __init__(self, app, minimum_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = pick_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # hold the headers until the first body chunk shows how big the body is
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                # scope["endpoint"] is filled in by the router by the time the response starts
+                minimum_size = getattr(scope.get("endpoint"), "compress_min_size", self.minimum_size)
+                headers = MutableHeaders(raw=start["headers"])
+                if (minimum_size is None or "content-encoding" in headers or start["status"] in (204, 304)
+                        or (not more_body and len(body) < minimum_size)):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    # another byte representation of the same data: the tag can only be weak now
+                    headers["ETag"] = "W/" + headers["etag"]
+                if more_body:
+                    del headers["content-length"]
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressor.chunk(body), "more_body": True})
+                    return
+                if len(body) > THREAD_COMPRESS_SIZE:
+                    body = await anyio.to_thread.run_sync(compressor.finish, body)
+                else:
+                    body = compressor.finish(body)
+                headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            data = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,350 @@
+# api serve.py
+# production launcher: binds the port and imports the app once, then forks WEB_CONCURRENCY uvicorn
+# workers that share the listening socket. the launcher replaces workers that exit (a crash, or
+# MAX_REQUESTS recycling), rolls them over one at a time on SIGHUP and relays every write between
+# them so their caches and /events streams stay coherent (src/peers.py)
+#
+#   python -m API.serve                              # one worker per core on PORT (default 8000)
+#   python -m API.serve --workers 4 --max-requests 10000
+#   kill -HUP <launcher pid>                         # rolling restart: a new worker is ready before an old one stops
+#   kill -TERM <launcher pid>                        # graceful stop: requests finish, buffered writes are flushed
+
+import argparse
+import json
+import logging
+import os
+import random
+import selectors
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.events import hub
+from src.peers import peers, socket_pair
+
+logger = logging.getLogger("API.serve")
+# every process logs with its pid, so the launcher's and each worker's lines can be told apart
+LOG_FORMAT = "%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s"
+
+# seconds an old worker gets to finish its requests (and flush write-behind) before it is killed
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# seconds a new worker may take to warm up during a rolling restart before it is given up on
+BOOT_TIMEOUT = float(os.getenv("BOOT_TIMEOUT", "60"))
+# a worker that dies sooner than this after starting is replaced after a growing pause,
+# so a database outage or a broken deploy does not fork workers in a tight loop
+MIN_UPTIME = 5
+MAX_BACKOFF = 30
+
+def default_workers():
+    # WEB_CONCURRENCY as set by most hosts, else the cores this process may run on
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="run the API in several worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers(), help="worker processes (WEB_CONCURRENCY, default one per core)")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("MAX_REQUESTS", "0")),
+                        help="requests after which a worker is replaced by a fresh one (MAX_REQUESTS, 0 never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("MAX_REQUESTS_JITTER", "0")),
+                        help="random extra requests per worker, so workers are not all recycled at once")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT)
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    return parser.parse_args(argv)
+
+def setup_logging(level="info"):
+    # a no-op when logging was already set up (by an embedding app, or earlier in this process)
+    logging.basicConfig(level=level.upper(), format=LOG_FORMAT)
+    # the supabase client logs every database request through httpx at info
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+def bind(host, port):
+    '''
+    the listening socket every worker accepts on; connections made while all workers are busy
+    (or restarting) wait in its backlog instead of being refused
+    '''
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+class WorkerServer(uvicorn.Server):
+    '''
+    uvicorn server of one worker: tells the launcher when it accepts connections and ends the
+    /events streams on shutdown, which would otherwise hold the graceful shutdown until its timeout
+    '''
+    async def startup(self, sockets=None):
+        # lifespan startup (database and cache warmup) runs before the sockets are served
+        await super().startup(sockets=sockets)
+        if self.started:
+            peers.ready(os.getpid())
+
+    def handle_exit(self, sig, frame):
+        hub.close()
+        super().handle_exit(sig, frame)
+
+class Worker:
+    def __init__(self, pid, channel, generation):
+        self.pid = pid
+        self.channel = channel
+        self.generation = generation
+        self.started = time.monotonic()
+        self.ready = False
+        self.stopping = False
+
+class Launcher:
+    '''
+    the parent process: keeps `workers` forks running and relays change messages between them
+    '''
+    def __init__(self, app, sock, options):
+        self.app = app
+        self.sock = sock
+        self.options = options
+        self.count = max(1, options.workers)
+        self.workers = {}
+        self.selector = selectors.DefaultSelector()
+        self.signals = []
+        self.generation = 0
+        # old workers still to be replaced by a rolling restart, and the (new pid, old pid) under way
+        self.replacing = []
+        self.pending = None
+        self.stopping = False
+        self.deadline = None
+        self.backoff = 0
+        self.next_spawn = 0.0
+        self.relayed = 0
+        self.dropped = 0
+
+    # --- worker processes ---
+
+    def spawn(self):
+        launcher_end, worker_end = socket_pair()
+        pid = os.fork()
+        if pid == 0:
+            launcher_end.close()
+            self.run_worker(worker_end)
+        worker_end.close()
+        launcher_end.setblocking(False)
+        self.workers[pid] = Worker(pid, launcher_end, self.generation)
+        self.selector.register(launcher_end, selectors.EVENT_READ, pid)
+        return pid
+
+    def run_worker(self, channel):
+        # in the child: drop the launcher's signal handling and its ends of the other channels
+        code = 0
+        try:
+            signal.set_wakeup_fd(-1)
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            for key in list(self.selector.get_map().values()):
+                key.fileobj.close()
+            self.selector.close()
+            peers.attach(channel)
+            limit = None
+            if self.options.max_requests > 0:
+                limit = self.options.max_requests + random.randint(0, max(0, self.options.max_requests_jitter))
+            config = uvicorn.Config(
+                self.app,
+                log_level=self.options.log_level,
+                limit_max_requests=limit,
+                timeout_graceful_shutdown=self.options.graceful_timeout,
+            )
+            WorkerServer(config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("worker stopped")
+            code = 1
+        finally:
+            # never return into the launcher's loop
+            os._exit(code)
+
+    def stop(self, pid, sig=signal.SIGTERM):
+        worker = self.workers.get(pid)
+        if worker is not None:
+            worker.stopping = True
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            self.selector.unregister(worker.channel)
+            worker.channel.close()
+            if worker.stopping or self.stopping:
+                continue
+            uptime = time.monotonic() - worker.started
+            code = os.waitstatus_to_exitcode(status)
+            if code == 0 and worker.ready:
+                # recycled after MAX_REQUESTS (or it stopped cleanly on its own)
+                logger.info("worker %s exited after %.0fs, replacing it", pid, uptime)
+            else:
+                logger.warning("worker %s died with code %s after %.0fs", pid, code, uptime)
+            if uptime < MIN_UPTIME:
+                self.backoff = min(MAX_BACKOFF, max(1, self.backoff * 2))
+                self.next_spawn = time.monotonic() + self.backoff
+
+    def fill(self):
+        # keep `count` workers that are not on their way out (one more during a rolling restart)
+        active = sum(1 for worker in self.workers.values() if not worker.stopping)
+        while active < self.count and time.monotonic() >= self.next_spawn:
+            self.spawn()
+            active += 1
+
+    # --- rolling restart ---
+
+    def reload(self):
+        self.generation += 1
+        self.replacing = [pid for pid, worker in self.workers.items() if not worker.stopping]
+        logger.info("rolling restart of %s workers", len(self.replacing))
+
+    def restart_step(self):
+        if self.pending is not None:
+            new, old = self.pending
+            worker = self.workers.get(new)
+            if worker is not None and worker.ready:
+                self.stop(old)
+                self.pending = None
+            elif worker is None or time.monotonic() - worker.started > BOOT_TIMEOUT:
+                # the replacement never came up: the old worker keeps serving, try again later
+                if worker is not None:
+                    self.stop(new, signal.SIGKILL)
+                self.replacing.insert(0, old)
+                self.pending = None
+                self.backoff = min(MAX_BACKOFF, max(1, self.backoff * 2))
+                self.next_spawn = time.monotonic() + self.backoff
+            return
+        while self.replacing and time.monotonic() >= self.next_spawn:
+            old = self.replacing.pop(0)
+            if old in self.workers and not self.workers[old].stopping:
+                self.pending = (self.spawn(), old)
+                return
+
+    # --- messages from the workers ---
+
+    def receive(self, pid):
+        worker = self.workers.get(pid)
+        while worker is not None:
+            try:
+                data = worker.channel.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if not data:
+                return
+            message = json.loads(data)
+            if "ready" in message:
+                worker.ready = True
+                self.backoff = 0
+            elif "change" in message:
+                self.relay(pid, data)
+
+    def relay(self, sender, data):
+        # every other worker, including ones still starting up or shutting down
+        for pid, worker in self.workers.items():
+            if pid == sender:
+                continue
+            try:
+                worker.channel.send(data)
+                self.relayed += 1
+            except OSError:
+                self.dropped += 1
+
+    # --- main loop ---
+
+    def on_signal(self, sig, frame):
+        self.signals.append(sig)
+
+    def shutdown(self):
+        if not self.stopping:
+            logger.info("stopping workers")
+            self.stopping = True
+            self.deadline = time.monotonic() + self.options.graceful_timeout + 5
+            for pid in list(self.workers):
+                self.stop(pid)
+
+    def run(self):
+        wakeup, wakeup_writer = socket.socketpair()
+        wakeup.setblocking(False)
+        wakeup_writer.setblocking(False)
+        self.selector.register(wakeup, selectors.EVENT_READ, None)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, self.on_signal)
+        signal.set_wakeup_fd(wakeup_writer.fileno())
+        logger.info("listening on %s:%s with %s workers", self.options.host, self.options.port, self.count)
+        self.fill()
+        while True:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.data is None:
+                    try:
+                        while wakeup.recv(512):
+                            pass
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                else:
+                    self.receive(key.data)
+            while self.signals:
+                sig = self.signals.pop(0)
+                if sig in (signal.SIGTERM, signal.SIGINT):
+                    self.shutdown()
+                elif sig == signal.SIGHUP and not self.stopping:
+                    self.reload()
+            self.reap()
+            if self.stopping:
+                if not self.workers:
+                    break
+                if time.monotonic() > self.deadline:
+                    logger.warning("killing %s workers that did not stop in time", len(self.workers))
+                    for pid in list(self.workers):
+                        self.stop(pid, signal.SIGKILL)
+                    self.deadline = float("inf")
+                continue
+            self.restart_step()
+            self.fill()
+        logger.info("stopped (relayed %s changes, dropped %s)", self.relayed, self.dropped)
+
+def main(app=None, argv=None):
+    '''
+    serve `app` (API.main:app by default) with the options of `argv` / the environment
+    '''
+    options = parse_args(argv)
+    # before the forks, so every worker inherits it
+    setup_logging(options.log_level)
+    # preload: everything is imported once here and shared copy-on-write by the forks;
+    # the database clients are created lazily, so each worker opens its own connections
+    os.environ.setdefault("WARMUP", "1")
+    if app is None:
+        from API.main import app
+    if options.workers <= 1 or not hasattr(os, "fork"):
+        # one process (and on windows, which cannot fork): plain uvicorn, same shutdown behaviour
+        config = uvicorn.Config(app, host=options.host, port=options.port, log_level=options.log_level,
+                                limit_max_requests=options.max_requests or None,
+                                timeout_graceful_shutdown=options.graceful_timeout)
+        WorkerServer(config).run()
+        return
+    Launcher(app, bind(options.host, options.port), options).run()
+
+if __name__ == "__main__":
+    main()
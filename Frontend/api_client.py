@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+# Seconds a GET response is reused across reruns and sessions before it is fetched again
+GET_CACHE_TTL = int(os.getenv("API_CACHE_TTL", "10"))
+# How many ETag-tagged GET responses are kept for revalidation with If-None-Match
+MAX_VALIDATORS = 256
+# Follow the API's /events stream and drop cached GETs when something changes (API_EVENTS=0 turns it off)
+USE_EVENTS = os.getenv("API_EVENTS", "1") != "0"
+# While the stream is connected, cached GETs are kept this long unless a change event makes them stale first
+EVENTS_CACHE_TTL = int(os.getenv("API_EVENTS_CACHE_TTL", "300"))
+# Sent as X-API-Key; the API exempts it from rate limiting when listed in its RATE_LIMIT_EXEMPT_KEYS
+API_KEY = os.getenv("API_KEY")
+# Seconds to wait before reconnecting a dropped /events stream
+EVENTS_RECONNECT_DELAY = 2
+
+# Which cached resources a write to a resource makes stale
+# (deleting a project removes its tasks, deleting a user unassigns their projects and tasks;
+# a project detail embeds all three, so any write makes it stale; search covers tasks and projects)
+AFFECTS = {
+    "tasks": ("tasks", "stats", "detail", "search"),
+    "projects": ("projects", "tasks", "stats", "detail", "search"),
+    "users": ("users", "projects", "tasks", "stats", "detail"),
+}
+
+
+class ApiResponse:
+    """Picklable snapshot of a requests.Response so it can live in st.cache_data"""
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = CaseInsensitiveDict(headers or {})
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(response.status_code, response.text, response.headers)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def __bool__(self):
+        # Same truthiness as requests.Response, so existing `if response:` checks behave the same
+        return self.ok
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _NotCached(Exception):
+    """Carries an error response out of the cached function so it is not cached"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+@st.cache_resource
+def get_session():
+    """One pooled keep-alive session per server process, shared by every rerun and session"""
+    session = requests.Session()
+    # Retry idempotent requests once or twice when a pooled keep-alive connection was dropped by the server
+    retries = Retry(total=2, backoff_factor=0.1, status_forcelist=(), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if API_KEY:
+        session.headers["X-API-Key"] = API_KEY
+    return session
+
+
+@st.cache_resource
+def _generations():
+    """Per-resource counters; bumping one makes every cached GET of that resource stale"""
+    return {}
+
+
+@st.cache_resource
+def _validators():
+    """Last ETag-tagged response per GET, sent back as If-None-Match when the cached copy expires"""
+    return OrderedDict()
+
+
+def mark_stale(generations, resource):
+    """Bump the generation of every cached resource a write to `resource` affects"""
+    for name in AFFECTS.get(resource, (resource,)):
+        generations[name] = generations.get(name, 0) + 1
+
+
+def mark_all_stale(generations):
+    for name in {name for names in AFFECTS.values() for name in names}:
+        generations[name] = generations.get(name, 0) + 1
+
+
+class EventListener:
+    """Background thread following GET /events; every change event marks the cached reads it affects as stale
+
+    One per server process, shared by all sessions. While it is connected, cached GETs only go
+    stale on a change (or after EVENTS_CACHE_TTL); when it is not, they expire after GET_CACHE_TTL.
+    """
+
+    def __init__(self, base_url, generations):
+        self.url = f"{base_url}/events"
+        self.generations = generations
+        self.connected = False
+        self.last_event_id = None
+        # Change events received, so pages can tell that something changed without asking the API
+        self.received = 0
+        threading.Thread(target=self._run, name="api-events", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self._follow()
+            except (requests.RequestException, ValueError):
+                pass
+            self.connected = False
+            time.sleep(EVENTS_RECONNECT_DELAY)
+
+    def _follow(self):
+        headers = {"Accept": "text/event-stream"}
+        if API_KEY:
+            headers["X-API-Key"] = API_KEY
+        if self.last_event_id is not None:
+            # The API replays what was missed while disconnected, or sends a resync
+            headers["Last-Event-ID"] = self.last_event_id
+        # The read timeout is well above the API's keep-alive interval, so only a dead connection hits it
+        with requests.get(self.url, headers=headers, stream=True, timeout=(5, 60)) as response:
+            if response.status_code != 200:
+                return
+            if self.last_event_id is None:
+                # Writes before the stream was open were never announced
+                mark_all_stale(self.generations)
+            self.connected = True
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("id:"):
+                    self.last_event_id = line[3:].strip()
+                elif line.startswith("data:"):
+                    self._apply(json.loads(line[5:]))
+
+    def _apply(self, event):
+        if event.get("action") == "resync":
+            mark_all_stale(self.generations)
+        else:
+            mark_stale(self.generations, event["table"])
+        self.received += 1
+
+
+@st.cache_resource
+def get_listener(base_url):
+    """The /events listener of this server process for an API"""
+    return EventListener(base_url, _generations())
+
+
+def freshness(listener):
+    """Extra cache key for GETs: changes every GET_CACHE_TTL seconds unless change events keep the cache current"""
+    if listener is not None and listener.connected:
+        return None
+    return int(time.monotonic() // max(GET_CACHE_TTL, 1))
+
+
+@st.cache_data(ttl=max(GET_CACHE_TTL, EVENTS_CACHE_TTL), max_entries=256, show_spinner=False)
+def _cached_get(url, params, generation, freshness, timeout):
+    validators = _validators()
+    key = (url, tuple(sorted(params.items())) if params else ())
+    stored = validators.get(key)
+    headers = {"If-None-Match": stored.headers["ETag"]} if stored is not None else None
+    raw = get_session().get(url, params=params, headers=headers, timeout=timeout)
+    if raw.status_code == 304 and stored is not None:
+        # Unchanged since the last fetch: the API sent no body, reuse the one we have
+        return stored
+    response = ApiResponse.from_response(raw)
+    if not response.ok:
+        raise _NotCached(response)
+    if "ETag" in response.headers:
+        validators[key] = response
+        validators.move_to_end(key)
+        while len(validators) > MAX_VALIDATORS:
+            validators.popitem(last=False)
+    return response
+
+
+def submission_key(path, json_data):
+    """Idempotency-Key of a create: the same for a resubmitted form until a create succeeds,
+    so a retry after a timeout gets the original result back instead of a duplicate row"""
+    nonce = st.session_state.setdefault("submission_nonce", uuid.uuid4().hex)
+    body = json.dumps(json_data, sort_keys=True, default=str)
+    return hashlib.blake2b(f"{nonce}|{path}|{body}".encode(), digest_size=16).hexdigest()
+
+
+def resource_of(path):
+    """Cache resource a path belongs to: "tasks", "projects", "users", "stats", "detail" or "root" """
+    segments = [segment for segment in path.split("?")[0].strip("/").split("/") if segment]
+    if "stats" in segments:
+        return "stats"
+    if segments[-1:] == ["full"]:
+        return "detail"
+    return segments[0] if segments else "root"
+
+
+class ApiClient:
+    """HTTP client for the ProjectDock API with pooled connections and cached GETs"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.events = get_listener(self.base_url) if USE_EVENTS else None
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def get(self, path, params=None, timeout=5):
+        """GET through the cache; raises requests.RequestException if the API is unreachable"""
+        resource = resource_of(path)
+        generation = _generations().get(resource, 0)
+        params = dict(params) if params else None
+        try:
+            return _cached_get(self.url(path), params, generation, freshness(self.events), timeout)
+        except _NotCached as e:
+            return e.response
+
+    def send(self, method, path, json_data=None, timeout=5):
+        """POST/PUT/PATCH/DELETE, then mark the cached reads it affects as stale"""
+        headers = {"Idempotency-Key": submission_key(path, json_data)} if method == "POST" else None
+        response = get_session().request(method, self.url(path), json=json_data, headers=headers, timeout=timeout)
+        if method == "POST" and response.ok:
+            # The next create is a new submission, even with the same field values
+            st.session_state.submission_nonce = uuid.uuid4().hex
+        self.invalidate(resource_of(path))
+        return ApiResponse.from_response(response)
+
+    def invalidate(self, resource):
+        mark_stale(_generations(), resource)
+
+    def live(self):
+        """Whether change events from the API are keeping the cached reads current"""
+        return self.events is not None and self.events.connected
+
+    def changes(self):
+        """Number of change events received so far (0 without the /events stream)"""
+        return self.events.received if self.events is not None else 0
+
+    def safe_request(self, path, method="GET", json_data=None, timeout=5, params=None):
+        """Make API request with error handling"""
+        try:
+            if method == "GET":
+                return self.get(path, params=params, timeout=timeout)
+            if method in ("POST", "PUT", "PATCH", "DELETE"):
+                return self.send(method, path, json_data=json_data, timeout=timeout)
+            return None
+        except requests.exceptions.RequestException:
+            st.error(f"❌ Could not connect to API: {self.base_url}")
+            st.info("💡 The backend API is not available. Please check if it's deployed and running.")
+            return None
+
+    def check_connection(self):
+        """Check if the API is accessible"""
+        try:
+            return self.get("/", timeout=5).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
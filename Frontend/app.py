@@ -1,7 +1,8 @@
 import streamlit as st
-import requests
 import pandas as pd
 import os
+from api_client import ApiClient
+from entity_store import get_store, position
 
 # API base URL - Use environment variable for deployment flexibility
 API_URL = os.getenv("API_URL", "https://projectdock-api.onrender.com/")
@@ -84,39 +85,15 @@ st.sidebar.markdown("✏️ **Edit** existing records")
 st.sidebar.markdown("🗑️ **Delete** records")
 st.sidebar.markdown("🎨 **Dark Theme** UI")
 
-# Add connection status check
-def check_api_connection():
-    """Check if the API is accessible"""
-    try:
-        response = requests.get(f"{API_URL}/", timeout=5)
-        return response.status_code == 200
-    except requests.exceptions.RequestException:
-        return False
-
-def safe_api_request(url, method="GET", json_data=None, timeout=5):
-    """Make API request with error handling"""
-    try:
-        if method == "GET":
-            response = requests.get(url, timeout=timeout)
-        elif method == "POST":
-            response = requests.post(url, json=json_data, timeout=timeout)
-        elif method == "PUT":
-            response = requests.put(url, json=json_data, timeout=timeout)
-        elif method == "DELETE":
-            response = requests.delete(url, timeout=timeout)
-        else:
-            return None
-        
-        return response
-    except requests.exceptions.RequestException as e:
-        st.error(f"❌ Could not connect to API: {API_URL}")
-        st.info("💡 The backend API is not available. Please check if it's deployed and running.")
-        return None
+# Shared API client: pooled keep-alive connections and cached GET responses
+api = ApiClient(API_URL)
+# Users, projects and tasks of this session keyed by id (see entity_store.py)
+store = get_store()
 
 # Display API connection status
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 🌐 API Status")
-if check_api_connection():
+if api.check_connection():
     st.sidebar.success("🟢 Connected")
     st.sidebar.caption(f"URL: {API_URL}")
 else:
@@ -124,6 +101,25 @@ else:
     st.sidebar.caption(f"URL: {API_URL}")
     st.sidebar.warning("Deploy your backend API to enable full functionality")
 
+# Seconds between local checks for change events pushed by the API (no request is sent)
+LIVE_REFRESH_SECONDS = 2
+
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_updates():
+    """Rerun the page when the API reports a change over /events, instead of polling it"""
+    changes = api.changes()
+    seen = st.session_state.setdefault("seen_changes", changes)
+    if changes != seen:
+        st.session_state.seen_changes = changes
+        st.rerun()
+
+
+if api.live():
+    st.sidebar.caption("⚡ Live updates on")
+    if st.sidebar.toggle("Refresh on change", value=True):
+        live_updates()
+
 # --- Helper Functions for API calls ---
 def handle_response(response, success_message):
     if response.status_code == 200:
@@ -146,26 +142,52 @@ def handle_response(response, success_message):
         st.error(f"Error: {error_detail}")
         return []
 
+def fetch_stats():
+    """Fetch dashboard counts from the API (one small response instead of whole tables)"""
+    response = api.safe_request("/stats")
+    if response and response.status_code == 200:
+        return response.json().get("data", {})
+    return None
+
+def fetch_entities(kind):
+    """Bring users, projects or tasks in the entity store up to date; returns the response (None if the API is unreachable)
+
+    The first call downloads the whole table, later ones only what changed since (updated_since)
+    """
+    since = store.since(kind)
+    if since is None:
+        response = api.safe_request(f"/{kind}")
+    else:
+        response = api.safe_request(f"/{kind}", params={"updated_since": since})
+        if response is not None and response.status_code == 410:
+            # The deletions since then were pruned from the API's tombstones: start over
+            store.forget(kind)
+            return fetch_entities(kind)
+    if response is not None and response.status_code == 200:
+        if since is None:
+            store.load(kind, response)
+        else:
+            store.merge(kind, response)
+    return response
+
 # --- Projects Page ---
 if page == "Projects":
     st.header("Projects")
     
     # Quick stats
-    projects_response = safe_api_request(f"{API_URL}/projects")
-    if projects_response and projects_response.status_code == 200:
-        projects_data = projects_response.json().get("data", [])
+    stats = fetch_stats()
+    if stats is not None:
+        project_stats = stats.get("projects", {})
+        by_status = project_stats.get("by_status", {})
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Projects", len(projects_data))
+            st.metric("Total Projects", project_stats.get("total", 0))
         with col2:
-            pending_count = len([p for p in projects_data if p.get("status") == "pending"])
-            st.metric("Pending", pending_count)
+            st.metric("Pending", by_status.get("pending", 0))
         with col3:
-            ongoing_count = len([p for p in projects_data if p.get("status") == "ongoing"])
-            st.metric("Ongoing", ongoing_count)
+            st.metric("Ongoing", by_status.get("ongoing", 0))
         with col4:
-            completed_count = len([p for p in projects_data if p.get("status") == "completed"])
-            st.metric("Completed", completed_count)
+            st.metric("Completed", by_status.get("completed", 0))
         st.markdown("---")
     else:
         # Show placeholder metrics when API is not available
@@ -183,9 +205,9 @@ if page == "Projects":
 
     # Fetch and display projects
     st.subheader("All Projects")
-    projects_response = safe_api_request(f"{API_URL}/projects")
+    projects_response = fetch_entities("projects")
     if projects_response and projects_response.status_code == 200:
-        projects = projects_response.json().get("data", [])
+        projects = list(store.projects.values())
         if projects:
             df = pd.DataFrame(projects)
             st.dataframe(df, use_container_width=True)
@@ -195,18 +217,39 @@ if page == "Projects":
             if projects:
                 project_to_manage = st.selectbox(
                     "Select Project to Edit/Delete:",
-                    options=[proj["id"] for proj in projects],
-                    format_func=lambda x: next(proj["name"] for proj in projects if proj["id"] == x)
+                    options=list(store.projects),
+                    format_func=store.project_label
                 )
                 
-                selected_project = next(proj for proj in projects if proj["id"] == project_to_manage)
-                
+                selected_project = store.projects[project_to_manage]
+
+                # Owner, tasks and assignees of the selected project in one request
+                detail_response = api.safe_request(f"/projects/{project_to_manage}/full")
+                if detail_response is not None and detail_response.status_code == 200:
+                    project_detail = detail_response.json().get("data", {})
+                    owner = project_detail.get("owner")
+                    st.write("### Project Details")
+                    st.write(f"**Owner:** {owner['name']} ({owner['email']})" if owner else "**Owner:** unassigned")
+                    project_tasks = project_detail.get("tasks", [])
+                    if project_tasks:
+                        st.dataframe(pd.DataFrame([
+                            {
+                                "Title": task["title"],
+                                "Status": task["status"],
+                                "Due Date": task["due_date"],
+                                "Assignee": f"{task['assignee']['name']} ({task['assignee']['email']})" if task.get("assignee") else "unassigned",
+                            }
+                            for task in project_tasks
+                        ]), use_container_width=True)
+                    else:
+                        st.info("No tasks in this project yet.")
+
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     if st.button("🗑️ Delete Project"):
-                        delete_response = requests.delete(f"{API_URL}/projects/{project_to_manage}")
-                        if delete_response.status_code == 200:
+                        delete_response = api.safe_request(f"/projects/{project_to_manage}", method="DELETE")
+                        if delete_response is not None and delete_response.status_code == 200:
                             result = delete_response.json()
                             if result.get("success"):
                                 st.success("Project deleted successfully!")
@@ -225,22 +268,18 @@ if page == "Projects":
                     st.write("### Edit Project")
                     with st.form(f"edit_project_form_{project_to_manage}"):
                         # Fetch users for dropdown
-                        users_resp = requests.get(f"{API_URL}/users")
-                        available_users = []
-                        if users_resp.status_code == 200:
-                            users_data = users_resp.json().get("data", [])
-                            available_users = [(user["id"], f"{user['name']} ({user['email']})") for user in users_data]
+                        fetch_entities("users")
+                        available_users = list(store.users)
                         
                         edit_name = st.text_input("Project Name", value=selected_project["name"])
                         edit_description = st.text_area("Description", value=selected_project.get("description", ""))
                         
                         if available_users:
-                            current_owner_index = next((i for i, user in enumerate(available_users) if user[0] == selected_project["owner_id"]), 0)
                             edit_owner = st.selectbox(
                                 "Project Owner",
-                                options=[user[0] for user in available_users],
-                                format_func=lambda x: next(user[1] for user in available_users if user[0] == x),
-                                index=current_owner_index
+                                options=available_users,
+                                format_func=store.user_label,
+                                index=position(available_users, selected_project["owner_id"])
                             )
                         else:
                             edit_owner = st.text_input("Owner ID", value=selected_project["owner_id"])
@@ -269,8 +308,8 @@ if page == "Projects":
                                 "status": edit_status
                             }
                             
-                            update_response = requests.put(f"{API_URL}/projects/{project_to_manage}", json=update_data)
-                            if update_response.status_code == 200:
+                            update_response = api.safe_request(f"/projects/{project_to_manage}", method="PUT", json_data=update_data)
+                            if update_response is not None and update_response.status_code == 200:
                                 result = update_response.json()
                                 if result.get("success"):
                                     st.success("Project updated successfully!")
@@ -310,11 +349,8 @@ if page == "Projects":
     st.subheader("Create New Project")
     
     # Fetch available users for the dropdown
-    users_response = safe_api_request(f"{API_URL}/users")
-    available_users = []
-    if users_response and users_response.status_code == 200:
-        users_data = users_response.json().get("data", [])
-        available_users = [(user["id"], f"{user['name']} ({user['email']})") for user in users_data]
+    users_response = fetch_entities("users")
+    available_users = list(store.users) if users_response else []
     
     with st.form("new_project_form"):
         name = st.text_input("Project Name")
@@ -323,8 +359,8 @@ if page == "Projects":
         if available_users:
             owner_option = st.selectbox(
                 "Project Owner", 
-                options=[user[0] for user in available_users],
-                format_func=lambda x: next(user[1] for user in available_users if user[0] == x)
+                options=available_users,
+                format_func=store.user_label
             )
             owner_id = owner_option
         elif users_response:  # API responded but no users found
@@ -348,8 +384,8 @@ if page == "Projects":
                 "end_date": str(end_date),
                 "status": status,
             }
-            if check_api_connection():
-                response = safe_api_request(f"{API_URL}/projects", method="POST", json_data=project_data)
+            if api.check_connection():
+                response = api.safe_request("/projects", method="POST", json_data=project_data)
                 if response:
                     handle_response(response, "Project created successfully!")
                 else:
@@ -365,28 +401,78 @@ elif page == "Tasks":
     st.header("Tasks")
     
     # Quick stats
-    tasks_response = requests.get(f"{API_URL}/tasks")
-    if tasks_response.status_code == 200:
-        tasks_data = tasks_response.json().get("data", [])
+    stats = fetch_stats()
+    if stats is not None:
+        task_stats = stats.get("tasks", {})
+        by_status = task_stats.get("by_status", {})
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Tasks", len(tasks_data))
+            st.metric("Total Tasks", task_stats.get("total", 0))
         with col2:
-            pending_count = len([t for t in tasks_data if t.get("status") == "pending"])
-            st.metric("Pending", pending_count)
+            st.metric("Pending", by_status.get("pending", 0))
         with col3:
-            in_progress_count = len([t for t in tasks_data if t.get("status") == "in-progress"])
-            st.metric("In Progress", in_progress_count)
+            st.metric("In Progress", by_status.get("in-progress", 0))
         with col4:
-            completed_count = len([t for t in tasks_data if t.get("status") == "completed"])
-            st.metric("Completed", completed_count)
+            st.metric("Completed", by_status.get("completed", 0))
         st.markdown("---")
 
+    # Deadlines: open tasks past due or due within a week, straight from the API's due-date queries
+    overdue_response = api.safe_request("/tasks/overdue", params={"fields": "id,title,due_date,status,assigned_to"})
+    upcoming_response = api.safe_request("/tasks/upcoming", params={"within": "7d", "fields": "id,title,due_date,status,assigned_to"})
+    if overdue_response is not None and upcoming_response is not None:
+        overdue = overdue_response.json().get("data", []) if overdue_response.status_code == 200 else []
+        upcoming = upcoming_response.json().get("data", []) if upcoming_response.status_code == 200 else []
+        with st.expander(f"⏰ Deadlines: {len(overdue)} overdue, {len(upcoming)} due within 7 days"):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Overdue**")
+                if overdue:
+                    st.dataframe(pd.DataFrame(overdue)[["title", "due_date", "status"]], use_container_width=True)
+                else:
+                    st.caption("Nothing overdue.")
+            with col2:
+                st.markdown("**Due within 7 days**")
+                if upcoming:
+                    st.dataframe(pd.DataFrame(upcoming)[["title", "due_date", "status"]], use_container_width=True)
+                else:
+                    st.caption("Nothing due this week.")
+
     # Fetch and display tasks
     st.subheader("All Tasks")
-    tasks_response = requests.get(f"{API_URL}/tasks")
-    if tasks_response.status_code == 200:
-        tasks = tasks_response.json().get("data", [])
+    tasks_response = fetch_entities("tasks")
+    if tasks_response is not None and tasks_response.status_code == 200:
+        # Narrow the list with the project/assignee indexes instead of scanning every task
+        fetch_entities("projects")
+        fetch_entities("users")
+        search_text = st.text_input("Search Tasks", placeholder="Words from the title or description")
+        filter_col1, filter_col2 = st.columns(2)
+        with filter_col1:
+            project_filter = st.selectbox(
+                "Filter by Project",
+                options=[None] + list(store.projects),
+                format_func=lambda x: "All projects" if x is None else store.project_label(x)
+            )
+        with filter_col2:
+            assignee_filter = st.selectbox(
+                "Filter by Assignee",
+                options=[None] + list(store.users),
+                format_func=lambda x: "Everyone" if x is None else store.user_label(x)
+            )
+        if project_filter is not None:
+            tasks = list(store.tasks_by_project.get(project_filter, {}).values())
+            if assignee_filter is not None:
+                tasks = [task for task in tasks if task.get("assigned_to") == assignee_filter]
+        elif assignee_filter is not None:
+            tasks = list(store.tasks_by_assignee.get(assignee_filter, {}).values())
+        else:
+            tasks = list(store.tasks.values())
+        if search_text.strip():
+            # Ranked by the API's search index; keep its order, limited to the filtered tasks
+            search_response = api.safe_request("/search", params={"q": search_text, "type": "task", "limit": 100})
+            if search_response is not None and search_response.status_code == 200:
+                shown = {task["id"] for task in tasks}
+                hits = [hit["id"] for hit in search_response.json().get("data", [])]
+                tasks = [store.tasks[task_id] for task_id in hits if task_id in shown and task_id in store.tasks]
         if tasks:
             df = pd.DataFrame(tasks)
             st.dataframe(df, use_container_width=True)
@@ -397,17 +483,17 @@ elif page == "Tasks":
                 task_to_manage = st.selectbox(
                     "Select Task to Edit/Delete:",
                     options=[task["id"] for task in tasks],
-                    format_func=lambda x: next(task["title"] for task in tasks if task["id"] == x)
+                    format_func=store.task_label
                 )
                 
-                selected_task = next(task for task in tasks if task["id"] == task_to_manage)
+                selected_task = store.tasks[task_to_manage]
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     if st.button("🗑️ Delete Task"):
-                        delete_response = requests.delete(f"{API_URL}/tasks/{task_to_manage}")
-                        if delete_response.status_code == 200:
+                        delete_response = api.safe_request(f"/tasks/{task_to_manage}", method="DELETE")
+                        if delete_response is not None and delete_response.status_code == 200:
                             result = delete_response.json()
                             if result.get("success"):
                                 st.success("Task deleted successfully!")
@@ -425,28 +511,16 @@ elif page == "Tasks":
                 if st.session_state.get("editing_task") == task_to_manage:
                     st.write("### Edit Task")
                     with st.form(f"edit_task_form_{task_to_manage}"):
-                        # Fetch projects and users for dropdowns
-                        projects_resp = requests.get(f"{API_URL}/projects")
-                        users_resp = requests.get(f"{API_URL}/users")
-                        
-                        available_projects = []
-                        available_users = []
-                        
-                        if projects_resp.status_code == 200:
-                            projects_data = projects_resp.json().get("data", [])
-                            available_projects = [(proj["id"], proj["name"]) for proj in projects_data]
-                        
-                        if users_resp.status_code == 200:
-                            users_data = users_resp.json().get("data", [])
-                            available_users = [(user["id"], f"{user['name']} ({user['email']})") for user in users_data]
+                        # Projects and users for the dropdowns come from the entity store
+                        available_projects = list(store.projects)
+                        available_users = list(store.users)
                         
                         if available_projects:
-                            current_project_index = next((i for i, proj in enumerate(available_projects) if proj[0] == selected_task["project_id"]), 0)
                             edit_project = st.selectbox(
                                 "Project",
-                                options=[proj[0] for proj in available_projects],
-                                format_func=lambda x: next(proj[1] for proj in available_projects if proj[0] == x),
-                                index=current_project_index
+                                options=available_projects,
+                                format_func=store.project_label,
+                                index=position(available_projects, selected_task["project_id"])
                             )
                         else:
                             edit_project = st.text_input("Project ID", value=selected_task["project_id"])
@@ -455,12 +529,11 @@ elif page == "Tasks":
                         edit_description = st.text_area("Description", value=selected_task.get("description", ""))
                         
                         if available_users:
-                            current_user_index = next((i for i, user in enumerate(available_users) if user[0] == selected_task["assigned_to"]), 0)
                             edit_assigned_to = st.selectbox(
                                 "Assigned to",
-                                options=[user[0] for user in available_users],
-                                format_func=lambda x: next(user[1] for user in available_users if user[0] == x),
-                                index=current_user_index
+                                options=available_users,
+                                format_func=store.user_label,
+                                index=position(available_users, selected_task["assigned_to"])
                             )
                         else:
                             edit_assigned_to = st.text_input("Assigned to", value=selected_task["assigned_to"])
@@ -488,8 +561,8 @@ elif page == "Tasks":
                                 "status": edit_status
                             }
                             
-                            update_response = requests.put(f"{API_URL}/tasks/{task_to_manage}", json=update_data)
-                            if update_response.status_code == 200:
+                            update_response = api.safe_request(f"/tasks/{task_to_manage}", method="PUT", json_data=update_data)
+                            if update_response is not None and update_response.status_code == 200:
                                 result = update_response.json()
                                 if result.get("success"):
                                     st.success("Task updated successfully!")
@@ -512,26 +585,18 @@ elif page == "Tasks":
     st.subheader("Create New Task")
     
     # Fetch available projects and users for dropdowns
-    projects_resp = requests.get(f"{API_URL}/projects")
-    users_resp = requests.get(f"{API_URL}/users")
+    projects_resp = fetch_entities("projects")
+    users_resp = fetch_entities("users")
     
-    available_projects = []
-    available_users = []
-    
-    if projects_resp.status_code == 200:
-        projects_data = projects_resp.json().get("data", [])
-        available_projects = [(proj["id"], proj["name"]) for proj in projects_data]
-    
-    if users_resp.status_code == 200:
-        users_data = users_resp.json().get("data", [])
-        available_users = [(user["id"], f"{user['name']} ({user['email']})") for user in users_data]
+    available_projects = list(store.projects) if projects_resp else []
+    available_users = list(store.users) if users_resp else []
     
     with st.form("new_task_form"):
         if available_projects:
             project_option = st.selectbox(
                 "Project", 
-                options=[proj[0] for proj in available_projects],
-                format_func=lambda x: next(proj[1] for proj in available_projects if proj[0] == x)
+                options=available_projects,
+                format_func=store.project_label
             )
             project_id = project_option
         else:
@@ -544,8 +609,8 @@ elif page == "Tasks":
         if available_users:
             user_option = st.selectbox(
                 "Assigned to", 
-                options=[user[0] for user in available_users],
-                format_func=lambda x: next(user[1] for user in available_users if user[0] == x)
+                options=available_users,
+                format_func=store.user_label
             )
             assigned_to = user_option
         else:
@@ -565,8 +630,9 @@ elif page == "Tasks":
                 "due_date": str(due_date),
                 "status": status,
             }
-            response = requests.post(f"{API_URL}/tasks", json=task_data)
-            handle_response(response, "Task created successfully!")
+            response = api.safe_request("/tasks", method="POST", json_data=task_data)
+            if response is not None:
+                handle_response(response, "Task created successfully!")
         elif submitted:
             st.error("Please fill in all required fields.")
 
@@ -575,25 +641,24 @@ elif page == "Users":
     st.header("Users")
     
     # Quick stats
-    users_response = requests.get(f"{API_URL}/users")
-    if users_response.status_code == 200:
-        users_data = users_response.json().get("data", [])
+    stats = fetch_stats()
+    if stats is not None:
+        user_stats = stats.get("users", {})
+        by_role = user_stats.get("by_role", {})
         col1, col2, col3 = st.columns([2, 1, 1])
         with col1:
-            st.metric("Total Users", len(users_data))
+            st.metric("Total Users", user_stats.get("total", 0))
         with col2:
-            admin_count = len([u for u in users_data if u.get("role") == "admin"])
-            st.metric("Admins", admin_count)
+            st.metric("Admins", by_role.get("admin", 0))
         with col3:
-            member_count = len([u for u in users_data if u.get("role") == "member"])
-            st.metric("Members", member_count)
+            st.metric("Members", by_role.get("member", 0))
         st.markdown("---")
 
     # Fetch and display users
     st.subheader("All Users")
-    users_response = requests.get(f"{API_URL}/users")
-    if users_response.status_code == 200:
-        users = users_response.json().get("data", [])
+    users_response = fetch_entities("users")
+    if users_response is not None and users_response.status_code == 200:
+        users = list(store.users.values())
         if users:
             # Create a display DataFrame without password_hash
             display_users = [{k: v for k, v in user.items() if k != 'password_hash'} for user in users]
@@ -605,18 +670,18 @@ elif page == "Users":
             if users:
                 user_to_manage = st.selectbox(
                     "Select User to Edit/Delete:",
-                    options=[user["id"] for user in users],
-                    format_func=lambda x: next(f"{user['name']} ({user['email']})" for user in users if user["id"] == x)
+                    options=list(store.users),
+                    format_func=store.user_label
                 )
                 
-                selected_user = next(user for user in users if user["id"] == user_to_manage)
+                selected_user = store.users[user_to_manage]
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     if st.button("🗑️ Delete User"):
-                        delete_response = requests.delete(f"{API_URL}/users/{user_to_manage}")
-                        if delete_response.status_code == 200:
+                        delete_response = api.safe_request(f"/users/{user_to_manage}", method="DELETE")
+                        if delete_response is not None and delete_response.status_code == 200:
                             result = delete_response.json()
                             if result.get("success"):
                                 st.success("User deleted successfully!")
@@ -660,8 +725,8 @@ elif page == "Users":
                             if edit_password.strip():
                                 update_data["password_hash"] = edit_password
                             
-                            update_response = requests.put(f"{API_URL}/users/{user_to_manage}", json=update_data)
-                            if update_response.status_code == 200:
+                            update_response = api.safe_request(f"/users/{user_to_manage}", method="PUT", json_data=update_data)
+                            if update_response is not None and update_response.status_code == 200:
                                 result = update_response.json()
                                 if result.get("success"):
                                     st.success("User updated successfully!")
@@ -689,12 +754,15 @@ elif page == "Users":
         role = st.selectbox("Role", ["admin", "member"])
         submitted = st.form_submit_button("Create User")
 
-        if submitted:
+        if submitted and store.user_by_email(email):
+            st.error("A user with this email already exists.")
+        elif submitted:
             user_data = {
                 "name": name,
                 "email": email,
                 "password_hash": password,  # In a real app, hash this properly
                 "role": role,
             }
-            response = requests.post(f"{API_URL}/users", json=user_data)
-            handle_response(response, "User created successfully!")
+            response = api.safe_request("/users", method="POST", json_data=user_data)
+            if response is not None:
+                handle_response(response, "User created successfully!")
@@ -0,0 +1,145 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+# Seconds of changes the first delta after a full load asks for again, like the API's SINCE_MARGIN:
+# a write stamped before the load may only commit after it
+SINCE_MARGIN = float(os.getenv("SINCE_MARGIN", "5"))
+
+
+def response_version(response):
+    """What identifies the data of a list response: its ETag, else a hash of the body"""
+    etag = response.headers.get("ETag")
+    if etag:
+        return etag
+    return hashlib.blake2b(response.text.encode(), digest_size=16).hexdigest()
+
+
+def newest(*stamps):
+    """Latest of some ISO timestamps (None ignored), compared as times rather than text"""
+    stamps = [stamp for stamp in stamps if stamp]
+    return max(stamps, key=datetime.fromisoformat) if stamps else None
+
+
+class EntityStore:
+    """Users, projects and tasks keyed by id, with secondary indexes for O(1) lookups
+
+    A table is loaded in full once, then kept current with updated_since deltas:
+    changed rows are upserted and deleted ids dropped, and the indexes are updated
+    row by row, so a refresh costs as much as what changed, not the table size.
+    Reruns that get the same response back (same ETag or body) skip the work.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.projects = {}
+        self.tasks = {}
+        self.users_by_email = {}
+        # project/assignee id -> {task id: task}
+        self.tasks_by_project = {}
+        self.tasks_by_assignee = {}
+        self._versions = {}
+        self._since = {}
+
+    def since(self, kind):
+        """updated_since to ask for the changes of a table with, None until it was loaded in full"""
+        return self._since.get(kind)
+
+    def load(self, kind, response):
+        """Replace a table with the rows of a full GET /<kind> response; returns False when it was already applied"""
+        version = response_version(response)
+        if self._versions.get(kind) == version:
+            return False
+        rows = response.json().get("data") or []
+        for row_id in list(self._table(kind)):
+            self._drop(kind, row_id)
+        for row in rows:
+            self._put(kind, row)
+        self._versions[kind] = version
+        latest = newest(*(row.get("updated_at") for row in rows))
+        if latest:
+            latest = (datetime.fromisoformat(latest) - timedelta(seconds=SINCE_MARGIN)).isoformat()
+        self._since[kind] = latest
+        return True
+
+    def forget(self, kind):
+        """Make the next refresh of a table a full load again (its deltas can no longer be served)"""
+        self._since.pop(kind, None)
+        self._versions.pop(kind, None)
+
+    def merge(self, kind, response):
+        """Apply a GET /<kind>?updated_since=... delta; returns False when it was already applied"""
+        version = response_version(response)
+        if self._versions.get(kind) == version:
+            return False
+        result = response.json()
+        for row in result.get("data") or []:
+            self._put(kind, row)
+        for row_id in result.get("deleted") or []:
+            self._drop(kind, row_id)
+        self._versions[kind] = version
+        self._since[kind] = newest(self._since.get(kind), result.get("next_since"))
+        return True
+
+    def _table(self, kind):
+        return getattr(self, kind)
+
+    def _put(self, kind, row):
+        # an updated row keeps its place in the table; its old index entries go first
+        # so the indexes never point at a stale email/project/assignee
+        table = self._table(kind)
+        old = table.get(row["id"])
+        if old is not None:
+            self._unindex(kind, old)
+        table[row["id"]] = row
+        if kind == "users" and row.get("email"):
+            self.users_by_email[row["email"].lower()] = row
+        elif kind == "tasks":
+            self.tasks_by_project.setdefault(row.get("project_id"), {})[row["id"]] = row
+            self.tasks_by_assignee.setdefault(row.get("assigned_to"), {})[row["id"]] = row
+
+    def _drop(self, kind, row_id):
+        old = self._table(kind).pop(row_id, None)
+        if old is not None:
+            self._unindex(kind, old)
+
+    def _unindex(self, kind, old):
+        if kind == "users" and old.get("email"):
+            self.users_by_email.pop(old["email"].lower(), None)
+        elif kind == "tasks":
+            self.tasks_by_project.get(old.get("project_id"), {}).pop(old["id"], None)
+            self.tasks_by_assignee.get(old.get("assigned_to"), {}).pop(old["id"], None)
+
+    # --- Labels for selectboxes (unknown ids fall back to the id itself) ---
+
+    def user_label(self, user_id):
+        user = self.users.get(user_id)
+        return f"{user['name']} ({user['email']})" if user else str(user_id)
+
+    def project_label(self, project_id):
+        project = self.projects.get(project_id)
+        return project["name"] if project else str(project_id)
+
+    def task_label(self, task_id):
+        task = self.tasks.get(task_id)
+        return task["title"] if task else str(task_id)
+
+    def user_by_email(self, email):
+        return self.users_by_email.get(email.strip().lower())
+
+
+def position(ids, value):
+    """Index of `value` in a list of selectbox options, 0 when it is not there"""
+    try:
+        return ids.index(value)
+    except ValueError:
+        return 0
+
+
+def get_store():
+    """The entity store of this browser session"""
+    if "entity_store" not in st.session_state:
+        st.session_state.entity_store = EntityStore()
+    return st.session_state.entity_store
@@ -0,0 +1,319 @@
+# benchmarks/fake_supabase.py
+# local stand-in for the supabase table api (postgrest), backed by sqlite
+# implements just what src/db.py sends: select/filters/or/order/limit reads (with embedded
+# resources such as owner:users!owner_id(...) and their <name>.order), inserts, updates and
+# deletes with return=representation, and the projectdock_stats rpc
+# the sqlite schema brings the tombstone triggers of the real database along
+#
+#   FAKE_SUPABASE_DB=/tmp/fake.db python -m uvicorn benchmarks.fake_supabase:app --port 54321
+#   SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=<any jwt-looking string> uvicorn API.main:app
+
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+import anyio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.db import QueryResult
+from src.sqlite_db import COLUMNS, SQLiteDataBaseManager
+
+# sqlite file holding the fake tables (a fresh temp file by default)
+DB_PATH = os.getenv("FAKE_SUPABASE_DB") or os.path.join(tempfile.mkdtemp(prefix="fake-supabase-"), "fake.db")
+# simulated network round trip to a hosted database, added to every request
+LATENCY_MS = float(os.getenv("FAKE_SUPABASE_LATENCY_MS", "0"))
+
+# query parameters that are not column filters
+RESERVED = {"select", "order", "limit", "offset", "or", "and", "on_conflict", "columns"}
+SQL_OPS = {"eq": "=", "neq": "<>", "lt": "<", "lte": "<=", "gt": ">", "gte": ">=", "like": "LIKE", "ilike": "LIKE"}
+# foreign keys postgrest can embed through: (table, column) -> referenced table
+FOREIGN_KEYS = {("projects", "owner_id"): "users", ("tasks", "project_id"): "projects", ("tasks", "assigned_to"): "users"}
+# alias:table!hint(columns) item of a select list
+EMBED = re.compile(r"^(?:(\w+):)?(\w+)(?:!(\w+))?\((.*)\)$", re.S)
+# sqlite constraint errors as the postgres error codes postgrest would report
+CONSTRAINT_CODES = [("UNIQUE", 409, "23505"), ("FOREIGN KEY", 409, "23503"), ("NOT NULL", 400, "23502"), ("CHECK", 400, "23514")]
+
+store = SQLiteDataBaseManager(DB_PATH)
+app = FastAPI(title="fake supabase")
+
+class PostgrestError(Exception):
+    def __init__(self, status, code, message):
+        self.status = status
+        self.code = code
+        self.message = message
+
+def split_top(text):
+    '''
+    split on commas that are outside parentheses and double quotes
+    '''
+    parts, current, depth, quoted, escaped = [], [], 0, False, False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif ch == "\\" and quoted:
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return [part for part in parts if part]
+
+def unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+def check_columns(table, names):
+    unknown = set(names) - COLUMNS[table]
+    if unknown:
+        raise PostgrestError(400, "42703", f"column {table}.{sorted(unknown)[0]} does not exist")
+
+def condition(table, column, expression):
+    '''
+    sql and params of one "op.value" filter on a column
+    '''
+    check_columns(table, [column])
+    op, _, value = expression.partition(".")
+    negate = op == "not"
+    if negate:
+        op, _, value = value.partition(".")
+    if op == "is":
+        sql, params = {"null": (f"{column} IS NULL", []), "true": (f"{column} = 1", []), "false": (f"{column} = 0", [])}[value.lower()]
+    elif op == "in":
+        values = [unquote(v) for v in split_top(value[1:-1])]
+        sql, params = f"{column} IN ({', '.join('?' for _ in values)})", values
+    elif op in SQL_OPS:
+        value = unquote(value)
+        if op in ("like", "ilike"):
+            value = value.replace("*", "%")
+        sql, params = f"{column} {SQL_OPS[op]} ?", [value]
+    else:
+        raise PostgrestError(400, "PGRST100", f"unknown operator {op}")
+    return (f"NOT ({sql})" if negate else sql), params
+
+def logic_tree(table, kind, body):
+    '''
+    sql of an or=(...) / and=(...) tree such as (a.eq.1,and(b.gt.2,c.is.null))
+    '''
+    clauses, params = [], []
+    for item in split_top(body[1:-1]):
+        if item.startswith(("and(", "or(")):
+            name, _, rest = item.partition("(")
+            sql, item_params = logic_tree(table, name, "(" + rest)
+        else:
+            column, _, expression = item.partition(".")
+            sql, item_params = condition(table, column, expression)
+        clauses.append(sql)
+        params += item_params
+    return "(" + (" OR " if kind == "or" else " AND ").join(clauses) + ")", params
+
+def where(table, query):
+    '''
+    WHERE clause of every filter in the query string (repeated columns are all applied)
+    '''
+    clauses, params = [], []
+    for name, value in query:
+        if "." in name:
+            # tasks.order=... belongs to an embedded resource
+            continue
+        if name in ("or", "and"):
+            sql, item_params = logic_tree(table, name, value)
+        elif name in RESERVED:
+            continue
+        else:
+            sql, item_params = condition(table, name, value)
+        clauses.append(sql)
+        params += item_params
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def order_clause(table, order):
+    # created_at.desc.nullslast,id.desc -> postgres null placement made explicit for sqlite
+    terms = []
+    for part in order.split(","):
+        column, *modifiers = part.split(".")
+        check_columns(table, [column])
+        desc = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers or (desc and "nullslast" not in modifiers)
+        terms.append(f"{column} IS NULL {'DESC' if nulls_first else 'ASC'}, {column} {'DESC' if desc else 'ASC'}")
+    return " ORDER BY " + ", ".join(terms)
+
+def run(sql, params):
+    try:
+        return store._run(sql, params).data
+    except sqlite3.IntegrityError as e:
+        for marker, status, code in CONSTRAINT_CODES:
+            if marker in str(e):
+                raise PostgrestError(status, code, str(e))
+        raise PostgrestError(400, "23000", str(e))
+    except ValueError as e:
+        raise PostgrestError(400, "42703", str(e))
+
+def parse_select(text):
+    '''
+    plain columns and (name, table, hint, inner select) embeds of a select list
+    '''
+    columns, embeds = [], []
+    for item in split_top(text.replace(" ", "")):
+        match = EMBED.match(item)
+        if match:
+            alias, table, hint, inner = match.groups()
+            embeds.append((alias or table, table, hint, inner))
+        else:
+            columns.append(item)
+    return columns, embeds
+
+def relationship(parent, child, hint):
+    '''
+    (parent column, child column, many) linking rows of `parent` to the embedded `child` table
+    '''
+    for (table, column), target in FOREIGN_KEYS.items():
+        if hint not in (None, column):
+            continue
+        if table == parent and target == child:
+            return column, "id", False
+        if table == child and target == parent:
+            return "id", column, True
+    raise PostgrestError(400, "PGRST200", f"Could not find a relationship between '{parent}' and '{child}'")
+
+def project(table, rows, columns, embeds=()):
+    # keep the selected columns plus the embedded resources already attached to each row
+    if columns == ["*"]:
+        return rows
+    check_columns(table, columns)
+    names = columns + [name for name, *_ in embeds]
+    return [{name: row[name] for name in names} for row in rows]
+
+def embed(table, rows, embeds, params_of, prefix=""):
+    '''
+    attach every embedded resource to `rows`, one query per embed (a list for one-to-many, an object or None otherwise)
+    '''
+    for name, child, hint, inner in embeds:
+        table_of(child)
+        parent_column, child_column, many = relationship(table, child, hint)
+        keys = sorted({row[parent_column] for row in rows if row[parent_column] is not None})
+        children = []
+        if keys:
+            sql = f"SELECT * FROM {child} WHERE {child_column} IN ({', '.join('?' for _ in keys)})"
+            order = params_of.get(f"{prefix}{name}.order")
+            children = run(sql + (order_clause(child, order) if order else ""), keys)
+        columns, nested = parse_select(inner)
+        embed(child, children, nested, params_of, f"{prefix}{name}.")
+        grouped = {}
+        for row in children:
+            grouped.setdefault(row[child_column], []).append(row)
+        for row in rows:
+            matches = project(child, grouped.get(row[parent_column], []), columns, nested)
+            row[name] = matches if many else (matches[0] if matches else None)
+    return rows
+
+def select(table, query):
+    params_of = dict(query)
+    columns, embeds = parse_select(params_of.get("select", "*"))
+    columns = columns or ["*"]
+    if columns != ["*"]:
+        check_columns(table, columns)
+    # embeds need the linking columns, the projection happens after they are attached
+    fetched = "*" if embeds else ", ".join(columns)
+    sql_where, params = where(table, query)
+    sql = f"SELECT {fetched} FROM {table}{sql_where}"
+    if "order" in params_of:
+        sql += order_clause(table, params_of["order"])
+    if "limit" in params_of:
+        sql += " LIMIT ?"
+        params.append(int(params_of["limit"]))
+        if "offset" in params_of:
+            sql += " OFFSET ?"
+            params.append(int(params_of["offset"]))
+    rows = run(sql, params)
+    if not embeds:
+        return rows
+    return project(table, embed(table, rows, embeds, params_of), columns, embeds)
+
+def insert(table, body):
+    rows = body if isinstance(body, list) else [body]
+    if not rows:
+        return []
+    try:
+        sql, params, ids = store._insert_many(table, rows)
+    except ValueError as e:
+        raise PostgrestError(400, "PGRST204", str(e))
+    return store._in_order(QueryResult(run(sql, params)), ids).data
+
+def update(table, query, body):
+    check_columns(table, body)
+    # like the updated_at trigger of the real schema
+    data = store._encode(store._touch(table, body))
+    sql_where, params = where(table, query)
+    assignments = ", ".join(f"{column} = ?" for column in data)
+    return run(f"UPDATE {table} SET {assignments}{sql_where} RETURNING *", [*data.values(), *params])
+
+def delete(table, query):
+    sql_where, params = where(table, query)
+    return run(f"DELETE FROM {table}{sql_where} RETURNING *", params)
+
+def stats(project_id=None):
+    grouped = [(name, store._run(sql, params)) for name, sql, params in store._stats_queries(project_id)]
+    return store._stats(grouped).data
+
+def representation(request):
+    # table writes only send the rows back when asked to (supabase-py always asks)
+    return "return=representation" in request.headers.get("prefer", "")
+
+async def respond(work, status=200, body=True):
+    '''
+    run one database call in a worker thread (after the simulated latency) and shape the reply like postgrest
+    '''
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    try:
+        data = await anyio.to_thread.run_sync(work)
+    except PostgrestError as e:
+        return JSONResponse({"message": e.message, "code": e.code, "details": None, "hint": None}, status_code=e.status)
+    if not body:
+        return Response(status_code=204 if status == 200 else status)
+    return JSONResponse(data, status_code=status)
+
+def table_of(name):
+    if name not in COLUMNS:
+        raise PostgrestError(404, "42P01", f'relation "public.{name}" does not exist')
+    return name
+
+@app.get("/rest/v1/{table}")
+async def read_rows(table: str, request: Request):
+    query = request.query_params.multi_items()
+    return await respond(lambda: select(table_of(table), query))
+
+@app.post("/rest/v1/rpc/projectdock_stats")
+async def projectdock_stats(request: Request):
+    body = await request.json()
+    return await respond(lambda: stats(body.get("p_project_id")))
+
+@app.post("/rest/v1/{table}")
+async def insert_rows(table: str, request: Request):
+    body = await request.json()
+    return await respond(lambda: insert(table_of(table), body), status=201, body=representation(request))
+
+@app.patch("/rest/v1/{table}")
+async def update_rows(table: str, request: Request):
+    query = request.query_params.multi_items()
+    body = await request.json()
+    return await respond(lambda: update(table_of(table), query, body), body=representation(request))
+
+@app.delete("/rest/v1/{table}")
+async def delete_rows(table: str, request: Request):
+    query = request.query_params.multi_items()
+    return await respond(lambda: delete(table_of(table), query), body=representation(request))
@@ -0,0 +1,98 @@
+# benchmarks/limits.py
+# what admission control adds to a request: the rate limiter's check (remembered route limit
+# and bucket update) for an early route, a late route and an unmatched path, the route match
+# it skips for a remembered path, and one uncontended pass through the database concurrency gate
+#
+#   python benchmarks/limits.py --calls 20000
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# the app is only imported for its routes, it never touches the database here
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+
+from API.limits import RateLimiter, RateLimitMiddleware, route_of
+from API.main import app
+from src.admission import ConcurrencyLimit
+
+def scope_of(method, path, client):
+    return {
+        "type": "http", "method": method, "path": path, "root_path": "", "query_string": b"",
+        "headers": [], "client": (client, 50000), "app": app,
+    }
+
+def per_call_us(calls, work):
+    '''
+    best of three runs of `calls` calls, in microseconds per call
+    '''
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(calls):
+            work(i)
+        timings.append((time.perf_counter() - start) / calls * 1e6)
+    return round(min(timings), 2)
+
+async def passthrough_us(calls, asgi):
+    # a whole request through `asgi`, whose inner app answers nothing
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(calls):
+            await asgi(scope_of("GET", "/users/some-id", f"10.0.{i % 200}.{i % 250}"), receive, send)
+        timings.append((time.perf_counter() - start) / calls * 1e6)
+    return round(min(timings), 2)
+
+async def gate_us(calls):
+    gate = ConcurrencyLimit(limit=20, queue=100, timeout=2)
+    start = time.perf_counter()
+    for _ in range(calls):
+        async with gate:
+            pass
+    return round((time.perf_counter() - start) / calls * 1e6, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000, help="calls per measurement")
+    parser.add_argument("--clients", type=int, default=1000, help="distinct client addresses")
+    args = parser.parse_args()
+
+    # a huge rate so nothing is rejected: only the cost of deciding is measured
+    limiter = RateLimiter(rate=1e9, burst=1e9)
+    report = {"routes": len(app.router.routes), "check_us": {}}
+    for name, method, path in [
+        ("first_route", "GET", app.router.routes[0].path),
+        ("late_route", "PUT", "/users/some-id"),
+        ("unmatched", "GET", "/no/such/path"),
+    ]:
+        scopes = [scope_of(method, path, f"10.0.{i // 250}.{i % 250}") for i in range(args.clients)]
+        report["check_us"][name] = per_call_us(args.calls, lambda i: limiter.check(scopes[i % len(scopes)]))
+
+    # what a path not remembered yet (or every request without the path cache) pays on top
+    late = scope_of("PUT", "/users/some-id", "10.0.0.1")
+    report["route_match_us"] = per_call_us(args.calls, lambda i: route_of(late))
+
+    async def inner(scope, receive, send):
+        pass
+
+    report["request_us"] = {
+        "without_limiter": asyncio.run(passthrough_us(args.calls, inner)),
+        "with_limiter": asyncio.run(passthrough_us(args.calls, RateLimitMiddleware(inner, limiter))),
+    }
+    report["db_gate_us"] = asyncio.run(gate_us(args.calls))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
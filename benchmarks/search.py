@@ -0,0 +1,81 @@
+# benchmarks/search.py
+# GET /search without the http layer: builds the in-process index over generated tasks whose
+# words follow a zipf-like spread (a few words in every row, a long tail of rare ones) and times
+# queries of rare, common and prefix words, alone and combined, best of three
+#
+#   python benchmarks/search.py --tasks 100000
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.search import SearchIndex
+
+# words in (nearly) every task, like the benchmark seed's "Task <n>" / "benchmark task"
+COMMON = ["task", "benchmark", "team"]
+
+QUERIES = [
+    "task",                 # one common word
+    "word12",               # one mid-frequency word
+    "word1234",             # one rare word
+    "w",                    # a one-letter prefix of the whole vocabulary
+    "word1",                # a prefix of many words
+    "word12 word13",        # two prefixes
+    "word1 task",           # a prefix and a common word
+    "word4321 task",        # a rare word and a common word
+    "task team",            # two common words
+    "benchmark task",       # two common words
+    "benchmark task team",  # three common words
+    "word12 word13 word14", # three prefixes
+]
+
+def build(tasks, vocabulary, seed):
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(vocabulary)]
+    # zipf-like: the n-th word is about n times rarer than the first
+    cumulative = list(itertools.accumulate(1 / (i + 1) for i in range(vocabulary)))
+    index = SearchIndex()
+    for i in range(tasks):
+        title = " ".join(["Task", str(i)] + rng.choices(words, cum_weights=cumulative, k=3))
+        description = " ".join(COMMON + rng.choices(words, cum_weights=cumulative, k=10))
+        index.put("tasks", {
+            "id": str(i), "project_id": "p", "title": title, "description": description,
+            "status": "pending", "due_date": None,
+        })
+    return index
+
+def per_query_ms(index, query, repeat):
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            hits = index.search(query)
+        timings.append((time.perf_counter() - start) / repeat * 1000)
+    return round(min(timings), 3), len(hits)
+
+def main():
+    parser = argparse.ArgumentParser(description="time /search queries over a generated task index")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="distinct rare words")
+    parser.add_argument("--repeat", type=int, default=20, help="searches per timing")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build(args.tasks, args.vocabulary, args.seed)
+    report = {"tasks": len(index), "build_seconds": round(time.perf_counter() - start, 2), "queries": {}}
+    # the first search sorts the ranked postings, as the first one after a bulk load would
+    index.search("task")
+    for query in QUERIES:
+        ms, hits = per_query_ms(index, query, args.repeat)
+        report["queries"][query] = {"ms": ms, "hits": hits}
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
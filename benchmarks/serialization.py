@@ -0,0 +1,90 @@
+# benchmarks/serialization.py
+# cost of turning a large GET /tasks result into bytes on the wire:
+# FastAPI's default path vs the orjson response, and what gzip/brotli save
+#
+#   python benchmarks/serialization.py --tasks 50000
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from API.responses import BROTLI_QUALITY, GZIP_LEVEL, Compressor, FastJSONResponse, brotli
+
+def fake_listing(count):
+    '''
+    a GET /tasks response with `count` task rows shaped like the real table
+    '''
+    project_ids = [str(uuid.uuid4()) for _ in range(50)]
+    user_ids = [str(uuid.uuid4()) for _ in range(200)]
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "project_id": project_ids[i % len(project_ids)],
+            "title": f"Task {i}",
+            "description": f"Description of task {i}, with a few more words to look like real text",
+            "assigned_to": user_ids[i % len(user_ids)],
+            "status": ("pending", "ongoing", "completed")[i % 3],
+            "due_date": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            "created_at": f"2025-01-01T00:00:{i % 60:02d}.{i:06d}+00:00",
+            "updated_at": f"2025-01-01T00:00:{i % 60:02d}.{i:06d}+00:00",
+        }
+        for i in range(count)
+    ]
+    return {"success": True, "message": "retrived all tasks", "data": rows, "next_cursor": None}
+
+def best_of(repeat, work):
+    '''
+    fastest of `repeat` runs in milliseconds, and the last result
+    '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = work()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(min(timings), 2), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=50000, help="rows in the listing")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    listing = fake_listing(args.tasks)
+    report = {"tasks": args.tasks, "serialize_ms": {}, "compression": {}}
+
+    # what FastAPI does with a returned dict: jsonable_encoder, then json.dumps
+    ms, body = best_of(args.repeat, lambda: JSONResponse(jsonable_encoder(listing)).body)
+    report["serialize_ms"]["fastapi_default"] = ms
+    # default_response_class=FastJSONResponse alone: jsonable_encoder, then orjson
+    ms, _ = best_of(args.repeat, lambda: FastJSONResponse(jsonable_encoder(listing)).body)
+    report["serialize_ms"]["orjson_after_encoder"] = ms
+    # what the list endpoints do now (json_response): orjson straight from the dict
+    ms, fast_body = best_of(args.repeat, lambda: FastJSONResponse(listing).body)
+    report["serialize_ms"]["orjson_direct"] = ms
+    assert json.loads(fast_body) == json.loads(body)
+
+    report["bytes"] = len(fast_body)
+    ms, gzipped = best_of(args.repeat, lambda: Compressor("gzip").finish(fast_body))
+    assert gzip.decompress(gzipped) == fast_body
+    report["compression"]["gzip"] = {
+        "level": GZIP_LEVEL, "bytes": len(gzipped), "saved": round(1 - len(gzipped) / len(fast_body), 4), "ms": ms,
+    }
+    if brotli is not None:
+        ms, compressed = best_of(args.repeat, lambda: Compressor("br").finish(fast_body))
+        report["compression"]["br"] = {
+            "quality": BROTLI_QUALITY, "bytes": len(compressed), "saved": round(1 - len(compressed) / len(fast_body), 4), "ms": ms,
+        }
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# src admission.py
+# global cap on concurrent database calls: calls over the cap wait in a bounded queue,
+# and once the queue is full (or the wait too long) they fail fast with Overloaded
+
+import asyncio
+import functools
+import inspect
+import os
+
+# database calls allowed in flight at once per API process, 0 turns the cap off
+DB_CONCURRENCY = int(os.getenv("DB_CONCURRENCY", "20"))
+# calls that may wait for a free slot; the next one is rejected right away
+DB_QUEUE = int(os.getenv("DB_QUEUE", "100"))
+# seconds a call may wait for a slot before it is rejected
+DB_QUEUE_TIMEOUT = float(os.getenv("DB_QUEUE_TIMEOUT", "2"))
+# calls that never wait: readiness must answer even when the database is busy
+UNGATED = {"ping", "close"}
+
+class Overloaded(Exception):
+    '''
+    the database already has as much work as it is allowed; answered with a 503
+    '''
+    retry_after = 1
+
+class ConcurrencyLimit:
+    '''
+    semaphore with a bounded, time-limited wait queue and counters for /limits/stats
+    '''
+    def __init__(self, limit=DB_CONCURRENCY, queue=DB_QUEUE, timeout=DB_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.queue:
+                self.rejected += 1
+                raise Overloaded(f"database busy: {self.active} calls running, {self.waiting} waiting")
+            self.waiting += 1
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise Overloaded(f"database busy: no free slot within {self.timeout}s")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "queue": self.queue,
+            "queue_timeout": self.timeout,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+def gated(limit, method):
+    @functools.wraps(method)
+    async def gated_call(*args, **kwargs):
+        async with limit:
+            return await method(*args, **kwargs)
+    return gated_call
+
+def limit_concurrency(manager, interface, limit):
+    '''
+    make every public coroutine method of `interface` on this manager instance wait for a slot of `limit`
+    '''
+    for call, _ in inspect.getmembers(interface, inspect.iscoroutinefunction):
+        if not call.startswith("_") and call not in UNGATED:
+            setattr(manager, call, gated(limit, getattr(manager, call)))
+    manager.admission = limit
+    return manager
@@ -0,0 +1,223 @@
+# src cache.py
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+# returned by get() when a key is not cached
+MISSING = object()
+
+def namespaces_of(namespace):
+    # a key's namespace is one table name, or a tuple of them for reads that span tables
+    return namespace if isinstance(namespace, tuple) else (namespace,)
+
+class Flight:
+    '''
+    one running load of a key (sync path): callers that join wait on `done`
+    '''
+    def __init__(self, version):
+        self.version = version
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    '''
+    concurrent identical loads share one call: the first caller of a key runs the load and
+    callers arriving while it runs get its result instead of running their own
+    a flight only takes callers that saw the same write version, so a read that starts after
+    a write to its table never gets rows loaded before that write
+    '''
+    def __init__(self):
+        # key -> Flight (sync callers, any thread) / key -> (version, task) (async callers, one loop)
+        self._flights = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.collapsed = 0
+
+    def do(self, key, version, load):
+        '''
+        (result of load(), whether this caller ran it)
+        '''
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None or flight.version != version
+            if leader:
+                flight = self._flights[key] = Flight(version)
+                self.loads += 1
+            else:
+                self.collapsed += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, False
+        try:
+            flight.result = load()
+            return flight.result, True
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    async def ado(self, key, version, load):
+        '''
+        async do(): `load` is a coroutine function; it runs as its own task, so a caller that
+        is cancelled (client gone) does not cancel the load the others are waiting for
+        '''
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._tasks.get(key)
+            leader = flight is None or flight[0] != version or flight[1].get_loop() is not loop
+            if leader:
+                task = loop.create_task(load())
+                flight = self._tasks[key] = (version, task)
+                task.add_done_callback(lambda done: self._land(key, flight))
+                self.loads += 1
+            else:
+                self.collapsed += 1
+        return await asyncio.shield(flight[1]), leader
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._tasks.get(key) is flight:
+                del self._tasks[key]
+        if not flight[1].cancelled():
+            # retrieved, so an error nobody awaited any more is not reported as never retrieved
+            flight[1].exception()
+
+    def stats(self):
+        return {"loads": self.loads, "collapsed": self.collapsed, "in_flight": len(self._flights) + len(self._tasks)}
+
+class TTLCache:
+    '''
+    small in-process cache with a time-to-live, a bounded size and LRU eviction
+    keys are tuples whose first item is a namespace (a table name, or a tuple of table
+    names), so one write can drop every cached read of that table without touching the others
+    `seal(value)`, when set, runs once on every loaded value before it is shared and stored
+    (the api renders the json body and ETag of a read there, so hits reuse both)
+    '''
+    def __init__(self, maxsize=256, ttl=30.0, seal=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.seal = seal
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        # misses of the same key at the same time share one load, with or without caching
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    def version(self, namespace):
+        '''
+        counters bumped every time the namespace(s) are invalidated
+        '''
+        return tuple(self._versions.get(name, 0) for name in namespaces_of(namespace))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, version=None):
+        '''
+        store a value; when `version` is given the value is dropped if the
+        namespace was invalidated since that version was read (a write raced the load)
+        '''
+        if not self.enabled:
+            return
+        with self._lock:
+            if version is not None and version != self.version(key[0]):
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, load):
+        '''
+        read-through: return the cached value for key, or call load() and cache its result
+        (callers missing the same key at once share one load() call)
+        '''
+        if self.enabled:
+            value = self.get(key)
+            if value is not MISSING:
+                return value
+        version = self.version(key[0])
+        value, leader = self.flights.do(key, version, lambda: self._sealed(load()))
+        if leader:
+            self.set(key, value, version)
+        return value
+
+    async def aget_or_load(self, key, load):
+        '''
+        async read-through: like get_or_load but `load` is a coroutine function
+        '''
+        if self.enabled:
+            value = self.get(key)
+            if value is not MISSING:
+                return value
+        version = self.version(key[0])
+
+        async def sealed():
+            return self._sealed(await load())
+        value, leader = await self.flights.ado(key, version, sealed)
+        if leader:
+            self.set(key, value, version)
+        return value
+
+    def _sealed(self, value):
+        return value if self.seal is None else self.seal(value)
+
+    def invalidate(self, *namespaces):
+        '''
+        drop every cached entry of the given namespaces
+        '''
+        with self._lock:
+            for namespace in namespaces:
+                self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            stale = set(namespaces)
+            for key in [key for key in self._data if stale.intersection(namespaces_of(key[0]))]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            for namespace in {name for key in self._data for name in namespaces_of(key[0])}:
+                self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            self._data.clear()
+
+    def stats(self):
+        '''
+        hit/miss counters for sizing the cache
+        '''
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self.flights.stats(),
+        }
@@ -1,9 +1,13 @@
 # db_manager.py
 
+import asyncio
 import os
-from supabase import create_client
+import sqlite3
+import threading
 from dotenv import load_dotenv
 
+from src.metrics import instrument
+
 # loading environment variables from .env file
 
 load_dotenv()
@@ -11,80 +15,385 @@ load_dotenv()
 url = os.getenv("SUPABASE_URL")
 key = os.getenv("SUPABASE_KEY")
 
-db = create_client(url, key)
+# storage backend used by DataBaseManager: "supabase" (default) or "sqlite"
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "projectdock.db")
+# days deleted ids are kept in tombstones (prune supabase's with the same value, see README);
+# an updated_since older than that is refused, a delta from then could miss deletions. 0 keeps them forever
+TOMBSTONE_DAYS = float(os.getenv("TOMBSTONE_DAYS", "30"))
 
-# ============ USER MANAGEMENT ============
+# the supabase client is created on first use (get_client), so importing this module
+# needs neither the env vars nor the network and cold start stays cheap
+# (supabase itself is imported there too: it is the slowest import of the app and the sqlite backend never needs it)
+_client = None
+_lock = threading.Lock()
 
-def create_user(name, email, password_hash, role):
-    return db.table("users").insert({
+def get_client():
+    '''
+    the supabase client shared by the whole process, created on first use
+    '''
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if not url or not key:
+                    raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set to use the supabase backend")
+                from supabase import create_client
+                _client = create_client(url, key)
+    return _client
+
+class QueryResult:
+    '''
+    mirrors the `.data` attribute of a supabase response, for results built in python
+    `errors` is only set by insert_each: why each submitted row was refused, or None for the inserted ones
+    '''
+    def __init__(self, data, errors=None):
+        self.data = data
+        self.errors = errors
+
+class RejectedWrite(ValueError):
+    '''
+    the database refused a write for its data (e.g. an unknown column); answered with a 400
+    '''
+
+# ============ LISTING QUERIES ============
+
+# comparison operators a filter may use, as (column, op, value) tuples
+FILTER_OPS = {"eq", "neq", "lt", "lte", "gt", "gte"}
+
+def parse_order(order_by=None):
+    '''
+    split "column" / "-column" into (column, descending), defaulting to created_at ascending
+    '''
+    if not order_by:
+        return "created_at", False
+    if order_by.startswith("-"):
+        return order_by[1:], True
+    return order_by, False
+
+def quote(value):
+    # values inside a postgrest or=(...) tree are double quoted so dates and commas survive
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def list_query(query, filters=None, order_by=None, limit=None, after=None):
+    '''
+    apply filters, ordering and keyset pagination on (order column, id) to a select query
+    nulls in the order column sort last; `after` is the (value, id) pair of the last row the caller already has
+    works on both the sync and the async supabase query builders
+    '''
+    for column, op, value in filters or []:
+        query = getattr(query, op)(column, value)
+    column, desc = parse_order(order_by)
+    query = query.order(column, desc=desc, nullsfirst=False).order("id", desc=desc)
+    if after:
+        value, row_id = after
+        cmp = "lt" if desc else "gt"
+        if value is None:
+            query = query.is_(column, "null").filter("id", cmp, row_id)
+        else:
+            query = query.or_(
+                f"{column}.{cmp}.{quote(value)},and({column}.eq.{quote(value)},id.{cmp}.{row_id}),{column}.is.null"
+            )
+    if limit:
+        query = query.limit(limit)
+    return query
+
+def list_rows(table, columns="*", filters=None, order_by=None, limit=None, after=None):
+    '''
+    filtered, sorted and projected listing of a table, see list_query
+    '''
+    return list_query(get_client().table(table).select(columns), filters, order_by, limit, after).execute()
+
+def select_columns(fields, default="*"):
+    return ", ".join(fields) if fields else default
+
+# ============ ROW BUILDERS ============
+# the insert payloads, shared by every backend
+
+def user_row(name, email, password_hash, role):
+    return {
         "name": name,
         "email": email,
         "password_hash": password_hash,
         "role": role
-    }).execute()
+    }
 
-def get_all_users():
-    return db.table("users").select("id, name, email, role, created_at").execute()
+def project_row(name, description, owner_id, start_date, end_date, status):
+    return {
+        "name": name,
+        "description": description,
+        "owner_id": owner_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "status": status
+    }
+
+def task_row(project_id, title, description, assigned_to, due_date, status):
+    return {
+        "project_id": project_id,
+        "title": title,
+        "description": description,
+        "assigned_to": assigned_to,
+        "due_date": due_date,
+        "status": status
+    }
+
+# ============ USER MANAGEMENT ============
+
+# get_all_users never exposes password hashes
+USER_COLUMNS = "id, name, email, role, created_at, updated_at"
+
+def create_user(name, email, password_hash, role):
+    return get_client().table("users").insert(user_row(name, email, password_hash, role)).execute()
+
+def get_all_users(limit=None, after=None, filters=None, order_by=None, fields=None):
+    columns = select_columns(fields, USER_COLUMNS)
+    return list_rows("users", columns, filters, order_by, limit, after)
 
 def update_user(user_id, data: dict):
-    return db.table("users").update(data).eq("id", user_id).execute()
+    return get_client().table("users").update(data).eq("id", user_id).execute()
 
 def delete_user(user_id):
-    return db.table("users").delete().eq("id", user_id).execute()
+    return get_client().table("users").delete().eq("id", user_id).execute()
 
 # ============ PROJECT MANAGEMENT ============
 
 def create_project(name, description, owner_id, start_date, end_date, status):
-    return db.table("projects").insert({
-        "name": name,
-        "description": description,
-        "owner_id": owner_id,
-        "start_date": start_date,
-        "end_date": end_date,
-        "status": status
-    }).execute()
+    return get_client().table("projects").insert(project_row(name, description, owner_id, start_date, end_date, status)).execute()
 
-def get_all_projects():
-    return db.table("projects").select("*").execute()
+def get_all_projects(limit=None, after=None, filters=None, order_by=None, fields=None):
+    columns = select_columns(fields)
+    return list_rows("projects", columns, filters, order_by, limit, after)
 
 def update_project(project_id, data: dict):
-    return db.table("projects").update(data).eq("id", project_id).execute()
+    return get_client().table("projects").update(data).eq("id", project_id).execute()
 
 def delete_project(project_id):
-    return db.table("projects").delete().eq("id", project_id).execute()
+    return get_client().table("projects").delete().eq("id", project_id).execute()
 
 # ============ TASK MANAGEMENT ============
 
 def create_task(project_id, title, description, assigned_to, due_date, status):
-    return db.table("tasks").insert({
-        "project_id": project_id,
-        "title": title,
-        "description": description,
-        "assigned_to": assigned_to,
-        "due_date": due_date,
-        "status": status
-    }).execute()
+    return get_client().table("tasks").insert(task_row(project_id, title, description, assigned_to, due_date, status)).execute()
 
 def get_tasks_by_project(project_id):
-    return db.table("tasks").select("*").eq("project_id", project_id).execute()
+    return get_client().table("tasks").select("*").eq("project_id", project_id).execute()
 
-def get_all_tasks():
-    return db.table("tasks").select("*").execute()
+def get_all_tasks(limit=None, after=None, filters=None, order_by=None, fields=None):
+    columns = select_columns(fields)
+    return list_rows("tasks", columns, filters, order_by, limit, after)
 
 def update_task(task_id, data: dict):
-    return db.table("tasks").update(data).eq("id", task_id).execute()
+    return get_client().table("tasks").update(data).eq("id", task_id).execute()
 
 def delete_task(task_id):
-    return db.table("tasks").delete().eq("id", task_id).execute()
+    return get_client().table("tasks").delete().eq("id", task_id).execute()
+
+# ============ PROJECT DETAIL ============
+
+# a project with its owner, its tasks and their assignees, embedded by postgrest in one request
+# (users!owner_id / users!assigned_to name the foreign key, both point at users)
+PERSON_COLUMNS = "id, name, email"
+PROJECT_DETAIL = f"*, owner:users!owner_id({PERSON_COLUMNS}), tasks(*, assignee:users!assigned_to({PERSON_COLUMNS}))"
+
+def project_detail_query(query, project_id):
+    # embedded tasks come back in creation order, like a listing
+    return query.select(PROJECT_DETAIL).eq("id", project_id).order("created_at", foreign_table="tasks").order("id", foreign_table="tasks")
+
+def get_project_detail(project_id):
+    return project_detail_query(get_client().table("projects"), project_id).execute()
+
+# ============ BULK OPERATIONS ============
+
+# ids per in_() filter, keeps the request url well under proxy limits
+ID_CHUNK = 100
+
+def chunks(ids, size=ID_CHUNK):
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+def rejected(error):
+    '''
+    whether a write failed on a constraint of the data it wrote (foreign key, unique, check, not null)
+    rather than on the database itself: sqlite raises IntegrityError, postgres reports a class 23 code
+    '''
+    if isinstance(error, sqlite3.IntegrityError):
+        return True
+    return str(getattr(error, "code", "") or "").startswith("23")
+
+def refusal(error):
+    return getattr(error, "message", None) or str(error)
+
+def insert_each(rows, insert):
+    '''
+    insert `rows` one at a time with insert(row), after a multi-row insert of them was refused:
+    one bad row fails the whole statement, this tells the good rows from the bad ones
+    '''
+    result = QueryResult([], [])
+    for row in rows:
+        try:
+            result.data += insert(row).data
+            result.errors.append(None)
+        except Exception as e:
+            if not rejected(e):
+                raise
+            result.errors.append(refusal(e))
+    return result
+
+async def ainsert_each(rows, insert):
+    '''
+    insert_each for a coroutine insert(row)
+    '''
+    result = QueryResult([], [])
+    for row in rows:
+        try:
+            result.data += (await insert(row)).data
+            result.errors.append(None)
+        except Exception as e:
+            if not rejected(e):
+                raise
+            result.errors.append(refusal(e))
+    return result
+
+def bulk_insert(table, rows):
+    try:
+        return get_client().table(table).insert(rows).execute()
+    except Exception as e:
+        if not rejected(e):
+            raise
+        return insert_each(rows, lambda row: get_client().table(table).insert(row).execute())
+
+def bulk_update(table, ids, data: dict):
+    rows = []
+    for chunk in chunks(ids):
+        rows += get_client().table(table).update(data).in_("id", chunk).execute().data
+    return QueryResult(rows)
+
+def bulk_delete(table, ids):
+    rows = []
+    for chunk in chunks(ids):
+        rows += get_client().table(table).delete().in_("id", chunk).execute().data
+    return QueryResult(rows)
+
+# ============ DELTA SYNC ============
+
+def get_tombstones(table, since):
+    # deletions are recorded by the tombstone triggers (see README)
+    return get_client().table("tombstones").select("row_id, deleted_at").eq("table_name", table).gte("deleted_at", since).execute()
+
+# ============ STATISTICS ============
+
+def get_stats(project_id=None):
+    # counts are grouped in postgres by the projectdock_stats function (see README)
+    return get_client().rpc("projectdock_stats", {"p_project_id": project_id}).execute()
+
+def ping():
+    # cheapest round trip to the database, for warmup and readiness checks
+    return get_client().table("users").select("id").limit(1).execute()
 
 # ============ DATABASE MANAGER CLASS ============
 
 class DataBaseManager:
+    '''
+    interface shared by all storage backends
+    every method returns a result object whose `.data` is a list of row dicts
+    get_all_* take optional (column, op, value) `filters`, an `order_by` column ("-column" for descending),
+    a list of `fields` to project, and return `limit` rows at a time starting after the `after` key
+    '''
+    def create_user(self, name, email, password_hash, role):
+        raise NotImplementedError
+
+    def get_all_users(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        raise NotImplementedError
+
+    def update_user(self, user_id, data):
+        raise NotImplementedError
+
+    def delete_user(self, user_id):
+        raise NotImplementedError
+
+    def create_project(self, name, description, owner_id, start_date, end_date, status):
+        raise NotImplementedError
+
+    def get_all_projects(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        raise NotImplementedError
+
+    def update_project(self, project_id, data):
+        raise NotImplementedError
+
+    def delete_project(self, project_id):
+        raise NotImplementedError
+
+    def create_task(self, project_id, title, description, assigned_to, due_date, status):
+        raise NotImplementedError
+
+    def get_all_tasks(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        raise NotImplementedError
+
+    def get_tasks_by_project(self, project_id):
+        raise NotImplementedError
+
+    def get_project_detail(self, project_id):
+        '''
+        the project with an "owner" object and a "tasks" list, each task with an "assignee" object
+        (owner/assignee hold id, name and email, or are None); `.data` is empty when the project does not exist
+        '''
+        raise NotImplementedError
+
+    def update_task(self, task_id, data):
+        raise NotImplementedError
+
+    def delete_task(self, task_id):
+        raise NotImplementedError
+
+    def bulk_insert(self, table, rows):
+        '''
+        insert many rows of `table` in one statement, the result rows are in the same order
+        if a row breaks a constraint the rows are inserted one by one instead (insert_each), and
+        the result's `.errors` tells which were refused
+        '''
+        raise NotImplementedError
+
+    def bulk_update(self, table, ids, data):
+        '''
+        apply the same update to every row whose id is in `ids`, the result holds the rows that matched
+        '''
+        raise NotImplementedError
+
+    def bulk_delete(self, table, ids):
+        '''
+        delete every row whose id is in `ids`, the result holds the rows that were deleted
+        '''
+        raise NotImplementedError
+
+    def get_tombstones(self, table, since):
+        '''
+        rows of `table` deleted at or after the `since` timestamp, as {"row_id", "deleted_at"} dicts
+        '''
+        raise NotImplementedError
+
+    def get_stats(self, project_id=None):
+        '''
+        counts grouped by status, role, owner and assignee; `.data` is a dict with a
+        "tasks" section (limited to one project when project_id is given) plus
+        "projects" and "users" sections for the global stats
+        '''
+        raise NotImplementedError
+
+    def ping(self):
+        '''
+        cheapest round trip to the database; raises if it cannot be reached
+        '''
+        raise NotImplementedError
+
+class SupabaseDataBaseManager(DataBaseManager):
+    '''
+    backend that talks to supabase over http
+    '''
     def create_user(self, name, email, password_hash, role):
         return create_user(name, email, password_hash, role)
     
-    def get_all_users(self):
-        return get_all_users()
+    def get_all_users(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return get_all_users(limit, after, filters, order_by, fields)
     
     def update_user(self, user_id, data):
         return update_user(user_id, data)
@@ -95,8 +404,8 @@ class DataBaseManager:
     def create_project(self, name, description, owner_id, start_date, end_date, status):
         return create_project(name, description, owner_id, start_date, end_date, status)
     
-    def get_all_projects(self):
-        return get_all_projects()
+    def get_all_projects(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return get_all_projects(limit, after, filters, order_by, fields)
     
     def update_project(self, project_id, data):
         return update_project(project_id, data)
@@ -107,14 +416,290 @@ class DataBaseManager:
     def create_task(self, project_id, title, description, assigned_to, due_date, status):
         return create_task(project_id, title, description, assigned_to, due_date, status)
     
-    def get_all_tasks(self):
-        return get_all_tasks()
+    def get_all_tasks(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return get_all_tasks(limit, after, filters, order_by, fields)
     
     def get_tasks_by_project(self, project_id):
         return get_tasks_by_project(project_id)
+
+    def get_project_detail(self, project_id):
+        return get_project_detail(project_id)
     
     def update_task(self, task_id, data):
         return update_task(task_id, data)
     
     def delete_task(self, task_id):
         return delete_task(task_id)
+
+    def bulk_insert(self, table, rows):
+        return bulk_insert(table, rows)
+
+    def bulk_update(self, table, ids, data):
+        return bulk_update(table, ids, data)
+
+    def bulk_delete(self, table, ids):
+        return bulk_delete(table, ids)
+
+    def get_tombstones(self, table, since):
+        return get_tombstones(table, since)
+
+    def get_stats(self, project_id=None):
+        return get_stats(project_id)
+
+    def ping(self):
+        return ping()
+
+# ============ ASYNC DATABASE MANAGER ============
+
+class AsyncDataBaseManager:
+    '''
+    async twin of DataBaseManager, used by the async managers and the API
+    every method is a coroutine returning a result object whose `.data` is a list of row dicts
+    '''
+    async def create_user(self, name, email, password_hash, role):
+        raise NotImplementedError
+
+    async def get_all_users(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        raise NotImplementedError
+
+    async def update_user(self, user_id, data):
+        raise NotImplementedError
+
+    async def delete_user(self, user_id):
+        raise NotImplementedError
+
+    async def create_project(self, name, description, owner_id, start_date, end_date, status):
+        raise NotImplementedError
+
+    async def get_all_projects(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        raise NotImplementedError
+
+    async def update_project(self, project_id, data):
+        raise NotImplementedError
+
+    async def delete_project(self, project_id):
+        raise NotImplementedError
+
+    async def create_task(self, project_id, title, description, assigned_to, due_date, status):
+        raise NotImplementedError
+
+    async def get_all_tasks(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        raise NotImplementedError
+
+    async def get_tasks_by_project(self, project_id):
+        raise NotImplementedError
+
+    async def get_project_detail(self, project_id):
+        raise NotImplementedError
+
+    async def update_task(self, task_id, data):
+        raise NotImplementedError
+
+    async def delete_task(self, task_id):
+        raise NotImplementedError
+
+    async def bulk_insert(self, table, rows):
+        raise NotImplementedError
+
+    async def bulk_update(self, table, ids, data):
+        raise NotImplementedError
+
+    async def bulk_delete(self, table, ids):
+        raise NotImplementedError
+
+    async def get_tombstones(self, table, since):
+        raise NotImplementedError
+
+    async def get_stats(self, project_id=None):
+        raise NotImplementedError
+
+    async def ping(self):
+        raise NotImplementedError
+
+    async def close(self):
+        '''
+        release connections, called when the API shuts down
+        '''
+
+class AsyncSupabaseDataBaseManager(AsyncDataBaseManager):
+    '''
+    backend that talks to supabase through the async client
+    the client (and its pooled http connections) is created on first use inside the running event loop
+    '''
+    def __init__(self):
+        self._client = None
+        self._opening = None
+
+    async def _connect(self):
+        if self._client is None:
+            # concurrent first calls share one client instead of creating several
+            if self._opening is None:
+                self._opening = asyncio.ensure_future(self._open())
+            try:
+                await self._opening
+            except Exception:
+                self._opening = None
+                raise
+        return self._client
+
+    async def _open(self):
+        if not url or not key:
+            raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set to use the supabase backend")
+        from supabase import acreate_client
+        self._client = await acreate_client(url, key)
+
+    async def _table(self, name):
+        return (await self._connect()).table(name)
+
+    async def create_user(self, name, email, password_hash, role):
+        table = await self._table("users")
+        return await table.insert(user_row(name, email, password_hash, role)).execute()
+
+    async def get_all_users(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        table = await self._table("users")
+        return await list_query(table.select(select_columns(fields, USER_COLUMNS)), filters, order_by, limit, after).execute()
+
+    async def update_user(self, user_id, data):
+        table = await self._table("users")
+        return await table.update(data).eq("id", user_id).execute()
+
+    async def delete_user(self, user_id):
+        table = await self._table("users")
+        return await table.delete().eq("id", user_id).execute()
+
+    async def create_project(self, name, description, owner_id, start_date, end_date, status):
+        table = await self._table("projects")
+        return await table.insert(project_row(name, description, owner_id, start_date, end_date, status)).execute()
+
+    async def get_all_projects(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        table = await self._table("projects")
+        return await list_query(table.select(select_columns(fields)), filters, order_by, limit, after).execute()
+
+    async def update_project(self, project_id, data):
+        table = await self._table("projects")
+        return await table.update(data).eq("id", project_id).execute()
+
+    async def delete_project(self, project_id):
+        table = await self._table("projects")
+        return await table.delete().eq("id", project_id).execute()
+
+    async def create_task(self, project_id, title, description, assigned_to, due_date, status):
+        table = await self._table("tasks")
+        return await table.insert(task_row(project_id, title, description, assigned_to, due_date, status)).execute()
+
+    async def get_all_tasks(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        table = await self._table("tasks")
+        return await list_query(table.select(select_columns(fields)), filters, order_by, limit, after).execute()
+
+    async def get_tasks_by_project(self, project_id):
+        table = await self._table("tasks")
+        return await table.select("*").eq("project_id", project_id).execute()
+
+    async def get_project_detail(self, project_id):
+        table = await self._table("projects")
+        return await project_detail_query(table, project_id).execute()
+
+    async def update_task(self, task_id, data):
+        table = await self._table("tasks")
+        return await table.update(data).eq("id", task_id).execute()
+
+    async def delete_task(self, task_id):
+        table = await self._table("tasks")
+        return await table.delete().eq("id", task_id).execute()
+
+    async def bulk_insert(self, table, rows):
+        query = await self._table(table)
+        try:
+            return await query.insert(rows).execute()
+        except Exception as e:
+            if not rejected(e):
+                raise
+
+        async def insert(row):
+            query = await self._table(table)
+            return await query.insert(row).execute()
+        return await ainsert_each(rows, insert)
+
+    async def bulk_update(self, table, ids, data):
+        rows = []
+        for chunk in chunks(ids):
+            query = await self._table(table)
+            rows += (await query.update(data).in_("id", chunk).execute()).data
+        return QueryResult(rows)
+
+    async def bulk_delete(self, table, ids):
+        rows = []
+        for chunk in chunks(ids):
+            query = await self._table(table)
+            rows += (await query.delete().in_("id", chunk).execute()).data
+        return QueryResult(rows)
+
+    async def get_tombstones(self, table, since):
+        query = await self._table("tombstones")
+        return await query.select("row_id, deleted_at").eq("table_name", table).gte("deleted_at", since).execute()
+
+    async def get_stats(self, project_id=None):
+        client = await self._connect()
+        return await client.rpc("projectdock_stats", {"p_project_id": project_id}).execute()
+
+    async def ping(self):
+        table = await self._table("users")
+        return await table.select("id").limit(1).execute()
+
+    async def close(self):
+        # the next call (e.g. in a new event loop) opens a fresh client
+        if self._client is not None:
+            await self._client.postgrest.aclose()
+            self._client, self._opening = None, None
+
+# one manager of each kind per process, shared by every logic manager (and with it the connections)
+_managers = {}
+
+def shared_manager(kind, build):
+    with _lock:
+        if kind not in _managers:
+            _managers[kind] = build()
+        return _managers[kind]
+
+def get_database_manager():
+    '''
+    the process-wide backend selected by DB_BACKEND
+    '''
+    return shared_manager("sync", new_database_manager)
+
+def get_async_database_manager():
+    '''
+    the process-wide async backend selected by DB_BACKEND
+    '''
+    return shared_manager("async", new_async_database_manager)
+
+def new_database_manager():
+    '''
+    build the backend selected by DB_BACKEND, with every call timed for /metrics
+    '''
+    if DB_BACKEND == "sqlite":
+        from src.sqlite_db import SQLiteDataBaseManager
+        return instrument(SQLiteDataBaseManager(SQLITE_PATH), DataBaseManager)
+    if DB_BACKEND == "supabase":
+        return instrument(SupabaseDataBaseManager(), DataBaseManager)
+    raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND}")
+
+
+def new_async_database_manager():
+    '''
+    build the async backend selected by DB_BACKEND, with every call timed for /metrics,
+    at most DB_CONCURRENCY calls in flight and task updates buffered when WRITE_BEHIND_MS is set
+    '''
+    if DB_BACKEND == "sqlite":
+        from src.sqlite_db import AsyncSQLiteDataBaseManager
+        manager = instrument(AsyncSQLiteDataBaseManager(SQLITE_PATH), AsyncDataBaseManager)
+    elif DB_BACKEND == "supabase":
+        manager = instrument(AsyncSupabaseDataBaseManager(), AsyncDataBaseManager)
+    else:
+        raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND}")
+    from src.admission import DB_CONCURRENCY, ConcurrencyLimit, limit_concurrency
+    if DB_CONCURRENCY > 0:
+        # gated outside the timing, so db_call_duration_seconds stays the time spent in the database
+        manager = limit_concurrency(manager, AsyncDataBaseManager, ConcurrencyLimit())
+    from src.write_behind import WRITE_BEHIND_MS, WriteBehindTasks
+    return WriteBehindTasks(manager) if WRITE_BEHIND_MS > 0 else manager
@@ -0,0 +1,154 @@
+# src events.py
+# in-process pub/sub for change notifications: managers publish after every write,
+# each GET /events client reads its own bounded queue
+
+import asyncio
+import itertools
+import os
+import random
+import threading
+from collections import deque
+
+# events a subscriber may fall behind by before its backlog is replaced with one resync
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+# recent events kept so a client reconnecting with Last-Event-ID gets what it missed
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1000"))
+
+def resync_event(event_id):
+    # "reload everything": sent when events were lost, the client cannot tell which
+    return {"id": event_id, "action": "resync"}
+
+class Subscription:
+    '''
+    one /events client: a bounded asyncio queue on the client's event loop
+    '''
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.resyncs = 0
+
+    def offer(self, event):
+        # runs on the subscriber's loop; a full queue means the client is not keeping up,
+        # so its backlog is dropped for one resync event instead of making the writer wait
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resync_event(event["id"]))
+            self.resyncs += 1
+            return
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        '''
+        hand an event over from any thread (sync managers write from the threadpool)
+        '''
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.offer(event)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.offer, event)
+
+    def end(self):
+        # runs on the subscriber's loop: None tells the stream to finish, even past a full backlog
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self):
+        return await self.queue.get()
+
+class EventHub:
+    '''
+    fan-out of change events to every subscriber; publish() never blocks on a subscriber
+    event ids count up from a random start per process, so they only mean something to this
+    process: an id from another worker or from before a restart is outside this process's
+    range and gets a resync
+    '''
+    def __init__(self, queue_size=EVENTS_QUEUE_SIZE, history=EVENTS_HISTORY):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._history = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.renumber()
+
+    def renumber(self):
+        '''
+        start the ids over at a new random point (also run in every forked worker)
+        '''
+        first = random.randrange(1, 2 ** 40)
+        self._ids = itertools.count(first)
+        self._last_id = first - 1
+        self._history.clear()
+
+    def publish(self, table, action, ids):
+        '''
+        tell every subscriber that rows of `table` were created, updated or deleted
+        '''
+        with self._lock:
+            self._last_id = next(self._ids)
+            event = {"id": self._last_id, "table": table, "action": action, "ids": ids}
+            self._history.append(event)
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def subscribe(self, last_event_id=None):
+        '''
+        new subscription on the running event loop; with `last_event_id` the events
+        published after it are queued first (or a resync if they are no longer kept)
+        '''
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self.missed(last_event_id):
+                    subscription.offer(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def missed(self, last_event_id):
+        # called with the lock held
+        if last_event_id == self._last_id:
+            return []
+        oldest = self._history[0]["id"] if self._history else self._last_id + 1
+        # ids from another process (restart) or older than the history: the client has to reload
+        if last_event_id > self._last_id or last_event_id < oldest - 1:
+            return [resync_event(self._last_id)]
+        return [event for event in self._history if event["id"] > last_event_id]
+
+    def close(self):
+        '''
+        end every open stream (the server is shutting down and would otherwise wait for them);
+        safe to call from a signal handler
+        '''
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.end)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "last_event_id": self._last_id,
+            "queue_size": self.queue_size,
+            "queued": sum(subscription.queue.qsize() for subscription in subscribers),
+            "resyncs": sum(subscription.resyncs for subscription in subscribers),
+        }
+
+# shared by every manager in this process
+hub = EventHub()
+# workers forked from a preloaded app (API/serve.py) must not share an id range
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=hub.renumber)
@@ -0,0 +1,139 @@
+# src idempotency.py
+# Idempotency-Key support for the create endpoints: the first request with a key runs,
+# the result is kept for a while and a retry with the same key gets it back without a database call
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+# seconds a completed request is remembered for retries with the same key
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# most keys remembered before the least recently used is forgotten
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# longest key accepted (a uuid is 36 characters)
+MAX_KEY_LENGTH = 255
+
+class IdempotencyError(Exception):
+    '''
+    a key that cannot be used: `status` is the http status to answer with
+    '''
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def wrote_nothing(result):
+    # a bulk response is judged by its per-item results, a single create by its success flag
+    if not isinstance(result, dict):
+        return False
+    if isinstance(result.get("results"), list):
+        return not any(item.get("success") for item in result["results"])
+    return result.get("success") is False
+
+def fingerprint(payload):
+    # the same key has to come with the same request, compared as canonical json
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+class IdempotencyStore:
+    '''
+    (endpoint, key) -> result of the request that first used the key
+    a request still running is shared: a retry that arrives before the original finished
+    waits for it instead of inserting again
+    only results that wrote something are kept; a request that wrote nothing forgets its key
+    so a retry runs again, while a partly failed bulk create stays remembered (a retry would
+    insert its successful rows twice)
+    '''
+    def __init__(self, maxsize=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # (endpoint, key) -> (expiry, fingerprint, future of the result)
+        self._entries = OrderedDict()
+        self.stored = 0
+        self.replays = 0
+        self.waits = 0
+        self.conflicts = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    def _expire(self, now):
+        # entries are kept in insertion/use order, so only the oldest few have to be looked at;
+        # a request still running is never forgotten (and is among the newest anyway)
+        while self._entries:
+            key, (expiry, _, future) = next(iter(self._entries.items()))
+            if not future.done() or (expiry >= now and len(self._entries) <= self.maxsize):
+                break
+            del self._entries[key]
+            if expiry >= now:
+                self.evictions += 1
+
+    async def run(self, endpoint, key, payload, create):
+        '''
+        result of `create()` for this key: run it the first time, replay it afterwards
+        returns (result, replayed)
+        '''
+        if not self.enabled or key is None:
+            return await create(), False
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+        now = time.monotonic()
+        expected = fingerprint(payload)
+        entry = self._entries.get((endpoint, key))
+        if entry is not None and entry[0] < now and entry[2].done():
+            del self._entries[(endpoint, key)]
+            entry = None
+        if entry is not None:
+            if entry[1] != expected:
+                self.conflicts += 1
+                raise IdempotencyError(422, "Idempotency-Key was already used with a different request")
+            self._entries.move_to_end((endpoint, key))
+            if not entry[2].done():
+                self.waits += 1
+            # shield: a retry that disconnects must not cancel the original request
+            result = await asyncio.shield(entry[2])
+            self.replays += 1
+            return result, True
+        future = asyncio.get_running_loop().create_future()
+        self._entries[(endpoint, key)] = (now + self.ttl, expected, future)
+        self._expire(now)
+        try:
+            result = await create()
+        except BaseException as e:
+            self._forget(endpoint, key, future)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                # retries waiting on it get the same error; marked retrieved in case none is
+                future.set_exception(e)
+                future.exception()
+            raise
+        if wrote_nothing(result):
+            self._forget(endpoint, key, future)
+        else:
+            self.stored += 1
+        future.set_result(result)
+        return result, False
+
+    def _forget(self, endpoint, key, future):
+        entry = self._entries.get((endpoint, key))
+        if entry is not None and entry[2] is future:
+            del self._entries[(endpoint, key)]
+
+    def stats(self):
+        return {
+            "keys": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "stored": self.stored,
+            "replays": self.replays,
+            "waits": self.waits,
+            "conflicts": self.conflicts,
+            "evictions": self.evictions,
+        }
+
+# shared by every create endpoint of this process
+store = IdempotencyStore()
@@ -1,6 +1,441 @@
 # src logic.py
 
-from src.db import DataBaseManager
+import base64
+import json
+import os
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.cache import TTLCache
+from src.events import hub
+from src.peers import peers
+from src.search import SearchIndex
+from src.write_behind import WriteBehindTasks
+from src.db import (
+    TOMBSTONE_DAYS, get_async_database_manager, get_database_manager, parse_order,
+    project_row, task_row, user_row,
+)
+
+# read-through cache shared by all managers, CACHE_TTL=0 turns it off
+cache = TTLCache(
+    maxsize=int(os.getenv("CACHE_MAX_ENTRIES", "256")),
+    ttl=float(os.getenv("CACHE_TTL", "30")),
+)
+
+# columns each list endpoint may return and sort by
+TASK_FIELDS = ("id", "project_id", "title", "description", "assigned_to", "status", "due_date", "created_at", "updated_at")
+PROJECT_FIELDS = ("id", "name", "description", "owner_id", "start_date", "end_date", "team_members", "status", "created_at", "updated_at")
+USER_FIELDS = ("id", "name", "email", "role", "created_at", "updated_at")
+TASK_SORTS = {"created_at", "updated_at", "due_date", "title", "status"}
+PROJECT_SORTS = {"created_at", "updated_at", "name", "status", "start_date", "end_date"}
+USER_SORTS = {"created_at", "updated_at", "name", "email", "role"}
+
+# seconds of changes every delta read asks for again: a write is stamped before it commits (NOW() is
+# the transaction start in postgres, the sqlite backend stamps rows in python), so it can become
+# visible after a read that already returned newer rows; next_since stays this far behind the clock
+SINCE_MARGIN = float(os.getenv("SINCE_MARGIN", "5"))
+
+# longest look-ahead of /tasks/upcoming
+MAX_WITHIN_DAYS = 366
+# units of the `within` parameter, in days
+WITHIN_UNITS = {"d": 1, "w": 7}
+
+# full-text index behind /search: loaded on the first search, then kept current by every write
+search_index = SearchIndex()
+# seconds between catch-ups with writes this process did not make (other workers, direct database edits)
+SEARCH_REFRESH = float(os.getenv("SEARCH_REFRESH", "10"))
+# columns the index reads from each table
+SEARCH_COLUMNS = {
+    "tasks": "id,title,description,project_id,status,due_date,updated_at",
+    "projects": "id,name,description,status,updated_at",
+}
+
+def encode_cursor(row, order_by=None):
+    '''
+    turn the last row of a page into an opaque cursor for the next page
+    '''
+    column, _ = parse_order(order_by)
+    raw = json.dumps([order_by or "", row[column], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor, order_by=None):
+    '''
+    turn a cursor back into the (order value, id) key, raises ValueError if it is malformed
+    or was issued for a different order_by
+    '''
+    try:
+        order, value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if order != (order_by or ""):
+        raise ValueError("Cursor was issued for a different order_by")
+    return value, str(row_id)
+
+def next_cursor(rows, limit, order_by=None):
+    '''
+    cursor for the page after `rows`, or None when this was the last page
+    '''
+    if limit and rows and len(rows) >= limit:
+        return encode_cursor(rows[-1], order_by)
+    return None
+
+def list_columns(fields, order_by, limit, allowed_fields, sortable, updated_since=None):
+    '''
+    validate the `fields` (comma separated) and `order_by` of a list request
+    return the columns to select, or None for the default columns
+    '''
+    column, _ = parse_order(order_by)
+    if column not in sortable:
+        raise ValueError(f"Cannot order by {column}")
+    if not fields:
+        return None
+    columns = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in columns if field not in allowed_fields]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    # a delta read reports the newest updated_at it saw
+    if updated_since and "updated_at" not in columns:
+        columns.append("updated_at")
+    # the next cursor is built from the order column and id of the last row
+    if limit:
+        columns += [needed for needed in ("id", column) if needed not in columns]
+    return columns
+
+def equal_filters(**values):
+    '''
+    (column, "eq", value) filters for every value that was given
+    '''
+    return [(column, "eq", value) for column, value in values.items() if value is not None]
+
+def outcome(result, success_message, error_message):
+    '''
+    success/failure response of a write, based on whether the database returned rows
+    '''
+    if result.data:
+        return {"success": True, "message": success_message}
+    return {"success": False, "message": error_message}
+
+def written(result, table, action, *cascade):
+    '''
+    after a write: drop the cached reads of the table (and of the tables the write cascades to)
+    and publish the ids of the rows it touched to /events subscribers
+    '''
+    cache.invalidate(table, *cascade)
+    rows = (result.data if result is not None else None) or []
+    ids = [row["id"] for row in rows if "id" in row]
+    if ids:
+        hub.publish(table, action, ids)
+        if search_index.ready and table in SEARCH_COLUMNS:
+            search_index.apply(table, action, rows)
+    # the other workers of a multi-process server (API/serve.py) drop their cached reads too
+    peers.broadcast((table, *cascade), table, action, ids)
+
+def written_elsewhere(change):
+    '''
+    a write relayed from another worker: the same invalidation and /events event as a local write;
+    the relayed message has ids but not rows, so the search index catches up from the database instead
+    '''
+    cache.invalidate(*change["namespaces"])
+    if change["ids"] is None or change["ids"]:
+        hub.publish(change["table"], change["action"], change["ids"] or [])
+    if set(change["namespaces"]) & set(SEARCH_COLUMNS):
+        search_index.expire()
+
+def listing(result, entity, limit=None, order_by=None):
+    '''
+    response of a list read, with the cursor of the next page
+    no rows is an empty page (the page after the last full one), only a missing result is an error
+    '''
+    if result.data is None:
+        return {"success": False, "message": f"error retrieving {entity}"}
+    return {"success": True, "message": f"retrived all {entity}", "data": result.data, "next_cursor": next_cursor(result.data, limit, order_by)}
+
+def detail(result, entity):
+    '''
+    response of a single record read
+    '''
+    if result.data:
+        return {"success": True, "message": f"retrieved {entity}", "data": result.data[0]}
+    return {"success": False, "message": f"{entity} not found"}
+
+def since_text(since):
+    '''
+    an updated_since timestamp (datetime or iso string) as utc iso text with microseconds,
+    the shape updated_at is stored in, so it compares correctly as text in sqlite too
+    raises ValueError if it is not a timestamp
+    '''
+    if since is None:
+        return None
+    if isinstance(since, str):
+        since = datetime.fromisoformat(since)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return since.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+class SinceExpired(Exception):
+    '''
+    an updated_since older than the deletions still kept in tombstones (TOMBSTONE_DAYS): a delta
+    from then could miss deleted rows, so the client has to reload in full; answered with a 410
+    '''
+
+def delta_since(updated_since):
+    '''
+    since_text of an updated_since parameter, checked against the tombstone retention
+    '''
+    since = since_text(updated_since)
+    if since is not None and TOMBSTONE_DAYS:
+        horizon = datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_DAYS)
+        if datetime.fromisoformat(since) < horizon:
+            raise SinceExpired(f"updated_since is older than the {TOMBSTONE_DAYS:g} days of deletions kept, reload in full")
+    return since
+
+def delta(result, tombstones, entity, since, limit=None, order_by=None):
+    '''
+    response of an updated_since read: the rows changed at or after `since`, the ids deleted since then,
+    and `next_since` to send as updated_since next time
+    '''
+    rows = result.data or []
+    deleted = tombstones.data or []
+    return {
+        "success": True,
+        "message": f"retrieved {entity} changed since {since}",
+        "data": rows,
+        "deleted": [row["row_id"] for row in deleted],
+        "next_cursor": next_cursor(rows, limit, order_by),
+        "next_since": newest_change(rows, deleted, since),
+    }
+
+def newest_change(rows, tombstones, since):
+    '''
+    latest updated_at / deleted_at among changed rows and tombstones, `since` if there are none;
+    never later than SINCE_MARGIN seconds ago (so late commits are read again) nor earlier than `since`
+    '''
+    stamps = [row["updated_at"] for row in rows if row.get("updated_at")] + [row["deleted_at"] for row in tombstones]
+    if not stamps:
+        return since
+    newest = min(
+        datetime.fromisoformat(since_text(max(stamps, key=datetime.fromisoformat))),
+        datetime.now(timezone.utc) - timedelta(seconds=SINCE_MARGIN),
+    )
+    if since is not None:
+        newest = max(newest, datetime.fromisoformat(since))
+    return since_text(newest)
+
+def search_response(hits, query):
+    return {
+        "success": True,
+        "message": f"found {len(hits)} results for {query!r}",
+        "data": [{"type": table[:-1], "score": round(score, 3), **summary} for score, table, summary in hits],
+    }
+
+def search_tables(type):
+    # "task" / "project" narrows a search to one table, None searches both
+    if type is None:
+        return None
+    if type not in ("task", "project"):
+        raise ValueError("type must be 'task' or 'project'")
+    return {type + "s"}
+
+def search_query(table, since):
+    _, args = (task_query if table == "tasks" else project_query)(
+        EXPORT_CHUNK_SIZE, fields=SEARCH_COLUMNS[table], updated_since=since,
+    )
+    return args
+
+def project_error(name, owner_id):
+    if not name or not owner_id:
+        return "Project name and owner_id are required"
+    return None
+
+def user_error(name, email, password_hash):
+    if not name or not email or not password_hash:
+        return "Name, email, and password are required"
+    return None
+
+def unique(ids):
+    # drop repeated ids, keeping the first occurrence
+    return list(dict.fromkeys(ids))
+
+def bulk_summary(results, entity, verb):
+    ok = sum(1 for item in results if item["success"])
+    return {"success": ok == len(results), "message": f"{ok} of {len(results)} {entity} {verb}", "results": results}
+
+def bulk_added(errors, result, entity):
+    '''
+    per-item response of a bulk insert
+    `errors` holds a validation message (or None) for every submitted item; the rows that
+    passed were inserted together and come back in the same order, unless the database
+    refused some of them (result.errors, one per row sent)
+    '''
+    rows = iter(result.data if result else [])
+    refused = iter(getattr(result, "errors", None) or [])
+    results = []
+    for index, error in enumerate(errors):
+        row = None
+        if not error:
+            reason = next(refused, None)
+            if reason:
+                error = f"error adding {entity[:-1]}: {reason}"
+            else:
+                row = next(rows, None)
+        if row:
+            results.append({"index": index, "success": True, "id": row["id"], "message": f"{entity[:-1]} added successfully"})
+        else:
+            results.append({"index": index, "success": False, "message": error or f"error adding {entity[:-1]}"})
+    return bulk_summary(results, entity, "added")
+
+def bulk_matched(ids, result, entity, verb):
+    '''
+    per-id response of a bulk update or delete, ids the database did not return were not found
+    '''
+    found = {row["id"] for row in result.data} if result else set()
+    results = [
+        {"id": row_id, "success": row_id in found,
+         "message": f"{entity[:-1]} {verb} successfully" if row_id in found else f"{entity[:-1]} not found"}
+        for row_id in ids
+    ]
+    return bulk_summary(results, entity, verb)
+
+def stats_response(result):
+    return {"success": True, "message": "retrieved stats", "data": result.data}
+
+def task_query(limit=None, after=None, status=None, project_id=None, assigned_to=None,
+               due_before=None, due_after=None, order_by=None, fields=None, updated_since=None):
+    '''
+    validate a task listing request (updated_since already in since_text form)
+    return its cache key and the arguments for get_all_tasks
+    '''
+    columns = list_columns(fields, order_by, limit, TASK_FIELDS, TASK_SORTS, updated_since)
+    filters = equal_filters(status=status, project_id=project_id, assigned_to=assigned_to)
+    if due_before:
+        filters.append(("due_date", "lt", due_before))
+    if due_after:
+        filters.append(("due_date", "gt", due_after))
+    if updated_since:
+        filters.append(("updated_at", "gte", updated_since))
+    cursor = decode_cursor(after, order_by) if after else None
+    key = ("tasks", limit, after, status, project_id, assigned_to, due_before, due_after, order_by, fields, updated_since)
+    return key, (limit, cursor, filters, order_by, columns)
+
+def project_query(limit=None, after=None, status=None, owner_id=None, order_by=None, fields=None, updated_since=None):
+    '''
+    validate a project listing request (updated_since already in since_text form)
+    return its cache key and the arguments for get_all_projects
+    '''
+    columns = list_columns(fields, order_by, limit, PROJECT_FIELDS, PROJECT_SORTS, updated_since)
+    filters = equal_filters(status=status, owner_id=owner_id)
+    if updated_since:
+        filters.append(("updated_at", "gte", updated_since))
+    cursor = decode_cursor(after, order_by) if after else None
+    key = ("projects", limit, after, status, owner_id, order_by, fields, updated_since)
+    return key, (limit, cursor, filters, order_by, columns)
+
+def parse_within(within):
+    '''
+    a look-ahead like "7d", "2w" or "10" (days) as a number of days
+    raises ValueError if it is malformed or longer than MAX_WITHIN_DAYS
+    '''
+    text = str(within).strip().lower()
+    unit = WITHIN_UNITS.get(text[-1:])
+    number = text[:-1] if unit else text
+    if not number.isdigit():
+        raise ValueError("within must look like 7d, 2w or a number of days")
+    days = int(number) * (unit or 1)
+    if days > MAX_WITHIN_DAYS:
+        raise ValueError(f"within can be at most {MAX_WITHIN_DAYS} days")
+    return days
+
+def today_utc():
+    return datetime.now(timezone.utc).date()
+
+def due_query(kind, project_id=None, assigned_to=None, limit=None, after=None, fields=None, today=None, days=None):
+    '''
+    validate an overdue (due before today) or upcoming (due today to today + days) request
+    return its cache key and the arguments for get_all_tasks: open tasks only, soonest due first,
+    so the database answers it with a range scan of the due_date index
+    '''
+    today = today or today_utc()
+    columns = list_columns(fields, "due_date", limit, TASK_FIELDS, TASK_SORTS)
+    filters = equal_filters(project_id=project_id, assigned_to=assigned_to)
+    filters.append(("status", "neq", "completed"))
+    if kind == "overdue":
+        filters.append(("due_date", "lt", today.isoformat()))
+    else:
+        filters.append(("due_date", "gte", today.isoformat()))
+        filters.append(("due_date", "lte", (today + timedelta(days=days)).isoformat()))
+    cursor = decode_cursor(after, "due_date") if after else None
+    # today is part of the key: the answer changes at midnight without any write
+    key = ("tasks", kind, limit, after, project_id, assigned_to, fields, today.isoformat(), days)
+    return key, (limit, cursor, filters, "due_date", columns)
+
+def due_listing(result, kind, limit):
+    # like listing(), no tasks due is an empty page, with a count in the message for reminder jobs
+    rows = result.data or []
+    return {
+        "success": True,
+        "message": f"retrieved {len(rows)} {kind} tasks",
+        "data": rows,
+        "next_cursor": next_cursor(rows, limit, "due_date"),
+    }
+
+def user_query(limit=None, after=None, role=None, order_by=None, fields=None, updated_since=None):
+    '''
+    validate a user listing request (updated_since already in since_text form)
+    return its cache key and the arguments for get_all_users
+    '''
+    columns = list_columns(fields, order_by, limit, USER_FIELDS, USER_SORTS, updated_since)
+    filters = equal_filters(role=role)
+    if updated_since:
+        filters.append(("updated_at", "gte", updated_since))
+    cursor = decode_cursor(after, order_by) if after else None
+    key = ("users", limit, after, role, order_by, fields, updated_since)
+    return key, (limit, cursor, filters, order_by, columns)
+
+# rows fetched per database round trip while streaming an export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+def export_fields(fields):
+    # columns an export asked for (the query may add id/created_at for paging), None for all
+    return [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+def export_page(rows, fields):
+    if fields:
+        return [{field: row.get(field) for field in fields} for row in rows]
+    return rows
+
+def page_after(rows, order_by):
+    # keyset of the last row, in the same (value, id) shape as decode_cursor
+    column, _ = parse_order(order_by)
+    return rows[-1][column], str(rows[-1]["id"])
+
+def iter_pages(fetch, args, fields):
+    '''
+    yield every row of a list query one keyset page at a time, straight from the database
+    (not the cache), so an export never holds more than EXPORT_CHUNK_SIZE rows
+    '''
+    limit, cursor, filters, order_by, columns = args
+    while True:
+        rows = fetch(limit, cursor, filters, order_by, columns).data or []
+        if rows:
+            yield export_page(rows, fields)
+        if len(rows) < limit:
+            return
+        cursor = page_after(rows, order_by)
+
+async def aiter_pages(fetch, args, fields):
+    '''
+    async version of iter_pages
+    '''
+    limit, cursor, filters, order_by, columns = args
+    while True:
+        rows = (await fetch(limit, cursor, filters, order_by, columns)).data or []
+        if rows:
+            yield export_page(rows, fields)
+        if len(rows) < limit:
+            return
+        cursor = page_after(rows, order_by)
 
 class TaskManager:
     '''
@@ -8,7 +443,7 @@ class TaskManager:
     '''
     def __init__(self):
         #creates an instance of the database manager (this will handle all db operations)
-        self.db = DataBaseManager()
+        self.db = get_database_manager()
 
     #create a new task
 
@@ -18,19 +453,51 @@ class TaskManager:
         return the success if task is added successfully
         '''
         result = self.db.create_task(project_id, title, description, assigned_to, due_date, status)
-        if result.data:
-            return {"success": True, "message": "task added successfully"}
-        return {"success": False, "message": "error adding task"}
+        written(result, "tasks", "created")
+        return outcome(result, "task added successfully", "error adding task")
     
-    def get_tasks(self):
+    def get_tasks(self, limit=None, after=None, status=None, project_id=None, assigned_to=None,
+                  due_before=None, due_after=None, order_by=None, fields=None, updated_since=None):
+        '''
+        get tasks from the database, optionally one page of `limit` rows after the `after` cursor
+        filters, order_by and fields are pushed down into the database query
+        with updated_since only the tasks changed since then come back, plus the ids deleted since then
+        results are served from the cache until a task write invalidates it
+        return the tasks and the cursor of the next page
+        '''
+        since = delta_since(updated_since)
+        key, args = task_query(limit, after, status, project_id, assigned_to, due_before, due_after, order_by, fields, since)
+
+        def load():
+            result = self.db.get_all_tasks(*args)
+            if since is None:
+                return listing(result, "tasks", limit, order_by)
+            return delta(result, self.db.get_tombstones("tasks", since), "tasks", since, limit, order_by)
+        return cache.get_or_load(key, load)
+
+    def get_overdue_tasks(self, project_id=None, assigned_to=None, limit=None, after=None, fields=None):
         '''
-        get all tasks from the database
-        return all tasks
+        open tasks whose due date has passed (before today, utc), oldest due date first
+        cached like get_tasks until a task write, and per day
+        '''
+        key, args = due_query("overdue", project_id, assigned_to, limit, after, fields)
+        return cache.get_or_load(key, lambda: due_listing(self.db.get_all_tasks(*args), "overdue", limit))
+
+    def get_upcoming_tasks(self, within="7d", project_id=None, assigned_to=None, limit=None, after=None, fields=None):
         '''
-        result = self.db.get_all_tasks()
-        if result.data:
-            return {"success": True, "message": "retrived all tasks", "data": result.data}
-        return {"success": False, "message": "error retrieving tasks"}
+        open tasks due from today up to `within` ahead ("7d", "2w"), soonest first
+        raises ValueError for a malformed `within`
+        '''
+        key, args = due_query("upcoming", project_id, assigned_to, limit, after, fields, days=parse_within(within))
+        return cache.get_or_load(key, lambda: due_listing(self.db.get_all_tasks(*args), "upcoming", limit))
+
+    def export_tasks(self, status=None, project_id=None, assigned_to=None, due_before=None, due_after=None, fields=None):
+        '''
+        every task matching the filters, as a generator of pages of EXPORT_CHUNK_SIZE rows
+        raises ValueError right away for unknown fields
+        '''
+        _, args = task_query(EXPORT_CHUNK_SIZE, None, status, project_id, assigned_to, due_before, due_after, None, fields)
+        return iter_pages(self.db.get_all_tasks, args, export_fields(fields))
     
     def mark_complete(self, task_id):
         '''
@@ -38,9 +505,8 @@ class TaskManager:
         return the success if task is marked as complete successfully
         '''
         result = self.db.update_task(task_id, {"status": "completed"})
-        if result.data:
-            return {"success": True, "message": "task marked as completed"}
-        return {"success": False, "message": "error marking task as completed"}
+        written(result, "tasks", "updated")
+        return outcome(result, "task marked as completed", "error marking task as completed")
     
     def mark_pending(self, task_id):
         '''
@@ -48,9 +514,8 @@ class TaskManager:
         return the success if task is marked as pending successfully
         '''
         result = self.db.update_task(task_id, {"status": "pending"})
-        if result.data:
-            return {"success": True, "message": "task marked as pending"}
-        return {"success": False, "message": "error marking task as pending"}
+        written(result, "tasks", "updated")
+        return outcome(result, "task marked as pending", "error marking task as pending")
     
     def update_task(self, task_id, data: dict):
         '''
@@ -60,9 +525,8 @@ class TaskManager:
         if not data:
             return {"success": False, "message": "No data provided for update"}
         result = self.db.update_task(task_id, data)
-        if result.data:
-            return {"success": True, "message": "task updated successfully"}
-        return {"success": False, "message": "error updating task"}
+        written(result, "tasks", "updated")
+        return outcome(result, "task updated successfully", "error updating task")
     
     def remove_task(self, task_id):
         '''
@@ -70,9 +534,41 @@ class TaskManager:
         return the success if task is removed successfully
         '''
         result = self.db.delete_task(task_id)
-        if result.data:
-            return {"success": True, "message": "task removed successfully"}
-        return {"success": False, "message": "error removing task"}
+        written(result, "tasks", "deleted")
+        return outcome(result, "task removed successfully", "error removing task")
+
+    #bulk operations
+
+    def add_tasks(self, tasks: list):
+        '''
+        add many tasks with one multi-row insert
+        return a result for every task, in the order given
+        '''
+        result = self.db.bulk_insert("tasks", [task_row(**task) for task in tasks]) if tasks else None
+        written(result, "tasks", "created")
+        return bulk_added([None] * len(tasks), result, "tasks")
+
+    def update_tasks(self, task_ids: list, data: dict):
+        '''
+        apply the same update (e.g. a status change) to many tasks at once
+        return a result for every task id
+        '''
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        task_ids = unique(task_ids)
+        result = self.db.bulk_update("tasks", task_ids, data) if task_ids else None
+        written(result, "tasks", "updated")
+        return bulk_matched(task_ids, result, "tasks", "updated")
+
+    def remove_tasks(self, task_ids: list):
+        '''
+        remove many tasks at once
+        return a result for every task id
+        '''
+        task_ids = unique(task_ids)
+        result = self.db.bulk_delete("tasks", task_ids) if task_ids else None
+        written(result, "tasks", "deleted")
+        return bulk_matched(task_ids, result, "tasks", "removed")
 
 class ProjectManager:
     '''
@@ -80,30 +576,53 @@ class ProjectManager:
     '''
 
     def __init__(self):
-        self.db = DataBaseManager()
+        self.db = get_database_manager()
     #create
     def add_project(self, name, description, owner_id, start_date, end_date, status):
         '''
         add a new project to the database
         return the success if project is added successfully
         '''
-        if not name or not owner_id:
-            return {"success": False, "message": "Project name and owner_id are required"}
+        error = project_error(name, owner_id)
+        if error:
+            return {"success": False, "message": error}
         result = self.db.create_project(name, description, owner_id, start_date, end_date, status)
-        if result.data:
-            return {"success": True, "message": "project added successfully"}
-        return {"success": False, "message": "error adding project"}
+        written(result, "projects", "created")
+        return outcome(result, "project added successfully", "error adding project")
     
     #read
-    def get_projects(self):
+    def get_projects(self, limit=None, after=None, status=None, owner_id=None, order_by=None, fields=None, updated_since=None):
+        '''
+        get projects from the database, optionally one page of `limit` rows after the `after` cursor
+        filters, order_by and fields are pushed down into the database query
+        with updated_since only the projects changed since then come back, plus the ids deleted since then
+        results are served from the cache until a project write invalidates it
+        return the projects and the cursor of the next page
         '''
-        get all projects from the database
-        return all projects
+        since = delta_since(updated_since)
+        key, args = project_query(limit, after, status, owner_id, order_by, fields, since)
+
+        def load():
+            result = self.db.get_all_projects(*args)
+            if since is None:
+                return listing(result, "projects", limit, order_by)
+            return delta(result, self.db.get_tombstones("projects", since), "projects", since, limit, order_by)
+        return cache.get_or_load(key, load)
+
+    def export_projects(self, status=None, owner_id=None, fields=None):
+        '''
+        every project matching the filters, as a generator of pages of EXPORT_CHUNK_SIZE rows
+        '''
+        _, args = project_query(EXPORT_CHUNK_SIZE, None, status, owner_id, None, fields)
+        return iter_pages(self.db.get_all_projects, args, export_fields(fields))
+
+    def get_project_detail(self, project_id):
         '''
-        result = self.db.get_all_projects()
-        if result.data:
-            return {"success": True, "message": "retrived all projects", "data": result.data}
-        return {"success": False, "message": "error retrieving projects"}
+        one project with its owner, its tasks and each assignee's name and email, read in a single query
+        cached until a write to any of the three tables
+        '''
+        key = (("users", "projects", "tasks"), "detail", project_id)
+        return cache.get_or_load(key, lambda: detail(self.db.get_project_detail(project_id), "project"))
     
     #update
     def update_project(self, project_id, data: dict):
@@ -114,9 +633,8 @@ class ProjectManager:
         if not data:
             return {"success": False, "message": "No data provided for update"}
         result = self.db.update_project(project_id, data)
-        if result.data:
-            return {"success": True, "message": "project updated successfully"}
-        return {"success": False, "message": "error updating project"}
+        written(result, "projects", "updated")
+        return outcome(result, "project updated successfully", "error updating project")
     
     #delete
     def remove_project(self, project_id):
@@ -125,9 +643,43 @@ class ProjectManager:
         return the success if project is removed successfully
         '''
         result = self.db.delete_project(project_id)
-        if result.data:
-            return {"success": True, "message": "project removed successfully"}
-        return {"success": False, "message": "error removing project"}
+        # deleting a project cascades to its tasks
+        written(result, "projects", "deleted", "tasks")
+        return outcome(result, "project removed successfully", "error removing project")
+
+    #bulk operations
+    def add_projects(self, projects: list):
+        '''
+        add many projects with one multi-row insert
+        return a result for every project, in the order given
+        '''
+        errors = [project_error(project.get("name"), project.get("owner_id")) for project in projects]
+        rows = [project_row(**project) for project, error in zip(projects, errors) if not error]
+        result = self.db.bulk_insert("projects", rows) if rows else None
+        written(result, "projects", "created")
+        return bulk_added(errors, result, "projects")
+
+    def update_projects(self, project_ids: list, data: dict):
+        '''
+        apply the same update to many projects at once
+        return a result for every project id
+        '''
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        project_ids = unique(project_ids)
+        result = self.db.bulk_update("projects", project_ids, data) if project_ids else None
+        written(result, "projects", "updated")
+        return bulk_matched(project_ids, result, "projects", "updated")
+
+    def remove_projects(self, project_ids: list):
+        '''
+        remove many projects (and their tasks) at once
+        return a result for every project id
+        '''
+        project_ids = unique(project_ids)
+        result = self.db.bulk_delete("projects", project_ids) if project_ids else None
+        written(result, "projects", "deleted", "tasks")
+        return bulk_matched(project_ids, result, "projects", "removed")
     
 class UserManager:
     '''
@@ -135,7 +687,7 @@ class UserManager:
     '''
 
     def __init__(self):
-        self.db = DataBaseManager()
+        self.db = get_database_manager()
     
     #create
     def add_user(self, name, email, password_hash, role):
@@ -143,23 +695,38 @@ class UserManager:
         add a new user to the database
         return the success if user is added successfully
         '''
-        if not name or not email or not password_hash:
-            return {"success": False, "message": "Name, email, and password are required"}
+        error = user_error(name, email, password_hash)
+        if error:
+            return {"success": False, "message": error}
         result = self.db.create_user(name, email, password_hash, role)
-        if result.data:
-            return {"success": True, "message": "user added successfully"}
-        return {"success": False, "message": "error adding user"}
+        written(result, "users", "created")
+        return outcome(result, "user added successfully", "error adding user")
     
     #read
-    def get_users(self):
+    def get_users(self, limit=None, after=None, role=None, order_by=None, fields=None, updated_since=None):
+        '''
+        get users from the database, optionally one page of `limit` rows after the `after` cursor
+        filters, order_by and fields are pushed down into the database query
+        with updated_since only the users changed since then come back, plus the ids deleted since then
+        results are served from the cache until a user write invalidates it
+        return the users and the cursor of the next page
+        '''
+        since = delta_since(updated_since)
+        key, args = user_query(limit, after, role, order_by, fields, since)
+
+        def load():
+            result = self.db.get_all_users(*args)
+            if since is None:
+                return listing(result, "users", limit, order_by)
+            return delta(result, self.db.get_tombstones("users", since), "users", since, limit, order_by)
+        return cache.get_or_load(key, load)
+
+    def export_users(self, role=None, fields=None):
         '''
-        get all users from the database
-        return all users
+        every user matching the filters, as a generator of pages of EXPORT_CHUNK_SIZE rows
         '''
-        result = self.db.get_all_users()
-        if result.data:
-            return {"success": True, "message": "retrived all users", "data": result.data}
-        return {"success": False, "message": "error retrieving users"}
+        _, args = user_query(EXPORT_CHUNK_SIZE, None, role, None, fields)
+        return iter_pages(self.db.get_all_users, args, export_fields(fields))
     
     #update
     def update_user(self, user_id, data: dict):
@@ -170,9 +737,8 @@ class UserManager:
         if not data:
             return {"success": False, "message": "No data provided for update"}
         result = self.db.update_user(user_id, data)
-        if result.data:
-            return {"success": True, "message": "user updated successfully"}
-        return {"success": False, "message": "error updating user"}
+        written(result, "users", "updated")
+        return outcome(result, "user updated successfully", "error updating user")
     
     #delete
     def remove_user(self, user_id):
@@ -181,6 +747,377 @@ class UserManager:
         return the success if user is removed successfully
         '''
         result = self.db.delete_user(user_id)
-        if result.data:
-            return {"success": True, "message": "user removed successfully"}
-        return {"success": False, "message": "error removing user"}
\ No newline at end of file
+        # deleting a user clears owner_id / assigned_to on their projects and tasks
+        written(result, "users", "deleted", "projects", "tasks")
+        return outcome(result, "user removed successfully", "error removing user")
+
+    #bulk operations
+    def add_users(self, users: list):
+        '''
+        add many users with one multi-row insert
+        return a result for every user, in the order given
+        '''
+        errors = [user_error(user.get("name"), user.get("email"), user.get("password_hash")) for user in users]
+        rows = [user_row(**user) for user, error in zip(users, errors) if not error]
+        result = self.db.bulk_insert("users", rows) if rows else None
+        written(result, "users", "created")
+        return bulk_added(errors, result, "users")
+
+    def update_users(self, user_ids: list, data: dict):
+        '''
+        apply the same update (e.g. a role change) to many users at once
+        return a result for every user id
+        '''
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        user_ids = unique(user_ids)
+        result = self.db.bulk_update("users", user_ids, data) if user_ids else None
+        written(result, "users", "updated")
+        return bulk_matched(user_ids, result, "users", "updated")
+
+    def remove_users(self, user_ids: list):
+        '''
+        remove many users at once
+        return a result for every user id
+        '''
+        user_ids = unique(user_ids)
+        result = self.db.bulk_delete("users", user_ids) if user_ids else None
+        written(result, "users", "deleted", "projects", "tasks")
+        return bulk_matched(user_ids, result, "users", "removed")
+
+class StatsManager:
+    '''
+    Handles dashboard statistics (counts grouped by status, role, owner and assignee)
+    the counting happens in the database, only the small summary comes back
+    '''
+
+    def __init__(self):
+        self.db = get_database_manager()
+
+    def get_stats(self):
+        '''
+        counts over every table, cached until any write
+        '''
+        key = (("users", "projects", "tasks"), "stats")
+        return cache.get_or_load(key, lambda: stats_response(self.db.get_stats()))
+
+    def get_project_stats(self, project_id):
+        '''
+        task counts of one project, cached until a task write
+        '''
+        key = ("tasks", "stats", project_id)
+        return cache.get_or_load(key, lambda: stats_response(self.db.get_stats(project_id)))
+
+class SearchManager:
+    '''
+    ranked full-text search over task titles/descriptions and project names/descriptions
+    answered from the in-process index, never by scanning the tables
+    '''
+    def __init__(self):
+        self.db = get_database_manager()
+        self._lock = threading.Lock()
+
+    def search(self, q, limit=20, type=None):
+        '''
+        best `limit` tasks and projects containing every word of `q` (also as a word prefix)
+        raises ValueError for an unknown type
+        '''
+        tables = search_tables(type)
+        self.sync()
+        return search_response(search_index.search(q, limit, tables), q)
+
+    def sync(self):
+        '''
+        load the index on first use, then every SEARCH_REFRESH seconds apply the rows changed
+        and deleted since the last catch-up (the updated_since deltas of the list endpoints)
+        '''
+        if not search_index.due(SEARCH_REFRESH):
+            return
+        with self._lock:
+            if not search_index.due(SEARCH_REFRESH):
+                return
+            for table in SEARCH_COLUMNS:
+                since = search_index.since.get(table)
+                newest = since
+                fetch = self.db.get_all_tasks if table == "tasks" else self.db.get_all_projects
+                for rows in iter_pages(fetch, search_query(table, since), None):
+                    search_index.catch_up(table, rows, [])
+                    newest = newest_change(rows, [], newest)
+                if since is not None:
+                    deleted = self.db.get_tombstones(table, since).data or []
+                    search_index.catch_up(table, [], [row["row_id"] for row in deleted])
+                    newest = newest_change([], deleted, newest)
+                search_index.since[table] = newest
+            search_index.checked = time.monotonic()
+
+# ============ ASYNC MANAGERS ============
+# same operations as the managers above, awaiting an AsyncDataBaseManager so the
+# API can serve many requests from one event loop without blocking a thread each
+
+class AsyncTaskManager:
+    '''
+    async version of TaskManager
+    '''
+    def __init__(self):
+        self.db = get_async_database_manager()
+        if isinstance(self.db, WriteBehindTasks):
+            # buffered updates are invalidated and published again once they are stored
+            self.db.on_flush = lambda result: written(result, "tasks", "updated")
+
+    async def add_task(self, project_id, title, description, assigned_to, due_date, status):
+        result = await self.db.create_task(project_id, title, description, assigned_to, due_date, status)
+        written(result, "tasks", "created")
+        return outcome(result, "task added successfully", "error adding task")
+
+    async def get_tasks(self, limit=None, after=None, status=None, project_id=None, assigned_to=None,
+                        due_before=None, due_after=None, order_by=None, fields=None, updated_since=None):
+        since = delta_since(updated_since)
+        key, args = task_query(limit, after, status, project_id, assigned_to, due_before, due_after, order_by, fields, since)
+
+        async def load():
+            result = await self.db.get_all_tasks(*args)
+            if since is None:
+                return listing(result, "tasks", limit, order_by)
+            return delta(result, await self.db.get_tombstones("tasks", since), "tasks", since, limit, order_by)
+        return await cache.aget_or_load(key, load)
+
+    async def get_overdue_tasks(self, project_id=None, assigned_to=None, limit=None, after=None, fields=None):
+        key, args = due_query("overdue", project_id, assigned_to, limit, after, fields)
+
+        async def load():
+            return due_listing(await self.db.get_all_tasks(*args), "overdue", limit)
+        return await cache.aget_or_load(key, load)
+
+    async def get_upcoming_tasks(self, within="7d", project_id=None, assigned_to=None, limit=None, after=None, fields=None):
+        key, args = due_query("upcoming", project_id, assigned_to, limit, after, fields, days=parse_within(within))
+
+        async def load():
+            return due_listing(await self.db.get_all_tasks(*args), "upcoming", limit)
+        return await cache.aget_or_load(key, load)
+
+    def export_tasks(self, status=None, project_id=None, assigned_to=None, due_before=None, due_after=None, fields=None):
+        # not async: the filters are validated on the call, the pages are fetched while iterating
+        _, args = task_query(EXPORT_CHUNK_SIZE, None, status, project_id, assigned_to, due_before, due_after, None, fields)
+        return aiter_pages(self.db.get_all_tasks, args, export_fields(fields))
+
+    async def mark_complete(self, task_id):
+        result = await self.db.update_task(task_id, {"status": "completed"})
+        written(result, "tasks", "updated")
+        return outcome(result, "task marked as completed", "error marking task as completed")
+
+    async def mark_pending(self, task_id):
+        result = await self.db.update_task(task_id, {"status": "pending"})
+        written(result, "tasks", "updated")
+        return outcome(result, "task marked as pending", "error marking task as pending")
+
+    async def update_task(self, task_id, data: dict):
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        result = await self.db.update_task(task_id, data)
+        written(result, "tasks", "updated")
+        return outcome(result, "task updated successfully", "error updating task")
+
+    async def remove_task(self, task_id):
+        result = await self.db.delete_task(task_id)
+        written(result, "tasks", "deleted")
+        return outcome(result, "task removed successfully", "error removing task")
+
+    async def add_tasks(self, tasks: list):
+        result = await self.db.bulk_insert("tasks", [task_row(**task) for task in tasks]) if tasks else None
+        written(result, "tasks", "created")
+        return bulk_added([None] * len(tasks), result, "tasks")
+
+    async def update_tasks(self, task_ids: list, data: dict):
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        task_ids = unique(task_ids)
+        result = await self.db.bulk_update("tasks", task_ids, data) if task_ids else None
+        written(result, "tasks", "updated")
+        return bulk_matched(task_ids, result, "tasks", "updated")
+
+    async def remove_tasks(self, task_ids: list):
+        task_ids = unique(task_ids)
+        result = await self.db.bulk_delete("tasks", task_ids) if task_ids else None
+        written(result, "tasks", "deleted")
+        return bulk_matched(task_ids, result, "tasks", "removed")
+
+class AsyncProjectManager:
+    '''
+    async version of ProjectManager
+    '''
+    def __init__(self):
+        self.db = get_async_database_manager()
+
+    async def add_project(self, name, description, owner_id, start_date, end_date, status):
+        error = project_error(name, owner_id)
+        if error:
+            return {"success": False, "message": error}
+        result = await self.db.create_project(name, description, owner_id, start_date, end_date, status)
+        written(result, "projects", "created")
+        return outcome(result, "project added successfully", "error adding project")
+
+    async def get_projects(self, limit=None, after=None, status=None, owner_id=None, order_by=None, fields=None, updated_since=None):
+        since = delta_since(updated_since)
+        key, args = project_query(limit, after, status, owner_id, order_by, fields, since)
+
+        async def load():
+            result = await self.db.get_all_projects(*args)
+            if since is None:
+                return listing(result, "projects", limit, order_by)
+            return delta(result, await self.db.get_tombstones("projects", since), "projects", since, limit, order_by)
+        return await cache.aget_or_load(key, load)
+
+    def export_projects(self, status=None, owner_id=None, fields=None):
+        _, args = project_query(EXPORT_CHUNK_SIZE, None, status, owner_id, None, fields)
+        return aiter_pages(self.db.get_all_projects, args, export_fields(fields))
+
+    async def get_project_detail(self, project_id):
+        async def load():
+            return detail(await self.db.get_project_detail(project_id), "project")
+        return await cache.aget_or_load((("users", "projects", "tasks"), "detail", project_id), load)
+
+    async def update_project(self, project_id, data: dict):
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        result = await self.db.update_project(project_id, data)
+        written(result, "projects", "updated")
+        return outcome(result, "project updated successfully", "error updating project")
+
+    async def remove_project(self, project_id):
+        result = await self.db.delete_project(project_id)
+        written(result, "projects", "deleted", "tasks")
+        return outcome(result, "project removed successfully", "error removing project")
+
+    async def add_projects(self, projects: list):
+        errors = [project_error(project.get("name"), project.get("owner_id")) for project in projects]
+        rows = [project_row(**project) for project, error in zip(projects, errors) if not error]
+        result = await self.db.bulk_insert("projects", rows) if rows else None
+        written(result, "projects", "created")
+        return bulk_added(errors, result, "projects")
+
+    async def update_projects(self, project_ids: list, data: dict):
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        project_ids = unique(project_ids)
+        result = await self.db.bulk_update("projects", project_ids, data) if project_ids else None
+        written(result, "projects", "updated")
+        return bulk_matched(project_ids, result, "projects", "updated")
+
+    async def remove_projects(self, project_ids: list):
+        project_ids = unique(project_ids)
+        result = await self.db.bulk_delete("projects", project_ids) if project_ids else None
+        written(result, "projects", "deleted", "tasks")
+        return bulk_matched(project_ids, result, "projects", "removed")
+
+class AsyncUserManager:
+    '''
+    async version of UserManager
+    '''
+    def __init__(self):
+        self.db = get_async_database_manager()
+
+    async def add_user(self, name, email, password_hash, role):
+        error = user_error(name, email, password_hash)
+        if error:
+            return {"success": False, "message": error}
+        result = await self.db.create_user(name, email, password_hash, role)
+        written(result, "users", "created")
+        return outcome(result, "user added successfully", "error adding user")
+
+    async def get_users(self, limit=None, after=None, role=None, order_by=None, fields=None, updated_since=None):
+        since = delta_since(updated_since)
+        key, args = user_query(limit, after, role, order_by, fields, since)
+
+        async def load():
+            result = await self.db.get_all_users(*args)
+            if since is None:
+                return listing(result, "users", limit, order_by)
+            return delta(result, await self.db.get_tombstones("users", since), "users", since, limit, order_by)
+        return await cache.aget_or_load(key, load)
+
+    def export_users(self, role=None, fields=None):
+        _, args = user_query(EXPORT_CHUNK_SIZE, None, role, None, fields)
+        return aiter_pages(self.db.get_all_users, args, export_fields(fields))
+
+    async def update_user(self, user_id, data: dict):
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        result = await self.db.update_user(user_id, data)
+        written(result, "users", "updated")
+        return outcome(result, "user updated successfully", "error updating user")
+
+    async def remove_user(self, user_id):
+        result = await self.db.delete_user(user_id)
+        written(result, "users", "deleted", "projects", "tasks")
+        return outcome(result, "user removed successfully", "error removing user")
+
+    async def add_users(self, users: list):
+        errors = [user_error(user.get("name"), user.get("email"), user.get("password_hash")) for user in users]
+        rows = [user_row(**user) for user, error in zip(users, errors) if not error]
+        result = await self.db.bulk_insert("users", rows) if rows else None
+        written(result, "users", "created")
+        return bulk_added(errors, result, "users")
+
+    async def update_users(self, user_ids: list, data: dict):
+        if not data:
+            return {"success": False, "message": "No data provided for update"}
+        user_ids = unique(user_ids)
+        result = await self.db.bulk_update("users", user_ids, data) if user_ids else None
+        written(result, "users", "updated")
+        return bulk_matched(user_ids, result, "users", "updated")
+
+    async def remove_users(self, user_ids: list):
+        user_ids = unique(user_ids)
+        result = await self.db.bulk_delete("users", user_ids) if user_ids else None
+        written(result, "users", "deleted", "projects", "tasks")
+        return bulk_matched(user_ids, result, "users", "removed")
+
+class AsyncStatsManager:
+    '''
+    async version of StatsManager
+    '''
+    def __init__(self):
+        self.db = get_async_database_manager()
+
+    async def get_stats(self):
+        async def load():
+            return stats_response(await self.db.get_stats())
+        return await cache.aget_or_load((("users", "projects", "tasks"), "stats"), load)
+
+    async def get_project_stats(self, project_id):
+        async def load():
+            return stats_response(await self.db.get_stats(project_id))
+        return await cache.aget_or_load(("tasks", "stats", project_id), load)
+
+class AsyncSearchManager:
+    '''
+    async version of SearchManager, sharing its index
+    '''
+    def __init__(self):
+        self.db = get_async_database_manager()
+        self._lock = asyncio.Lock()
+
+    async def search(self, q, limit=20, type=None):
+        tables = search_tables(type)
+        await self.sync()
+        return search_response(search_index.search(q, limit, tables), q)
+
+    async def sync(self):
+        if not search_index.due(SEARCH_REFRESH):
+            return
+        async with self._lock:
+            if not search_index.due(SEARCH_REFRESH):
+                return
+            for table in SEARCH_COLUMNS:
+                since = search_index.since.get(table)
+                newest = since
+                fetch = self.db.get_all_tasks if table == "tasks" else self.db.get_all_projects
+                async for rows in aiter_pages(fetch, search_query(table, since), None):
+                    search_index.catch_up(table, rows, [])
+                    newest = newest_change(rows, [], newest)
+                if since is not None:
+                    deleted = (await self.db.get_tombstones(table, since)).data or []
+                    search_index.catch_up(table, [], [row["row_id"] for row in deleted])
+                    newest = newest_change([], deleted, newest)
+                search_index.since[table] = newest
+            search_index.checked = time.monotonic()
@@ -0,0 +1,151 @@
+# src metrics.py
+
+import functools
+import inspect
+import threading
+import time
+
+# upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+BYTE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+def label_text(names, values):
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    '''
+    prometheus-style histogram: cumulative bucket counts, sum and count per label combination
+    '''
+    def __init__(self, name, description, labels, buckets):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, (counts, total, count) in series:
+            labels = label_text(self.labels, label_values)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time to serve a request", ("method", "route", "status"), LATENCY_BUCKETS)
+RESPONSE_BYTES = Histogram("http_response_size_bytes", "Size of the response body as sent", ("method", "route"), BYTE_BUCKETS)
+DB_SECONDS = Histogram("db_call_duration_seconds", "Time spent in one database manager call", ("call", "table"), LATENCY_BUCKETS)
+DB_ROWS = Histogram("db_rows_returned", "Rows returned by one database manager call", ("call", "table"), ROW_BUCKETS)
+HISTOGRAMS = [REQUEST_SECONDS, RESPONSE_BYTES, DB_SECONDS, DB_ROWS]
+
+def render():
+    '''
+    every metric in the prometheus text exposition format
+    '''
+    return "\n".join(line for histogram in HISTOGRAMS for line in histogram.render()) + "\n"
+
+# ============ DATABASE CALLS ============
+
+def table_of(call, args):
+    # the table a DataBaseManager method works on: bulk_* and get_tombstones take it as the first argument
+    if call.startswith("bulk_") or call == "get_tombstones":
+        return args[0] if args else "unknown"
+    # tasks first: get_tasks_by_project reads tasks
+    for table in ("tasks", "projects", "users"):
+        if table[:-1] in call:
+            return table
+    return "all"
+
+def rows_of(result):
+    data = getattr(result, "data", None)
+    if isinstance(data, list):
+        return len(data)
+    return 1 if data else 0
+
+def timed(call, method):
+    '''
+    wrap one manager method (sync or async) so every call records its latency and row count
+    '''
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            result = await method(*args, **kwargs)
+            record(call, args, start, result)
+            return result
+    else:
+        @functools.wraps(method)
+        def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            record(call, args, start, result)
+            return result
+    return timed_call
+
+def record(call, args, start, result):
+    table = table_of(call, args)
+    DB_SECONDS.observe(time.perf_counter() - start, call, table)
+    DB_ROWS.observe(rows_of(result), call, table)
+
+def instrument(manager, interface):
+    '''
+    time every public method of `interface` (DataBaseManager or AsyncDataBaseManager) on this manager instance
+    '''
+    for call, _ in inspect.getmembers(interface, inspect.isfunction):
+        if not call.startswith("_") and call != "close":
+            setattr(manager, call, timed(call, getattr(manager, call)))
+    return manager
+
+# ============ HTTP REQUESTS ============
+
+class MetricsMiddleware:
+    '''
+    ASGI middleware recording the latency and body size of every http request, labelled by route template
+    (/tasks/{task_id}, not the concrete id, so the number of series stays small)
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_measured(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            # the router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route, status)
+            RESPONSE_BYTES.observe(size, scope["method"], route)
@@ -0,0 +1,107 @@
+# src peers.py
+# coherence between the worker processes of API/serve.py: every write is reported to the launcher
+# over a unix socket and relayed to the other workers, which drop their cached reads of
+# the tables written, tell their own /events subscribers and let their search index catch up
+# a single-process api never attaches a socket, so everything here is a no-op there
+
+import json
+import os
+import signal
+import socket
+
+# largest change message sent with its ids (a uuid is about 40 bytes of json);
+# a bigger one goes without them, the tables it names are what matters most
+MAX_MESSAGE = 60000
+
+class Peers:
+    '''
+    this worker's end of its socket pair with the launcher
+    '''
+    def __init__(self):
+        self.sock = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    @property
+    def attached(self):
+        return self.sock is not None
+
+    def attach(self, sock):
+        sock.setblocking(False)
+        self.sock = sock
+
+    def send(self, message):
+        if self.sock is None:
+            return
+        data = json.dumps(message).encode()
+        try:
+            self.sock.send(data)
+            self.sent += 1
+        except OSError:
+            # never make a write wait on the launcher: a full buffer loses the message, and the
+            # other workers' caches then expire after CACHE_TTL instead
+            self.dropped += 1
+
+    def broadcast(self, namespaces, table, action, ids):
+        '''
+        tell the other workers about a write made here
+        '''
+        if self.sock is None:
+            return
+        change = {"namespaces": list(namespaces), "table": table, "action": action, "ids": ids}
+        if len(ids) * 40 > MAX_MESSAGE:
+            # too many ids for one datagram: None means "some rows of the table"
+            change["ids"] = None
+        self.send({"change": change})
+
+    def ready(self, pid):
+        # startup (database warmup included) is done and this worker accepts connections
+        self.send({"ready": pid})
+
+    def listen(self, loop, apply):
+        '''
+        call apply(change) on the event loop for every write relayed from another worker
+        '''
+        if self.sock is not None:
+            loop.add_reader(self.sock.fileno(), self._receive, loop, apply)
+
+    def _receive(self, loop, apply):
+        while True:
+            try:
+                data = self.sock.recv(MAX_MESSAGE + 1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            if not data:
+                # the launcher is gone (killed): shut down like on SIGTERM instead of serving on as an orphan
+                loop.remove_reader(self.sock.fileno())
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+            self.received += 1
+            message = json.loads(data)
+            if "change" in message:
+                apply(message["change"])
+
+    def stats(self):
+        return {"attached": self.attached, "sent": self.sent, "received": self.received, "dropped": self.dropped}
+
+def socket_pair():
+    '''
+    (launcher end, worker end) of a new worker's channel
+    '''
+    # seqpacket keeps message boundaries like a datagram and also reports the other end closing;
+    # where there is none (macOS) a worker does not notice a killed launcher
+    try:
+        launcher, worker = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    except (AttributeError, OSError):
+        launcher, worker = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    for sock in (launcher, worker):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        except OSError:
+            pass
+    return launcher, worker
+
+# this process's channel, attached by the launcher after it forks a worker
+peers = Peers()
@@ -0,0 +1,324 @@
+# src search.py
+# in-process inverted index over task titles/descriptions and project names/descriptions, behind GET /search
+
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+
+WORD = re.compile(r"\w+")
+# a word in a title or name counts for more than one in a description
+FIELD_WEIGHTS = {
+    "tasks": {"title": 3.0, "description": 1.0},
+    "projects": {"name": 3.0, "description": 1.0},
+}
+# columns kept with each indexed row and returned with a hit
+SUMMARY_FIELDS = {
+    "tasks": ("id", "title", "project_id", "status", "due_date"),
+    "projects": ("id", "name", "status"),
+}
+# a word that only starts with the query word scores lower than the word itself
+PREFIX_FACTOR = 0.6
+# most index terms one query word expands to as a prefix ("t" should not touch the whole vocabulary)
+MAX_EXPANSIONS = 64
+# most postings the terms of one query word may add up to, the word itself included: a short
+# prefix of many common words gets its closest (shortest) completions that fit, a common word none
+MAX_EXPANDED_POSTINGS = 5000
+# most rows a query of several common words (each over MAX_EXPANDED_POSTINGS) looks at; one that
+# reaches it ranks among the rows where its rarest word weighs the most
+MAX_SCANNED = 2000
+
+def words(text):
+    return WORD.findall(text.lower()) if text else []
+
+def term_weights(table, row):
+    '''
+    weight of every word of a row: per field, the field weight times 1 + log(occurrences)
+    '''
+    weights = {}
+    for field, field_weight in FIELD_WEIGHTS[table].items():
+        counts = {}
+        for word in words(row.get(field)):
+            counts[word] = counts.get(word, 0) + 1
+        for word, count in counts.items():
+            weights[word] = weights.get(word, 0.0) + field_weight * (1 + math.log(count))
+    return weights
+
+class SearchIndex:
+    '''
+    term -> {(table, id): weight} postings, plus per term the same postings ordered by weight
+    and a sorted term list for prefix lookups
+    rows are added, replaced and dropped one at a time, so writes keep it current without a rebuild;
+    the ordered lists and the term list are only re-sorted when a search needs them
+    '''
+    def __init__(self):
+        self._postings = {}
+        # term -> [(-weight, key)]; entries of replaced or dropped rows stay until the next
+        # re-sort and are skipped because they no longer match _postings
+        self._ranked = {}
+        self._unsorted = set()
+        # every term ever added (dropped ones are skipped), sorted before a prefix lookup
+        self._terms = []
+        self._terms_sorted = True
+        # (table, id) -> (its term weights, summary returned with a hit, its text columns)
+        self._docs = {}
+        # project id -> ids of its tasks, so deleting a project drops them like the database does
+        self._tasks_of = {}
+        self._lock = threading.RLock()
+        # catch-up state kept by the search managers: updated_since per table, last catch-up time
+        self.since = {}
+        self.checked = None
+
+    @property
+    def ready(self):
+        return self.checked is not None
+
+    def due(self, refresh):
+        '''
+        whether it is time to catch up with writes made elsewhere (always before the first load)
+        '''
+        return self.checked is None or time.monotonic() - self.checked >= refresh
+
+    def expire(self):
+        '''
+        catch up before the next search instead of after SEARCH_REFRESH (another worker wrote to a table)
+        '''
+        if self.checked is not None:
+            self.checked = -math.inf
+
+    def __len__(self):
+        return len(self._docs)
+
+    def put(self, table, row):
+        '''
+        index a new row or re-index a changed one; rows missing a text column keep its old words
+        '''
+        if table not in FIELD_WEIGHTS or not row.get("id"):
+            return
+        key = (table, row["id"])
+        with self._lock:
+            old = self._docs.get(key)
+            if old is None and not set(FIELD_WEIGHTS[table]) <= set(row):
+                # a partial row of an unknown id (an update acknowledged before it was written):
+                # leave it to the next catch-up rather than index a row that may not exist
+                return
+            if old is not None:
+                # a partial row (update of a few columns) keeps the rest of the indexed row
+                row = {**old[1], **old[2], **row}
+                self._unindex(key, old)
+            weights = term_weights(table, row)
+            for term, weight in weights.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._ranked[term] = []
+                    self._terms.append(term)
+                    self._terms_sorted = False
+                postings[key] = weight
+                self._ranked[term].append((-weight, key))
+                self._unsorted.add(term)
+            summary = {field: row.get(field) for field in SUMMARY_FIELDS[table]}
+            texts = {field: row.get(field) for field in FIELD_WEIGHTS[table]}
+            self._docs[key] = (weights, summary, texts)
+            if table == "tasks":
+                self._tasks_of.setdefault(row.get("project_id"), set()).add(row["id"])
+
+    def drop(self, table, row_id):
+        with self._lock:
+            key = (table, row_id)
+            old = self._docs.pop(key, None)
+            if old is not None:
+                self._unindex(key, old)
+            if table == "projects":
+                for task_id in list(self._tasks_of.pop(row_id, ())):
+                    self.drop("tasks", task_id)
+
+    def _unindex(self, key, old):
+        for term in old[0]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+                    del self._ranked[term]
+                    self._unsorted.discard(term)
+        if key[0] == "tasks":
+            self._tasks_of.get(old[1].get("project_id"), set()).discard(key[1])
+
+    def apply(self, table, action, rows):
+        '''
+        bring the index in line with the rows a write returned
+        '''
+        for row in rows:
+            if action == "deleted":
+                self.drop(table, row.get("id"))
+            else:
+                self.put(table, row)
+
+    def catch_up(self, table, rows, deleted_ids):
+        with self._lock:
+            for row in rows:
+                self.put(table, row)
+            for row_id in deleted_ids:
+                self.drop(table, row_id)
+
+    def clear(self):
+        with self._lock:
+            for state in (self._postings, self._ranked, self._unsorted, self._terms, self._docs, self._tasks_of, self.since):
+                state.clear()
+            self._terms_sorted = True
+            self.checked = None
+
+    def _by_weight(self, term):
+        # the term's postings by descending weight; a timsort of a sorted list plus a few
+        # appended entries is close to linear, and stale entries are swept out when they pile up
+        ranked = self._ranked[term]
+        if term in self._unsorted:
+            postings = self._postings[term]
+            if len(ranked) > 2 * len(postings):
+                ranked = self._ranked[term] = [(-weight, key) for key, weight in postings.items()]
+            ranked.sort()
+            self._unsorted.discard(term)
+        return ranked
+
+    def _ordered(self, term, factor):
+        # (-score, key) of the term's live postings, best first
+        postings = self._postings[term]
+        for negative, key in self._by_weight(term):
+            if postings.get(key) == -negative:
+                yield negative * factor, key
+
+    def _expand(self, word):
+        # (term, factor) pairs a query word matches: itself, then the shortest longer words
+        # within MAX_EXPANSIONS terms and MAX_EXPANDED_POSTINGS postings (the word's own count too)
+        if not self._terms_sorted:
+            if len(self._terms) > 2 * len(self._postings):
+                self._terms = list(self._postings)
+            self._terms.sort()
+            self._terms_sorted = True
+        matches = {word: 1.0} if word in self._postings else {}
+        budget = MAX_EXPANDED_POSTINGS - sum(len(self._postings[term]) for term in matches)
+        longer = []
+        for i in range(bisect.bisect_right(self._terms, word), len(self._terms)):
+            term = self._terms[i]
+            if len(longer) >= 4 * MAX_EXPANSIONS or not term.startswith(word):
+                break
+            if term in self._postings:
+                longer.append(term)
+        for term in sorted(longer, key=len):
+            if len(matches) >= MAX_EXPANSIONS:
+                break
+            size = len(self._postings[term])
+            # a word with no exact term still matches its closest completion
+            if size <= budget or not matches:
+                matches[term] = PREFIX_FACTOR
+                budget -= size
+        return list(matches.items())
+
+    def _idf(self, term):
+        return math.log(1 + len(self._docs) / len(self._postings[term]))
+
+    def _top(self, terms, limit, tables):
+        # one query word: walk its postings merged best first and stop after the best `limit` rows
+        best, seen = [], set()
+        for negative, key in heapq.merge(*(self._ordered(term, factor) for term, factor in terms)):
+            if len(best) == limit:
+                break
+            # a row's first appearance carries its best score for the word
+            if key in seen or (tables is not None and key[0] not in tables):
+                continue
+            seen.add(key)
+            best.append((-negative, key))
+        return best
+
+    def _best_of(self, terms, key):
+        # a word's score in one row: its best matching term, 0.0 when the row does not have the word
+        best = 0.0
+        for term, factor in terms:
+            weight = self._postings[term].get(key)
+            if weight is not None and weight * factor > best:
+                best = weight * factor
+        return best
+
+    def _ceiling(self, terms):
+        # the most a word can add to any row
+        return max(-next(self._ordered(term, factor))[0] for term, factor in terms)
+
+    def _matching(self, expanded, limit, tables):
+        # several query words, rarest first; no set of a common word's postings is ever built
+        driver = expanded[0]
+        if sum(len(self._postings[term]) for term, _ in driver) > MAX_EXPANDED_POSTINGS:
+            return self._walk(expanded, limit, tables)
+        # the rows of the rarest word, narrowed word by word: a dict_keys & set intersection
+        # runs over the smaller side, so a common word costs no more than a rare one
+        rows = set().union(*(self._postings[term] for term, _ in driver))
+        for terms in expanded[1:]:
+            rows = set().union(*(self._postings[term].keys() & rows for term, _ in terms))
+            if not rows:
+                return []
+        if tables is not None:
+            rows = {key for key in rows if key[0] in tables}
+        scores = dict.fromkeys(rows, 0.0)
+        for terms in expanded:
+            found = {}
+            for term, factor in terms:
+                postings = self._postings[term]
+                for key in postings.keys() & rows:
+                    found[key] = max(found.get(key, 0.0), postings[key] * factor)
+            for key, score in found.items():
+                scores[key] += score
+        return heapq.nlargest(limit, ((score, key) for key, score in scores.items()))
+
+    def _walk(self, expanded, limit, tables):
+        # every word is common: walk the rarest one's postings best first and look each row up in
+        # the others; stop once no row further down can beat the best `limit` (its rarest word
+        # weighs less and the others add at most their ceiling), or after MAX_SCANNED rows
+        driver, others = expanded[0], expanded[1:]
+        ceiling = sum(self._ceiling(terms) for terms in others)
+        best, seen = [], set()
+        for negative, key in heapq.merge(*(self._ordered(term, factor) for term, factor in driver)):
+            if len(best) == limit and ceiling - negative <= best[0][0]:
+                break
+            if key in seen:
+                continue
+            if len(seen) == MAX_SCANNED:
+                break
+            seen.add(key)
+            if tables is not None and key[0] not in tables:
+                continue
+            score = -negative
+            for terms in others:
+                found = self._best_of(terms, key)
+                if not found:
+                    break
+                score += found
+            else:
+                if len(best) < limit:
+                    heapq.heappush(best, (score, key))
+                elif score > best[0][0]:
+                    heapq.heapreplace(best, (score, key))
+        return best
+
+    def search(self, query, limit=20, tables=None):
+        '''
+        best `limit` rows containing every word of the query (each also as a prefix),
+        as (score, table, summary) sorted by score
+        one word walks its postings in descending weight order and stops after `limit` rows, so a
+        common word does not mean a scan of its postings; several words start from the rows of the
+        rarest one (at most MAX_EXPANDED_POSTINGS), or walk it the same way when every word is common
+        '''
+        query_words = list(dict.fromkeys(words(query)))
+        if not query_words or limit < 1:
+            return []
+        with self._lock:
+            expanded = [[(term, factor * self._idf(term)) for term, factor in self._expand(word)] for word in query_words]
+            if not all(expanded):
+                return []
+            if len(expanded) == 1:
+                best = self._top(expanded[0], limit, tables)
+            else:
+                expanded.sort(key=lambda terms: sum(len(self._postings[term]) for term, _ in terms))
+                best = self._matching(expanded, limit, tables)
+            return [(score, key[0], dict(self._docs[key][1])) for score, key in sorted(best, reverse=True)]
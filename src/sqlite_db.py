@@ -0,0 +1,605 @@
+# src sqlite_db.py
+
+import asyncio
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from src.db import (
+    AsyncDataBaseManager, DataBaseManager, PERSON_COLUMNS, QueryResult, RejectedWrite, TOMBSTONE_DAYS, USER_COLUMNS,
+    ainsert_each, insert_each, parse_order, project_row, select_columns, task_row, user_row,
+)
+
+# same tables as the supabase schema in the README, adapted to sqlite types
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    role TEXT CHECK (role IN ('admin', 'member')) DEFAULT 'member',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    owner_id TEXT REFERENCES users(id) ON DELETE SET NULL,
+    start_date TEXT,
+    end_date TEXT,
+    team_members TEXT DEFAULT '[]',
+    status TEXT CHECK (status IN ('pending', 'ongoing', 'completed')) DEFAULT 'pending',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    description TEXT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    project_id TEXT REFERENCES projects(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    description TEXT,
+    assigned_to TEXT REFERENCES users(id) ON DELETE SET NULL,
+    status TEXT CHECK (status IN ('pending', 'in-progress', 'completed')) DEFAULT 'pending',
+    due_date TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_tasks_project_id ON tasks (project_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_assigned_to ON tasks (assigned_to);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+-- due date range reads (/tasks/overdue, /tasks/upcoming) walk this in order
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date_id ON tasks (due_date, id);
+CREATE INDEX IF NOT EXISTS idx_users_created_at_id ON users (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_projects_created_at_id ON projects (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_created_at_id ON tasks (created_at, id);
+
+-- ids of deleted rows, so updated_since reads can report deletions
+CREATE TABLE IF NOT EXISTS tombstones (
+    id INTEGER PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    deleted_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_tombstones_table_deleted_at ON tombstones (table_name, deleted_at);
+"""
+
+# the current time in the same text shape as now_iso(), for use inside sql
+SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')"
+
+# columns added after the first release: (table, column, statements that add and backfill it on an older file)
+MIGRATIONS = [
+    ("users", "updated_at", "ALTER TABLE users ADD COLUMN updated_at TEXT; UPDATE users SET updated_at = created_at;"),
+]
+
+# run after MIGRATIONS, they need the updated_at columns:
+# updates made by the database itself (ON DELETE SET NULL) still bump updated_at, every delete leaves a tombstone
+SYNC_SCHEMA = "".join(f"""
+CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table} (updated_at);
+
+CREATE TRIGGER IF NOT EXISTS {table}_touch AFTER UPDATE ON {table} WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE {table} SET updated_at = {SQL_NOW} WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS {table}_tombstone AFTER DELETE ON {table}
+BEGIN
+    INSERT INTO tombstones (table_name, row_id, deleted_at) VALUES ('{table}', OLD.id, {SQL_NOW});
+END;
+""" for table in ("users", "projects", "tasks"))
+
+# tables that carry an updated_at column
+TIMESTAMPED_TABLES = {"users", "projects", "tasks"}
+# columns stored as json text (jsonb in supabase)
+JSON_COLUMNS = {"team_members"}
+# sql for the filter operators accepted by get_all_*
+SQL_OPS = {"eq": "=", "neq": "!=", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+
+# bound variables one statement may use: SQLITE_MAX_VARIABLE_NUMBER of builds before 3.32,
+# the lowest limit in use; bulk statements are split into chunks below it
+MAX_VARIABLES = 999
+
+# (table, stat name, grouped column, label for null) of every group count in get_stats
+STAT_GROUPS = [
+    ("tasks", "by_status", "status", "none"),
+    ("tasks", "by_assignee", "assigned_to", "unassigned"),
+    ("tasks", "by_project", "project_id", "none"),
+    ("projects", "by_status", "status", "none"),
+    ("projects", "by_owner", "owner_id", "none"),
+    ("users", "by_role", "role", "none"),
+]
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+def chunks(items, size):
+    items = list(items)
+    return [items[start:start + size] for start in range(0, len(items), max(1, size))]
+
+def insert_chunk_size(rows):
+    # every inserted row also gets an id, created_at and updated_at
+    return MAX_VARIABLES // (len(rows[0]) + 3) if rows else 1
+
+def schema_info():
+    '''
+    column names and nullable columns of every table, read once from a scratch in-memory copy of the schema
+    '''
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    columns, nullable = {}, {}
+    for table in ("users", "projects", "tasks", "tombstones"):
+        # table_info rows are (cid, name, type, notnull, default, pk)
+        info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        columns[table] = {row[1] for row in info}
+        nullable[table] = {row[1] for row in info if not row[3] and not row[5]}
+    conn.close()
+    return columns, nullable
+
+COLUMNS, NULLABLE = schema_info()
+
+# (table alias, columns) of every part of the project detail join; the columns come back as "<alias>__<column>"
+DETAIL_PARTS = [
+    ("p", sorted(COLUMNS["projects"])),
+    ("o", PERSON_COLUMNS.split(", ")),
+    ("t", sorted(COLUMNS["tasks"])),
+    ("a", PERSON_COLUMNS.split(", ")),
+]
+# one row per task (or a single row for a project without tasks), owner and assignee joined in
+PROJECT_DETAIL_SQL = (
+    "SELECT " + ", ".join(f"{alias}.{column} AS {alias}__{column}" for alias, columns in DETAIL_PARTS for column in columns)
+    + " FROM projects p"
+    + " LEFT JOIN users o ON o.id = p.owner_id"
+    + " LEFT JOIN tasks t ON t.project_id = p.id"
+    + " LEFT JOIN users a ON a.id = t.assigned_to"
+    + " WHERE p.id = ? ORDER BY t.created_at, t.id"
+)
+
+class SQLiteStatements:
+    '''
+    builds the (sql, params) of every DataBaseManager call
+    shared by the sync and the async sqlite backends, which only differ in how they run them
+    '''
+    def _open_path(self, path):
+        # ":memory:" becomes a named shared-cache database so every thread and manager in the process sees the same data
+        self._uri = path == ":memory:"
+        self.path = "file:projectdock?mode=memory&cache=shared" if self._uri else path
+
+    def _pragmas(self):
+        pragmas = ["PRAGMA foreign_keys=ON"]
+        if not self._uri:
+            pragmas += ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"]
+        return pragmas
+
+    def _prune(self):
+        # tombstones older than TOMBSTONE_DAYS, dropped when the database is opened
+        horizon = datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_DAYS or 36500)
+        return "DELETE FROM tombstones WHERE deleted_at < ?", [horizon.isoformat(timespec="microseconds")]
+
+    def _migrations(self, table_info):
+        # statements for the MIGRATIONS an older database file still needs, given its {table: columns}
+        return [sql for table, column, sql in MIGRATIONS if column not in table_info[table]]
+
+    def _touch(self, table, data: dict):
+        # postgres does this with a trigger; here it is set explicitly so RETURNING shows the new value
+        if table in TIMESTAMPED_TABLES and "updated_at" not in data:
+            return {**data, "updated_at": now_iso()}
+        return data
+
+    def _rows(self, rows):
+        result = []
+        for row in rows:
+            row = dict(row)
+            for column in JSON_COLUMNS.intersection(row):
+                if isinstance(row[column], str):
+                    row[column] = json.loads(row[column])
+            result.append(row)
+        return QueryResult(result)
+
+    def _check_columns(self, table, names):
+        unknown = set(names) - COLUMNS[table]
+        if unknown:
+            raise RejectedWrite(f"Unknown column(s) for {table}: {', '.join(sorted(unknown))}")
+
+    def _encode(self, data: dict):
+        return {k: json.dumps(v) if k in JSON_COLUMNS and not isinstance(v, str) else v for k, v in data.items()}
+
+    def _insert(self, table, data: dict):
+        sql, params, _ = self._insert_many(table, [data])
+        return sql, params
+
+    def _insert_many(self, table, rows):
+        # ids are generated here, so the caller can put RETURNING rows back in insert order
+        created_at = now_iso()
+        full_rows = []
+        for data in rows:
+            self._check_columns(table, data)
+            row = {"id": str(uuid.uuid4()), "created_at": created_at}
+            if table in TIMESTAMPED_TABLES:
+                row["updated_at"] = created_at
+            row.update(self._encode(data))
+            full_rows.append(row)
+        columns = list(full_rows[0])
+        marks = ", ".join(["(" + ", ".join("?" for _ in columns) + ")"] * len(full_rows))
+        params = [row.get(column) for row in full_rows for column in columns]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES {marks} RETURNING *"
+        return sql, params, [row["id"] for row in full_rows]
+
+    def _list(self, table, columns="*", filters=None, order_by=None, limit=None, after=None):
+        # keyset pagination: seek straight to the (order column, id) position instead of using OFFSET
+        column, desc = parse_order(order_by)
+        names = {column} | {f[0] for f in filters or []}
+        if columns != "*":
+            names |= {name.strip() for name in columns.split(",")}
+        self._check_columns(table, names)
+        clauses, params = [], []
+        for name, op, value in filters or []:
+            clauses.append(f"{name} {SQL_OPS[op]} ?")
+            params.append(value)
+        cmp, direction = ("<", "DESC") if desc else (">", "ASC")
+        # a comparison filter on the order column already rules out nulls, and leaving out the
+        # IS NULL sort key lets sqlite read a range of the column's index in order
+        nullable = column in NULLABLE[table] and column not in {f[0] for f in filters or []}
+        if after:
+            value, row_id = after
+            if value is None:
+                clauses.append(f"{column} IS NULL AND id {cmp} ?")
+                params.append(row_id)
+            elif nullable:
+                clauses.append(f"({column} {cmp} ? OR ({column} = ? AND id {cmp} ?) OR {column} IS NULL)")
+                params += [value, value, row_id]
+            else:
+                clauses.append(f"({column}, id) {cmp} (?, ?)")
+                params += [value, row_id]
+        sql = f"SELECT {columns} FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        # nulls sort last like they do in postgres
+        order = f"{column} IS NULL, " if nullable else ""
+        sql += f" ORDER BY {order}{column} {direction}, id {direction}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def _by_project(self, project_id):
+        return "SELECT * FROM tasks WHERE project_id = ?", [project_id]
+
+    def _part(self, row, alias):
+        # the columns of one joined table, None when the left join found no row
+        prefix = alias + "__"
+        part = {column[len(prefix):]: value for column, value in row.items() if column.startswith(prefix)}
+        return part if part["id"] is not None else None
+
+    def _project_detail(self, result):
+        # fold the joined rows back into one nested project, shaped like the postgrest embedding
+        if not result.data:
+            return QueryResult([])
+        first = result.data[0]
+        project = self._rows([self._part(first, "p")]).data[0]
+        project["owner"] = self._part(first, "o")
+        project["tasks"] = []
+        for row in result.data:
+            task = self._part(row, "t")
+            if task is not None:
+                task["assignee"] = self._part(row, "a")
+                project["tasks"].append(task)
+        return QueryResult([project])
+
+    def _update(self, table, row_id, data: dict):
+        self._check_columns(table, data)
+        data = self._encode(self._touch(table, data))
+        assignments = ", ".join(f"{column} = ?" for column in data)
+        return f"UPDATE {table} SET {assignments} WHERE id = ? RETURNING *", [*data.values(), row_id]
+
+    def _delete(self, table, row_id):
+        return f"DELETE FROM {table} WHERE id = ? RETURNING *", [row_id]
+
+    def _update_many(self, table, ids, data: dict):
+        # one statement per chunk of ids; every chunk sets the same values, so a constraint
+        # error already stops the first one
+        self._check_columns(table, data)
+        data = self._encode(self._touch(table, data))
+        assignments = ", ".join(f"{column} = ?" for column in data)
+        return [
+            (f"UPDATE {table} SET {assignments} WHERE id IN ({', '.join('?' for _ in chunk)}) RETURNING *", [*data.values(), *chunk])
+            for chunk in chunks(ids, MAX_VARIABLES - len(data))
+        ]
+
+    def _delete_many(self, table, ids):
+        return [
+            (f"DELETE FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)}) RETURNING *", chunk)
+            for chunk in chunks(ids, MAX_VARIABLES)
+        ]
+
+    def _tombstones(self, table, since):
+        return "SELECT row_id, deleted_at FROM tombstones WHERE table_name = ? AND deleted_at >= ? ORDER BY deleted_at", [table, since]
+
+    def _stats_queries(self, project_id=None):
+        # one GROUP BY per stat; per-project stats only count that project's tasks
+        queries = []
+        for table, name, column, missing in STAT_GROUPS:
+            if project_id and table != "tasks":
+                continue
+            where, params = ("WHERE project_id = ?", [project_id]) if project_id else ("", [])
+            sql = f"SELECT COALESCE({column}, '{missing}') AS k, COUNT(*) AS n FROM {table} {where} GROUP BY k"
+            queries.append(((table, name), sql, params))
+        return queries
+
+    def _stats(self, grouped):
+        stats = {}
+        for (table, name), result in grouped:
+            section = stats.setdefault(table, {"total": 0})
+            section[name] = {row["k"]: row["n"] for row in result.data}
+            section["total"] = sum(section[name].values())
+        return QueryResult(stats)
+
+    def _in_order(self, result, ids):
+        # sqlite does not guarantee the order of RETURNING rows
+        position = {row_id: i for i, row_id in enumerate(ids)}
+        result.data.sort(key=lambda row: position[row["id"]])
+        return result
+
+class SQLiteDataBaseManager(SQLiteStatements, DataBaseManager):
+    '''
+    local backend on an embedded sqlite file (WAL mode)
+    each thread gets its own connection so readers never wait on each other
+    '''
+    def __init__(self, path="projectdock.db"):
+        self._open_path(path)
+        self._local = threading.local()
+        # keep one connection open for the lifetime of the manager (an in-memory db dies with its last connection)
+        self._keepalive = self._connect()
+        self._keepalive.executescript(SCHEMA)
+        table_info = {table: {row[1] for row in self._keepalive.execute(f"PRAGMA table_info({table})")} for table in COLUMNS}
+        for sql in self._migrations(table_info):
+            self._keepalive.executescript(sql)
+        self._keepalive.executescript(SYNC_SCHEMA)
+        with self._keepalive:
+            self._keepalive.execute(*self._prune())
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, uri=self._uri, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for pragma in self._pragmas():
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+
+    def _run(self, sql, params):
+        conn = self._connect()
+        with conn:
+            return self._rows(conn.execute(sql, params).fetchall())
+
+    def _run_many(self, statements):
+        # the statements of one bulk call in one transaction, their rows together
+        conn = self._connect()
+        rows = []
+        with conn:
+            for sql, params in statements:
+                rows += conn.execute(sql, params).fetchall()
+        return self._rows(rows)
+
+    # ============ USER MANAGEMENT ============
+
+    def create_user(self, name, email, password_hash, role):
+        return self._run(*self._insert("users", user_row(name, email, password_hash, role)))
+
+    def get_all_users(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return self._run(*self._list("users", select_columns(fields, USER_COLUMNS), filters, order_by, limit, after))
+
+    def update_user(self, user_id, data):
+        return self._run(*self._update("users", user_id, data))
+
+    def delete_user(self, user_id):
+        return self._run(*self._delete("users", user_id))
+
+    # ============ PROJECT MANAGEMENT ============
+
+    def create_project(self, name, description, owner_id, start_date, end_date, status):
+        return self._run(*self._insert("projects", project_row(name, description, owner_id, start_date, end_date, status)))
+
+    def get_all_projects(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return self._run(*self._list("projects", select_columns(fields), filters, order_by, limit, after))
+
+    def update_project(self, project_id, data):
+        return self._run(*self._update("projects", project_id, data))
+
+    def delete_project(self, project_id):
+        return self._run(*self._delete("projects", project_id))
+
+    # ============ TASK MANAGEMENT ============
+
+    def create_task(self, project_id, title, description, assigned_to, due_date, status):
+        return self._run(*self._insert("tasks", task_row(project_id, title, description, assigned_to, due_date, status)))
+
+    def get_all_tasks(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return self._run(*self._list("tasks", select_columns(fields), filters, order_by, limit, after))
+
+    def get_tasks_by_project(self, project_id):
+        return self._run(*self._by_project(project_id))
+
+    def get_project_detail(self, project_id):
+        return self._project_detail(self._run(PROJECT_DETAIL_SQL, [project_id]))
+
+    def update_task(self, task_id, data):
+        return self._run(*self._update("tasks", task_id, data))
+
+    def delete_task(self, task_id):
+        return self._run(*self._delete("tasks", task_id))
+
+    # ============ BULK OPERATIONS ============
+
+    def bulk_insert(self, table, rows):
+        # one statement per chunk of rows; a refused chunk is inserted row by row
+        result = QueryResult([], [])
+        for chunk in chunks(rows, insert_chunk_size(rows)):
+            sql, params, ids = self._insert_many(table, chunk)
+            try:
+                part = self._in_order(self._run(sql, params), ids)
+                part.errors = [None] * len(chunk)
+            except sqlite3.IntegrityError:
+                part = insert_each(chunk, lambda row: self._run(*self._insert(table, row)))
+            result.data += part.data
+            result.errors += part.errors
+        return result
+
+    def bulk_update(self, table, ids, data):
+        return self._run_many(self._update_many(table, ids, data))
+
+    def bulk_delete(self, table, ids):
+        return self._run_many(self._delete_many(table, ids))
+
+    def get_tombstones(self, table, since):
+        return self._run(*self._tombstones(table, since))
+
+    def get_stats(self, project_id=None):
+        return self._stats([(group, self._run(sql, params)) for group, sql, params in self._stats_queries(project_id)])
+
+    def ping(self):
+        return self._run("SELECT 1 AS ok", [])
+
+class AsyncSQLiteDataBaseManager(SQLiteStatements, AsyncDataBaseManager):
+    '''
+    async local backend on the same sqlite file, through aiosqlite
+    the connection is opened on first use inside the running event loop
+    '''
+    def __init__(self, path="projectdock.db"):
+        self._open_path(path)
+        self._conn = None
+        self._opening = None
+
+    async def _connect(self):
+        if self._conn is None:
+            # concurrent first calls share one connect instead of opening several
+            if self._opening is None:
+                self._opening = asyncio.ensure_future(self._open())
+            try:
+                await self._opening
+            except Exception:
+                self._opening = None
+                raise
+        return self._conn
+
+    async def _open(self):
+        import aiosqlite
+        conn = await aiosqlite.connect(self.path, uri=self._uri)
+        conn.row_factory = sqlite3.Row
+        for pragma in self._pragmas():
+            await conn.execute(pragma)
+        await conn.executescript(SCHEMA)
+        table_info = {}
+        for table in COLUMNS:
+            async with conn.execute(f"PRAGMA table_info({table})") as cursor:
+                table_info[table] = {row[1] for row in await cursor.fetchall()}
+        for sql in self._migrations(table_info):
+            await conn.executescript(sql)
+        await conn.executescript(SYNC_SCHEMA)
+        await conn.execute(*self._prune())
+        await conn.commit()
+        self._conn = conn
+
+    async def _run(self, sql, params):
+        conn = await self._connect()
+        async with conn.execute(sql, params) as cursor:
+            rows = await cursor.fetchall()
+        await conn.commit()
+        return self._rows(rows)
+
+    async def _run_many(self, statements):
+        conn = await self._connect()
+        rows = []
+        for sql, params in statements:
+            async with conn.execute(sql, params) as cursor:
+                rows += await cursor.fetchall()
+        await conn.commit()
+        return self._rows(rows)
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn, self._opening = None, None
+
+    # ============ USER MANAGEMENT ============
+
+    async def create_user(self, name, email, password_hash, role):
+        return await self._run(*self._insert("users", user_row(name, email, password_hash, role)))
+
+    async def get_all_users(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return await self._run(*self._list("users", select_columns(fields, USER_COLUMNS), filters, order_by, limit, after))
+
+    async def update_user(self, user_id, data):
+        return await self._run(*self._update("users", user_id, data))
+
+    async def delete_user(self, user_id):
+        return await self._run(*self._delete("users", user_id))
+
+    # ============ PROJECT MANAGEMENT ============
+
+    async def create_project(self, name, description, owner_id, start_date, end_date, status):
+        return await self._run(*self._insert("projects", project_row(name, description, owner_id, start_date, end_date, status)))
+
+    async def get_all_projects(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return await self._run(*self._list("projects", select_columns(fields), filters, order_by, limit, after))
+
+    async def update_project(self, project_id, data):
+        return await self._run(*self._update("projects", project_id, data))
+
+    async def delete_project(self, project_id):
+        return await self._run(*self._delete("projects", project_id))
+
+    # ============ TASK MANAGEMENT ============
+
+    async def create_task(self, project_id, title, description, assigned_to, due_date, status):
+        return await self._run(*self._insert("tasks", task_row(project_id, title, description, assigned_to, due_date, status)))
+
+    async def get_all_tasks(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        return await self._run(*self._list("tasks", select_columns(fields), filters, order_by, limit, after))
+
+    async def get_tasks_by_project(self, project_id):
+        return await self._run(*self._by_project(project_id))
+
+    async def get_project_detail(self, project_id):
+        return self._project_detail(await self._run(PROJECT_DETAIL_SQL, [project_id]))
+
+    async def update_task(self, task_id, data):
+        return await self._run(*self._update("tasks", task_id, data))
+
+    async def delete_task(self, task_id):
+        return await self._run(*self._delete("tasks", task_id))
+
+    # ============ BULK OPERATIONS ============
+
+    async def bulk_insert(self, table, rows):
+        result = QueryResult([], [])
+        for chunk in chunks(rows, insert_chunk_size(rows)):
+            sql, params, ids = self._insert_many(table, chunk)
+            try:
+                part = self._in_order(await self._run(sql, params), ids)
+                part.errors = [None] * len(chunk)
+            except sqlite3.IntegrityError:
+                part = await ainsert_each(chunk, lambda row: self._run(*self._insert(table, row)))
+            result.data += part.data
+            result.errors += part.errors
+        return result
+
+    async def bulk_update(self, table, ids, data):
+        return await self._run_many(self._update_many(table, ids, data))
+
+    async def bulk_delete(self, table, ids):
+        return await self._run_many(self._delete_many(table, ids))
+
+    async def get_tombstones(self, table, since):
+        return await self._run(*self._tombstones(table, since))
+
+    async def get_stats(self, project_id=None):
+        return self._stats([(group, await self._run(sql, params)) for group, sql, params in self._stats_queries(project_id)])
+
+    async def ping(self):
+        return await self._run("SELECT 1 AS ok", [])
@@ -0,0 +1,244 @@
+# src write_behind.py
+# opt-in write-behind for task updates (WRITE_BEHIND_MS > 0): updates are acknowledged at once,
+# merged per task for a short window and written as one bulk update per distinct change
+
+import asyncio
+import json
+import logging
+import os
+
+from src.db import QueryResult, parse_order
+
+logger = logging.getLogger(__name__)
+
+# milliseconds a task update may wait to be merged with later ones, 0 writes every update through
+WRITE_BEHIND_MS = float(os.getenv("WRITE_BEHIND_MS", "0"))
+# buffered tasks that trigger a flush before the window is over
+WRITE_BEHIND_MAX = int(os.getenv("WRITE_BEHIND_MAX", "1000"))
+# flushes a failed update is retried in before it is given up (and logged)
+WRITE_BEHIND_ATTEMPTS = 5
+# columns that are buffered; anything else (foreign keys, unknown columns) is written through
+# so constraint errors still reach the caller instead of surfacing in a later flush
+BUFFERED_COLUMNS = {"status", "title", "description", "due_date"}
+TASK_STATUSES = {"pending", "in-progress", "completed"}
+# task ids remembered as existing before the set is started over (it refills from reads and writes)
+MAX_KNOWN = 100000
+
+def bufferable(data):
+    if not data or not set(data) <= BUFFERED_COLUMNS:
+        return False
+    return "status" not in data or data["status"] in TASK_STATUSES
+
+class WriteBehindTasks:
+    '''
+    wraps an AsyncDataBaseManager: update_task() of a task this process has read or written goes
+    to a buffer flushed every WRITE_BEHIND_MS, everything else is passed through
+    reads overlay the buffered changes on the rows they return (read-your-writes); reads that
+    filter, sort or count on a buffered column (or on updated_at) flush first, since an overlay
+    cannot fix those
+    on_flush(result) is called with the stored rows of every bulk update a flush writes
+    '''
+    def __init__(self, db, window_ms=WRITE_BEHIND_MS, max_pending=WRITE_BEHIND_MAX, on_flush=None):
+        self.db = db
+        self.on_flush = on_flush
+        self.window = window_ms / 1000
+        self.max_pending = max_pending
+        # task id -> merged update not yet sent / being sent right now
+        self._pending = {}
+        self._inflight = {}
+        self._attempts = {}
+        # ids of tasks this process has read or written: only their updates are buffered, an
+        # unknown id is written through so a missing task is refused without an extra read
+        self._known = set()
+        self._timer = None
+        self._flush_lock = asyncio.Lock()
+        self.updates = 0
+        self.merged = 0
+        self.flushes = 0
+        self.statements = 0
+        self.failures = 0
+        self.unknown = 0
+
+    def __getattr__(self, name):
+        # every other method (users, projects, ping, ...) is the wrapped manager's
+        return getattr(self.db, name)
+
+    # --- buffered writes ---
+
+    async def update_task(self, task_id, data):
+        if not bufferable(data):
+            await self.flush()
+            return await self.db.update_task(task_id, data)
+        if task_id not in self._known and task_id not in self._pending and task_id not in self._inflight:
+            # the same one write as without write-behind, and a missing task is refused right away
+            result = await self.db.update_task(task_id, data)
+            self._remember(result.data or [])
+            return result
+        pending = self._pending.setdefault(task_id, {})
+        if pending:
+            self.merged += 1
+        pending.update(data)
+        self.updates += 1
+        if len(self._pending) >= self.max_pending:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._start_flush)
+        # acknowledged before it is written: the row holds what the caller sent, not the stored row
+        return QueryResult([{"id": task_id, **data}])
+
+    def _remember(self, rows):
+        if len(self._known) > MAX_KNOWN:
+            self._known.clear()
+        self._known.update(row["id"] for row in rows if row.get("id") is not None)
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        # a failed flush is logged in flush(), this only keeps the task from being collected early
+        task.add_done_callback(lambda done: done.exception() if not done.cancelled() else None)
+
+    async def flush(self):
+        '''
+        write every buffered update: tasks with the same merged change share one bulk update
+        failed groups go back into the buffer and are retried on the next flush
+        '''
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            groups = {}
+            for task_id, data in self._inflight.items():
+                key = json.dumps(data, sort_keys=True, default=str)
+                groups.setdefault(key, (data, []))[1].append(task_id)
+            self.flushes += 1
+            for data, ids in groups.values():
+                try:
+                    result = await self.db.bulk_update("tasks", ids, data)
+                    self.statements += 1
+                    for task_id in ids:
+                        self._attempts.pop(task_id, None)
+                except Exception as e:
+                    self.failures += 1
+                    self._requeue(ids, data, e)
+                    continue
+                # a task deleted by another process or a cascade since it was read matches no row
+                missing = set(ids) - {row["id"] for row in result.data or []}
+                if missing:
+                    self.unknown += len(missing)
+                    self._known -= missing
+                    logger.warning("update %s matched no task for %s", data, sorted(missing))
+                # the stored rows replace the acknowledged ones in caches, /events and other workers
+                if self.on_flush is not None:
+                    try:
+                        self.on_flush(result)
+                    except Exception:
+                        logger.exception("publishing a flush failed")
+            self._inflight = {}
+            if self._pending and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._start_flush)
+
+    def _requeue(self, ids, data, error):
+        for task_id in ids:
+            attempts = self._attempts.get(task_id, 0) + 1
+            if attempts >= WRITE_BEHIND_ATTEMPTS:
+                self._attempts.pop(task_id, None)
+                logger.error("giving up on update %s of task %s: %r", data, task_id, error)
+                continue
+            self._attempts[task_id] = attempts
+            # newer buffered changes to the same columns win over the failed ones
+            self._pending[task_id] = {**data, **self._pending.get(task_id, {})}
+
+    async def close(self):
+        # flush-on-shutdown: nothing acknowledged is left in memory when the connection closes
+        await self.flush()
+        await self.db.close()
+
+    # --- read-your-writes ---
+
+    def _overlay_of(self, task_id):
+        inflight, pending = self._inflight.get(task_id), self._pending.get(task_id)
+        if inflight is None:
+            return pending
+        return {**inflight, **pending} if pending else inflight
+
+    def _buffered_columns(self):
+        return {column for data in (*self._inflight.values(), *self._pending.values()) for column in data}
+
+    def _overlay(self, rows):
+        self._remember(rows)
+        if not (self._pending or self._inflight):
+            return rows
+        overlaid = []
+        for row in rows:
+            changes = self._overlay_of(row.get("id"))
+            if changes:
+                row = {**row, **{column: value for column, value in changes.items() if column in row}}
+            overlaid.append(row)
+        return overlaid
+
+    async def get_all_tasks(self, limit=None, after=None, filters=None, order_by=None, fields=None):
+        buffered = self._buffered_columns()
+        columns = {column for column, _, _ in filters or []} | {parse_order(order_by)[0]}
+        # every buffered change also moves updated_at, which delta syncs filter on
+        if buffered and (buffered | {"updated_at"}) & columns:
+            await self.flush()
+        result = await self.db.get_all_tasks(limit, after, filters, order_by, fields)
+        return QueryResult(self._overlay(result.data or []))
+
+    async def get_tasks_by_project(self, project_id):
+        result = await self.db.get_tasks_by_project(project_id)
+        return QueryResult(self._overlay(result.data or []))
+
+    async def get_project_detail(self, project_id):
+        result = await self.db.get_project_detail(project_id)
+        rows = result.data or []
+        if rows and rows[0].get("tasks"):
+            rows = [{**rows[0], "tasks": self._overlay(rows[0]["tasks"])}]
+        return QueryResult(rows)
+
+    async def get_stats(self, project_id=None):
+        # counts by status cannot be patched row by row
+        await self.flush()
+        return await self.db.get_stats(project_id)
+
+    # --- other task writes keep their order with the buffered ones ---
+
+    async def delete_task(self, task_id):
+        self._pending.pop(task_id, None)
+        self._known.discard(task_id)
+        return await self.db.delete_task(task_id)
+
+    async def delete_project(self, project_id):
+        # its tasks go with it in the database
+        self._known.clear()
+        return await self.db.delete_project(project_id)
+
+    async def bulk_update(self, table, ids, data):
+        if table == "tasks":
+            await self.flush()
+        return await self.db.bulk_update(table, ids, data)
+
+    async def bulk_delete(self, table, ids):
+        if table == "tasks":
+            for task_id in ids:
+                self._pending.pop(task_id, None)
+                self._known.discard(task_id)
+        elif table == "projects":
+            self._known.clear()
+        return await self.db.bulk_delete(table, ids)
+
+    def stats(self):
+        return {
+            "enabled": True,
+            "window_ms": self.window * 1000,
+            "pending": len(self._pending),
+            "updates": self.updates,
+            "merged": self.merged,
+            "flushes": self.flushes,
+            "statements": self.statements,
+            "failures": self.failures,
+            "unknown": self.unknown,
+        }